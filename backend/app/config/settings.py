@@ -5,6 +5,7 @@ Handles system settings and configuration
 
 from typing import Dict, Any
 from datetime import datetime
+from app.utils import clock
 
 class ConfigManager:
     """
@@ -65,19 +66,20 @@ class ConfigManager:
         self.simulations_paused = not self.simulations_paused
         return self.simulations_paused
     
-    def set_speed(self, speed: float):
-        """Set simulation speed multiplier"""
-        self.simulations_speed = max(0.5, min(5.0, speed))
+    def set_speed(self, speed: float) -> float:
+        """Set simulation speed multiplier (0.5x-10x) on the simulation clock"""
+        self.simulations_speed = clock.set_speed(speed)
+        return self.simulations_speed
     
     def toggle_demo_mode(self):
         """Toggle demo mode"""
         self.demo_mode = not self.demo_mode
         if self.demo_mode:
             # Demo mode: faster phases, guaranteed alerts
-            self.simulations_speed = 2.0
+            self.set_speed(2.0)
             self.demo_force_critical = True
         else:
-            self.simulations_speed = 1.0
+            self.set_speed(1.0)
             self.demo_force_critical = False
         return self.demo_mode
     
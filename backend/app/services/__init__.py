@@ -5,7 +5,9 @@ Business logic and data services
 
 from .bmtc_service import fetch_bmtc_bus_data, format_bus_summary
 from .weather_service import fetch_weather_data, format_weather_summary
-from .metro_service import simulate_metro_flow, simulate_all_metro_stations, format_metro_summary
+from .metro_service import (
+    simulate_metro_flow, simulate_all_metro_stations, legacy_metro_update, format_metro_summary
+)
 from .crowd_simulation_service import (
     simulate_crowd_density,
     check_alerts,
@@ -21,6 +23,7 @@ __all__ = [
     'format_weather_summary',
     'simulate_metro_flow',
     'simulate_all_metro_stations',
+    'legacy_metro_update',
     'simulate_crowd_density',
     'check_alerts',
     'format_metro_summary',
@@ -0,0 +1,355 @@
+"""
+Agent-Based Crowd Engine
+Vectorized pedestrian simulation over structure-of-arrays NumPy buffers
+
+Each agent walks from a metro exit (or a zone entry point) to a gate around
+one of its zone's hotspots, stays while the zone's phase holds the crowd,
+then walks back and leaves. Walking speed drops with local density and
+agents cannot step into a full cell; both are answered by a spatial hash.
+Agents are rasterized onto the existing zone grids every tick, in the phase
+heuristic's density units, so the multi-zone payload, alert thresholds and
+hotspot cut-offs mean the same as with the phase heuristic.
+"""
+
+import math
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from app.utils.constants import BENGALURU_CENTER
+from app.services.density_engine import (
+    METERS_PER_DEGREE, REFERENCE_RESOLUTION_M, zone_grid_size, zone_resolution
+)
+from app.services.metro_service import METRO_STATIONS
+from app.services.zone_registry import zone_registry
+
+# Agent states
+FREE, ARRIVING, PRESENT, LEAVING = 0, 1, 2, 3
+
+# Walking model
+WALKING_SPEED = (1.0, 1.6)        # m/s, preferred speed range
+MAX_DENSITY = 5.0                 # people per m² where walking stops
+MIN_SPEED_FACTOR = 0.05           # agents in a jam still creep forward
+MAX_SUBSTEP_SECONDS = 5.0         # longest movement step within a tick
+DEFAULT_TICK_SECONDS = 30.0       # dt of the first tick (matches the density task interval)
+
+# Spatial hash cell side (meters) for density and collision queries
+HASH_CELL_SIZE = 10.0
+
+# Share of zone capacity on site when a zone's intensity is at its phase maximum
+PEAK_OCCUPANCY = 0.1
+
+# People in a reference-sized cell that make one unit of grid density: one unit of
+# phase intensity brings this many people on site (see target_population)
+PEOPLE_PER_DENSITY_UNIT = 50000 * PEAK_OCCUPANCY / 200
+
+# Agents gather around a gate with this spread (in zone grid cells)
+GATE_SPREAD_CELLS = 1.5
+
+# Metro stations this far outside a zone's radius still feed it (meters)
+STATION_CATCHMENT = 500
+
+# People that can come out of one entry point per second, and how far they spread (meters)
+ENTRY_RATE = 5.0
+ENTRY_SPREAD = 15.0
+
+
+def to_meters(lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Planar (x east, y north) meters relative to the city center
+    Uses the same meters-per-degree on both axes as the zone grids
+    """
+    x = (np.asarray(lon, dtype=np.float64) - BENGALURU_CENTER[1]) * METERS_PER_DEGREE
+    y = (np.asarray(lat, dtype=np.float64) - BENGALURU_CENTER[0]) * METERS_PER_DEGREE
+    return x, y
+
+
+class SpatialHash:
+    """
+    Counts agents per square cell in a fixed-size hash table
+    Collisions only merge counts of far-apart cells; the table is rebuilt every step
+    """
+
+    def __init__(self, cell_size: float = HASH_CELL_SIZE):
+        self.cell_size = cell_size
+        self.mask = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    def keys(self, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+        """Hash table slot for positions"""
+        cx = np.floor(x / self.cell_size).astype(np.int64)
+        cy = np.floor(y / self.cell_size).astype(np.int64)
+        return ((cx * 73856093) ^ (cy * 19349663)) & self.mask
+
+    def build(self, x: np.ndarray, y: np.ndarray):
+        """Count the given agents per cell"""
+        size = 1 << max(10, int(2 * max(1, x.size) - 1).bit_length())
+        self.mask = size - 1
+        self.counts = np.bincount(self.keys(x, y), minlength=size)
+
+    def density(self, keys: np.ndarray, people_per_agent: float) -> np.ndarray:
+        """People per m² in the cells behind these slots"""
+        return self.counts[keys] * (people_per_agent / self.cell_size ** 2)
+
+
+class AgentEngine:
+    """
+    Pedestrians for every zone in shared structure-of-arrays buffers
+    Buffers grow on demand; free slots are reused
+    """
+
+    _BUFFERS = {
+        "x": np.float32, "y": np.float32,
+        "goal_x": np.float32, "goal_y": np.float32,
+        "home_x": np.float32, "home_y": np.float32,
+        "speed": np.float32, "zone": np.int32, "state": np.int8
+    }
+
+    def __init__(self, zones: Dict = None, capacity: int = 100000, people_per_agent: float = 1.0):
+        self.zones = zones or zone_registry.zones
+        self.people_per_agent = people_per_agent
+        self.zone_ids = list(self.zones)
+        self.zone_index = {zone_id: index for index, zone_id in enumerate(self.zone_ids)}
+        self.hash = SpatialHash()
+        self.tick = 0
+        self._last_time: Optional[datetime] = None
+        self._allocate(capacity)
+        self._build_zone_tables()
+
+    def _allocate(self, capacity: int):
+        for name, dtype in self._BUFFERS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.capacity = capacity
+
+    def _grow(self, needed: int):
+        """Enlarge every buffer to hold at least `needed` agents"""
+        capacity = max(needed, self.capacity * 2)
+        for name in self._BUFFERS:
+            buffer = getattr(self, name)
+            grown = np.zeros(capacity, dtype=buffer.dtype)
+            grown[:self.capacity] = buffer
+            setattr(self, name, grown)
+        self.capacity = capacity
+
+    def _build_zone_tables(self):
+        """Per-zone grid geometry and entry points as flat arrays"""
+        count = len(self.zone_ids)
+        centers = np.array([self.zones[z]["center"] for z in self.zone_ids], dtype=np.float64).reshape(count, 2)
+        self.zone_x, self.zone_y = to_meters(centers[:, 0], centers[:, 1])
+        self.zone_res = np.array([zone_resolution(self.zones[z]) for z in self.zone_ids], dtype=np.float64)
+        self.zone_grid = np.array([zone_grid_size(self.zones[z]) for z in self.zone_ids], dtype=np.int64)
+        self.zone_offset = np.concatenate([[0], np.cumsum(self.zone_grid ** 2)])
+        # Density units per person in one of the zone's cells
+        self.cell_units = (REFERENCE_RESOLUTION_M / self.zone_res) ** 2 / PEOPLE_PER_DENSITY_UNIT
+
+        station_x, station_y = to_meters(
+            [s["location"][0] for s in METRO_STATIONS.values()],
+            [s["location"][1] for s in METRO_STATIONS.values()]
+        )
+        sources_x, sources_y, source_counts = [], [], []
+        for index, zone_id in enumerate(self.zone_ids):
+            radius = self.zones[zone_id]["radius"]
+            near = np.hypot(station_x - self.zone_x[index], station_y - self.zone_y[index]) <= radius + STATION_CATCHMENT
+            if near.any():
+                xs, ys = station_x[near], station_y[near]
+            else:
+                # No metro nearby: people walk in from the four edges of the zone
+                angles = np.arange(4) * (math.pi / 2)
+                xs = self.zone_x[index] + radius * np.cos(angles)
+                ys = self.zone_y[index] + radius * np.sin(angles)
+            sources_x.append(xs)
+            sources_y.append(ys)
+            source_counts.append(len(xs))
+
+        self.source_x = np.concatenate(sources_x)
+        self.source_y = np.concatenate(sources_y)
+        self.source_count = np.array(source_counts, dtype=np.int64)
+        self.source_offset = np.concatenate([[0], np.cumsum(self.source_count)[:-1]])
+
+    # ===== Population =====
+
+    def population(self) -> np.ndarray:
+        """Agents per zone that are arriving or present"""
+        on_site = (self.state == ARRIVING) | (self.state == PRESENT)
+        return np.bincount(self.zone[on_site], minlength=len(self.zone_ids))
+
+    def active_count(self) -> int:
+        return int(np.count_nonzero(self.state))
+
+    def target_population(self, capacity: np.ndarray, base_intensity: np.ndarray) -> np.ndarray:
+        """Agents each zone should hold for its current phase intensity"""
+        max_intensity = np.maximum(1.0, 200 * capacity / 50000)
+        share = np.clip(base_intensity / max_intensity, 0.0, 1.0)
+        return (capacity * PEAK_OCCUPANCY * share / self.people_per_agent).astype(np.int64)
+
+    def gate_tables(self, hotspots: np.ndarray, hotspot_count: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Gate positions (hotspot centers in meters) as flat arrays with per-zone counts and offsets
+        hotspots (zones, n, 2) and hotspot_count are zone-table columns in the engine's zone order
+        """
+        half = (self.zone_grid / 2)[:, None]
+        resolution = self.zone_res[:, None]
+        gates_x = self.zone_x[:, None] + (hotspots[:, :, 1] - half) * resolution
+        gates_y = self.zone_y[:, None] + (hotspots[:, :, 0] - half) * resolution
+        valid = np.arange(hotspots.shape[1]) < hotspot_count[:, None]
+
+        # Zones without hotspots gather at their center
+        empty = np.flatnonzero(hotspot_count == 0)
+        gates_x[empty, 0] = self.zone_x[empty]
+        gates_y[empty, 0] = self.zone_y[empty]
+        valid[empty, 0] = True
+
+        counts = valid.sum(axis=1)
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        return gates_x[valid], gates_y[valid], counts, offsets
+
+    def spawn(self, zone_counts: np.ndarray, gates: Tuple, rng: np.random.Generator):
+        """Create agents at their zones' entry points, heading for a gate"""
+        total = int(zone_counts.sum())
+        if total == 0:
+            return
+        free = np.flatnonzero(self.state == FREE)
+        if free.size < total:
+            self._grow(self.capacity + total - free.size)
+            free = np.flatnonzero(self.state == FREE)
+        slots = free[:total]
+
+        zone = np.repeat(np.arange(len(zone_counts)), zone_counts)
+        draws = rng.random((4, total))
+        source = self.source_offset[zone] + (draws[0] * self.source_count[zone]).astype(np.int64)
+        gates_x, gates_y, gate_count, gate_offset = gates
+        gate = gate_offset[zone] + (draws[1] * gate_count[zone]).astype(np.int64)
+        spread = rng.normal(0.0, 1.0, size=(4, total))
+
+        self.home_x[slots] = self.source_x[source] + ENTRY_SPREAD * spread[0]
+        self.home_y[slots] = self.source_y[source] + ENTRY_SPREAD * spread[1]
+        self.x[slots] = self.home_x[slots]
+        self.y[slots] = self.home_y[slots]
+        gate_spread = GATE_SPREAD_CELLS * self.zone_res[zone]
+        self.goal_x[slots] = gates_x[gate] + gate_spread * spread[2]
+        self.goal_y[slots] = gates_y[gate] + gate_spread * spread[3]
+        self.speed[slots] = WALKING_SPEED[0] + (WALKING_SPEED[1] - WALKING_SPEED[0]) * draws[2]
+        self.zone[slots] = zone
+        self.state[slots] = ARRIVING
+
+    def dismiss(self, zone_counts: np.ndarray, rng: np.random.Generator):
+        """Send a random selection of each zone's agents back to where they came from"""
+        if not zone_counts.any():
+            return
+        on_site = np.flatnonzero((self.state == ARRIVING) | (self.state == PRESENT))
+        on_site = on_site[rng.permutation(on_site.size)]
+        zone = self.zone[on_site]
+        order = np.argsort(zone, kind='stable')
+        on_site, zone = on_site[order], zone[order]
+
+        # Rank of each agent within its zone; keep the first zone_counts[z] of each zone
+        starts = np.searchsorted(zone, np.arange(len(zone_counts)))
+        rank = np.arange(on_site.size) - starts[zone]
+        leaving = on_site[rank < zone_counts[zone]]
+
+        self.goal_x[leaving] = self.home_x[leaving]
+        self.goal_y[leaving] = self.home_y[leaving]
+        self.state[leaving] = LEAVING
+
+    def balance(self, zones: Dict[str, np.ndarray], dt: float, rng: np.random.Generator):
+        """
+        Spawn or dismiss agents so each zone heads toward its phase's target population
+        `zones` are the zone table's columns, row-aligned with the engine's zones
+        Arrivals are limited by how many people the entry points let through in dt
+        """
+        targets = self.target_population(zones['capacity'], zones['base_intensity'])
+        difference = targets - self.population()
+        entry_limit = (self.source_count * ENTRY_RATE * dt / self.people_per_agent).astype(np.int64)
+        self.spawn(np.clip(difference, 0, entry_limit), self.gate_tables(zones['hotspots'], zones['hotspot_count']), rng)
+        self.dismiss(np.maximum(-difference, 0), rng)
+
+    # ===== Movement =====
+
+    def move(self, dt: float):
+        """Advance walking agents by dt seconds"""
+        walking = np.flatnonzero((self.state == ARRIVING) | (self.state == LEAVING))
+        if walking.size == 0:
+            return
+        occupied = np.flatnonzero(self.state)
+        self.hash.build(self.x[occupied], self.y[occupied])
+
+        x, y = self.x[walking], self.y[walking]
+        dx, dy = self.goal_x[walking] - x, self.goal_y[walking] - y
+        distance = np.hypot(dx, dy)
+
+        # Slow down in crowds (linear speed-density relation)
+        keys = self.hash.keys(x, y)
+        density = self.hash.density(keys, self.people_per_agent)
+        factor = np.clip(1.0 - density / MAX_DENSITY, MIN_SPEED_FACTOR, 1.0)
+        step = np.minimum(self.speed[walking] * factor * dt, distance)
+        scale = np.divide(step, distance, out=np.zeros_like(step), where=distance > 0)
+        next_x, next_y = x + dx * scale, y + dy * scale
+
+        # Collision: don't step into a different cell that is already full
+        next_keys = self.hash.keys(next_x, next_y)
+        full = (self.hash.density(next_keys, self.people_per_agent) >= MAX_DENSITY) & (next_keys != keys)
+        moved = ~full
+        self.x[walking[moved]] = next_x[moved]
+        self.y[walking[moved]] = next_y[moved]
+
+        arrived = walking[moved & (step >= distance)]
+        leaving = self.state[arrived] == LEAVING
+        self.state[arrived[leaving]] = FREE
+        self.state[arrived[~leaving]] = PRESENT
+
+    # ===== Rasterization =====
+
+    def rasterize(self) -> List[np.ndarray]:
+        """
+        Density on every zone grid (in zone order)
+        People per cell, scaled to a reference-sized cell and divided by
+        PEOPLE_PER_DENSITY_UNIT; an agent counts on each zone grid that covers its position
+        """
+        occupied = np.flatnonzero(self.state)
+        x = self.x[occupied].astype(np.float64)
+        y = self.y[occupied].astype(np.float64)
+        flat = []
+        for index in range(len(self.zone_ids)):
+            size = self.zone_grid[index]
+            rows = np.floor((y - self.zone_y[index]) / self.zone_res[index] + size / 2).astype(np.int64)
+            cols = np.floor((x - self.zone_x[index]) / self.zone_res[index] + size / 2).astype(np.int64)
+            inside = (rows >= 0) & (rows < size) & (cols >= 0) & (cols < size)
+            flat.append(self.zone_offset[index] + rows[inside] * size + cols[inside])
+
+        cells = np.concatenate(flat) if flat else np.zeros(0, dtype=np.int64)
+        counts = np.bincount(cells, minlength=int(self.zone_offset[-1])) * self.people_per_agent
+        density = counts * np.repeat(self.cell_units, self.zone_grid ** 2)
+        density = np.rint(density).astype(np.int64)
+        return [
+            density[self.zone_offset[i]:self.zone_offset[i + 1]].reshape(self.zone_grid[i], self.zone_grid[i])
+            for i in range(len(self.zone_ids))
+        ]
+
+    # ===== Tick =====
+
+    def elapsed(self, now: datetime) -> float:
+        """Seconds since the previous tick (DEFAULT_TICK_SECONDS for the first)"""
+        dt = DEFAULT_TICK_SECONDS if self._last_time is None else (now - self._last_time).total_seconds()
+        self._last_time = now
+        return max(0.0, dt)
+
+    def step(self, zones: Dict[str, np.ndarray], dt: float, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """Balance populations, walk for dt seconds and return each zone's grid"""
+        self.tick += 1
+        self.balance(zones, dt, rng)
+
+        substeps = max(1, int(math.ceil(dt / MAX_SUBSTEP_SECONDS)))
+        for _ in range(substeps):
+            self.move(dt / substeps)
+
+        grids = self.rasterize()
+        return {zone_id: grids[self.zone_index[zone_id]] for zone_id in self.zone_ids}
+
+    def stats(self) -> Dict:
+        return {
+            "agents": self.active_count(),
+            "capacity": self.capacity,
+            "people_per_agent": self.people_per_agent,
+            "arriving": int(np.count_nonzero(self.state == ARRIVING)),
+            "present": int(np.count_nonzero(self.state == PRESENT)),
+            "leaving": int(np.count_nonzero(self.state == LEAVING))
+        }
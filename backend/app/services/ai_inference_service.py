@@ -9,9 +9,14 @@ from typing import Dict, List, Any
 from datetime import datetime
 import google.generativeai as genai
 from dotenv import load_dotenv
+from app.utils.constants import ZONES
+from app.services.zone_registry import ZoneRegistry, zone_registry
 
 load_dotenv()
 
+# The built-in zones have hand-written transportation entries
+_builtin_zones = ZoneRegistry(ZONES)
+
 class AIInferenceService:
     """Service for generating AI-powered insights using Gemini API"""
     
@@ -174,7 +179,12 @@ class AIInferenceService:
                 }
             }
             
-            zone_transport = transportation_data.get(zone, transportation_data['all'])
+            zone_transport = transportation_data.get(zone)
+            if zone_transport is None:
+                # Registry zones without their own entry borrow the nearest built-in zone's options
+                zone_config = zone_registry.get(zone)
+                nearby = _builtin_zones.nearest(*zone_config["center"]) if zone_config else []
+                zone_transport = transportation_data[nearby[0][0]] if nearby else transportation_data['all']
             
             return {
                 'zone': zone,
@@ -0,0 +1,243 @@
+"""
+Binary Frame Format
+Compact binary WebSocket frames for the bulky message types, for clients
+that negotiate them (see docs/binary-frames.md for the schema)
+
+A frame is a small JSON header followed by packed little-endian arrays:
+density grids as uint16, coordinates as float32. Lists of responders and
+buses become column tables; responder names, icons, colors, statuses and
+zones are codes into a dictionary sent once per session.
+Other message types stay JSON text frames.
+"""
+
+import json
+import struct
+import numpy as np
+from typing import Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+from app.services.first_responders_service import (
+    RESPONDER_ROSTER, RESPONDER_TYPES, RESPONDER_STATUSES, PATROL_ZONES
+)
+
+MAGIC = b"CSB"
+VERSION = 1
+
+# Blobs start on 4-byte boundaries so clients can view them as typed arrays in place
+_ALIGN = 4
+_PREFIX = struct.Struct("<3sBI")   # magic, version, header length
+
+_UNIT_CODE = {entry["id"]: code for code, entry in enumerate(RESPONDER_ROSTER)}
+_STATUS_CODE = {status: code for code, status in enumerate(RESPONDER_STATUSES)}
+_ZONE_CODE = {zone["name"]: code for code, zone in enumerate(PATROL_ZONES)}
+
+
+def dictionary() -> Dict:
+    """The static responder metadata that binary responder tables are coded against"""
+    return {
+        "version": VERSION,
+        "units": [
+            {"id": entry["id"], "vehicle_id": entry["vehicle_id"], "type": entry["type"]}
+            for entry in RESPONDER_ROSTER
+        ],
+        "responder_types": {
+            responder_type: {field: config[field] for field in ("icon", "color", "name")}
+            for responder_type, config in RESPONDER_TYPES.items()
+        },
+        "statuses": list(RESPONDER_STATUSES),
+        "zones": [zone["name"] for zone in PATROL_ZONES]
+    }
+
+
+class _Blobs:
+    """
+    Arrays collected while packing a header; the header refers to each as
+    {"$blob": offset, "dtype": .., "shape": [..]}, offsets counted from the blob section
+    """
+
+    def __init__(self):
+        self.arrays: List[np.ndarray] = []
+        self.size = 0
+
+    def add(self, values, dtype: str) -> Dict:
+        array = np.ascontiguousarray(values, dtype=dtype)
+        self.arrays.append(array)
+        reference = {"$blob": self.size, "dtype": array.dtype.str, "shape": list(array.shape)}
+        self.size = _aligned(self.size + array.nbytes)
+        return reference
+
+
+def _grid(grid, blobs: _Blobs) -> Dict:
+    return blobs.add(np.clip(np.asarray(grid), 0, 0xFFFF), "<u2")
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _table(name: str, rows: List[Dict], blobs: _Blobs, stamped: bool = False) -> Dict:
+    """
+    A list of flat dicts as columns. Numeric columns are packed into one
+    (count, columns) matrix per dtype - uint16 when every value is a small
+    non-negative int, else float32; anything else stays a JSON list. With
+    `stamped` the rows' timestamps are dropped and decoders use the message's
+    """
+    keys = list(dict.fromkeys(key for row in rows for key in row))
+    if stamped and "timestamp" in keys:
+        keys.remove("timestamp")
+    packed = {"<u2": {}, "<f4": {}}
+    columns = {}
+    for key in keys:
+        values = [row.get(key) for row in rows]
+        if values and all(_is_number(value) for value in values):
+            small = all(isinstance(value, int) and 0 <= value <= 0xFFFF for value in values)
+            packed["<u2" if small else "<f4"][key] = values
+        else:
+            columns[key] = values
+    matrices = [
+        {"names": list(numeric), "values": blobs.add(np.array(list(numeric.values())).T, dtype)}
+        for dtype, numeric in packed.items() if numeric
+    ]
+    return {"$table": name, "count": len(rows), "stamped": stamped, "packed": matrices, "columns": columns}
+
+
+def _pack_density(message: Dict, blobs: _Blobs) -> Dict:
+    header = dict(message)
+    if "grid" in message:
+        header["grid"] = _grid(message["grid"], blobs)
+    if "zones" in message:
+        header["zones"] = {
+            zone_id: {**zone, "grid": _grid(zone["grid"], blobs)} if "grid" in zone else zone
+            for zone_id, zone in message["zones"].items()
+        }
+    return header
+
+
+def _pack_responders(message: Dict, blobs: _Blobs) -> Optional[Dict]:
+    """Responders as dictionary codes (unit, status, zone) plus their moving fields"""
+    try:
+        rows = [
+            {
+                "unit": _UNIT_CODE[r["id"]],
+                "lat": r["lat"],
+                "lon": r["lon"],
+                "speed": r["speed"],
+                "status": _STATUS_CODE[r["status"]],
+                "zone": _ZONE_CODE[r["zone"]]
+            }
+            for r in message["responders"]
+        ]
+    except KeyError:
+        return None   # not in the session dictionary: send it as JSON
+    return {**message, "responders": _table("responders", rows, blobs, stamped=True)}
+
+
+def _pack_buses(message: Dict, blobs: _Blobs) -> Dict:
+    return {**message, "buses": _table("buses", message["buses"], blobs, stamped=True)}
+
+
+_PACKERS = {
+    "multi_zone_density_update": _pack_density,
+    "density_update": _pack_density,
+    "first_responders_update": _pack_responders,
+    "gps_update": _pack_buses
+}
+
+
+def packs(message_type: str) -> bool:
+    """Whether messages of this type have a binary form"""
+    return message_type in _PACKERS
+
+
+def pack(message: Dict) -> Optional[bytes]:
+    """A message as one binary frame, or None if it has no binary form"""
+    packer = _PACKERS.get(message.get("type"))
+    if packer is None:
+        return None
+    blobs = _Blobs()
+    header = packer(message, blobs)
+    if header is None:
+        return None
+
+    if orjson is not None:
+        body = orjson.dumps(header, option=orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        body = json.dumps(header, separators=(",", ":"), ensure_ascii=False, default=_plain).encode()
+    start = _aligned(_PREFIX.size + len(body))
+
+    # Blob offsets count from the first aligned byte after the header
+    frame = bytearray(start + blobs.size)
+    _PREFIX.pack_into(frame, 0, MAGIC, VERSION, len(body))
+    frame[_PREFIX.size:_PREFIX.size + len(body)] = body
+    position = start
+    for array in blobs.arrays:
+        frame[position:position + array.nbytes] = array.tobytes()
+        position = _aligned(position + array.nbytes)
+    return bytes(frame)
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def _plain(value):
+    """JSON fallback for NumPy scalars left in a payload"""
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def unpack(frame: bytes, session_dictionary: Dict = None) -> Dict:
+    """
+    Reference decoder: a binary frame back to the JSON message it stands for
+    (grids as nested lists, tables as lists of dicts; float32 values rounded)
+    """
+    magic, version, length = _PREFIX.unpack_from(frame, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"Unsupported binary frame (magic {magic!r}, version {version})")
+    header = json.loads(frame[_PREFIX.size:_PREFIX.size + length])
+    start = _aligned(_PREFIX.size + length)
+    session_dictionary = session_dictionary or dictionary()
+
+    def restore(value):
+        if isinstance(value, dict):
+            if "$blob" in value:
+                count = int(np.prod(value["shape"], dtype=np.int64))
+                array = np.frombuffer(frame, dtype=value["dtype"], count=count, offset=start + value["$blob"])
+                return array.reshape(value["shape"]).tolist()
+            if "$table" in value:
+                columns = {}
+                for matrix in value["packed"]:
+                    values = restore(matrix["values"])
+                    for c, key in enumerate(matrix["names"]):
+                        columns[key] = [row[c] for row in values]
+                columns.update(value["columns"])
+                rows = [{key: column[k] for key, column in columns.items()} for k in range(value["count"])]
+                if value["$table"] == "responders":
+                    rows = [_responder(row, session_dictionary) for row in rows]
+                if value["stamped"]:
+                    for row in rows:
+                        row["timestamp"] = header.get("timestamp")
+                return rows
+            return {key: restore(item) for key, item in value.items()}
+        return value
+
+    return restore(header)
+
+
+def _responder(row: Dict, session_dictionary: Dict) -> Dict:
+    """A responder row with its dictionary codes expanded"""
+    unit = session_dictionary["units"][row["unit"]]
+    return {
+        **unit,
+        **session_dictionary["responder_types"][unit["type"]],
+        "lat": row["lat"],
+        "lon": row["lon"],
+        "speed": row["speed"],
+        "status": session_dictionary["statuses"][row["status"]],
+        "zone": session_dictionary["zones"][row["zone"]]
+    }
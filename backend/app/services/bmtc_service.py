@@ -4,10 +4,13 @@ Fetches live bus data from BMTC API
 """
 
 import requests
-import random
 from datetime import datetime
 from typing import Dict, Optional
-from app.utils.constants import ZONES
+from app.utils.rng import stream, uniform_int
+from app.services.zone_registry import zone_registry
+
+# Number of demo bus snapshots generated (selects each bus's random stream block)
+_demo_bus_ticks = 0
 
 
 async def fetch_bmtc_bus_data() -> Optional[Dict]:
@@ -91,34 +94,47 @@ async def fetch_bmtc_bus_data() -> Optional[Dict]:
         return None
 
 
+def reset_demo_buses():
+    """Restart the demo buses from their first tick"""
+    global _demo_bus_ticks
+    _demo_bus_ticks = 0
+
+
 def _get_demo_buses() -> Dict:
     """
     Return demo bus data for testing when BMTC API is unavailable
     Places buses across all monitored zones in Bengaluru
     """
+    global _demo_bus_ticks
+    
+    _demo_bus_ticks += 1
     demo_buses = []
     base_routes = ["356", "500", "G4", "335E", "KIA-9", "41C", "201A", "283D", "K-2", "V-500", "AS-1", "MF-1"]
     
-    # Convert zones to list for easier access
-    zone_list = list(ZONES.values())
+    registry = zone_registry
     
     # Distribute buses across all zones
     for i, route in enumerate(base_routes):
         # Assign bus to a zone (cycle through zones)
-        zone = zone_list[i % len(zone_list)]
+        zone_index = i % len(registry)
         
         # Place bus near zone center with some random offset (within zone radius)
-        radius_offset = zone["radius"] / 111000  # Convert meters to degrees (approx)
-        lat_offset = random.uniform(-radius_offset, radius_offset)
-        lon_offset = random.uniform(-radius_offset, radius_offset)
+        radius_offset = registry.radius[zone_index] / 111000  # Convert meters to degrees (approx)
+        bus_id = f"KA01AB{1000 + i}"
+        draws = stream("bus", bus_id, _demo_bus_ticks).random(3).tolist()
+        lat = float(registry.lat[zone_index] + radius_offset * (2 * draws[0] - 1))
+        lon = float(registry.lon[zone_index] + radius_offset * (2 * draws[1] - 1))
+        
+        # Label the bus with the zone it actually ended up in
+        zone_id = registry.zone_at(lat, lon) or registry.ids[zone_index]
         
         demo_buses.append({
-            "id": f"KA01AB{1000 + i}",
+            "id": bus_id,
             "route": route,
-            "lat": zone["center"][0] + lat_offset,
-            "lon": zone["center"][1] + lon_offset,
-            "speed": random.randint(10, 40),
-            "zone": zone["name"],
+            "lat": lat,
+            "lon": lon,
+            "speed": uniform_int(draws[2], 10, 40),
+            "zone": registry.zones[zone_id]["name"],
             "timestamp": datetime.now().isoformat()
         })
     
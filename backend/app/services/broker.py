@@ -0,0 +1,233 @@
+"""
+Tick Broker
+Hands simulation messages from one leader process to any number of
+WebSocket worker processes over a local Unix socket
+
+APP_ROLE picks what a process does:
+    standalone  simulations and WebSocket clients in one process (default)
+    leader      runs the simulations and publishes every message to the workers
+    worker      runs no simulations; fans the leader's messages out to its own clients
+
+The leader serializes each message once; every worker decodes it and
+broadcasts through its own ConnectionManager, so subscriptions, binary
+frames and delta encoding keep working per worker. Workers report their
+client counts back so the leader only simulates while someone is watching.
+Frames on the socket are a 4-byte big-endian length followed by JSON.
+"""
+
+import asyncio
+import json
+import os
+import struct
+import time
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.services.connection_manager import encode_message
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+ROLES = ('standalone', 'leader', 'worker')
+
+DEFAULT_SOCKET_PATH = "/tmp/crowd-safety-broker.sock"
+
+_LENGTH = struct.Struct(">I")
+
+# How often a worker reports its client counts to the leader
+REPORT_INTERVAL_SECONDS = 1.0
+
+
+def deployment_role() -> str:
+    """This process's role from APP_ROLE"""
+    role = os.getenv("APP_ROLE", "standalone")
+    if role not in ROLES:
+        raise ValueError(f"Unknown APP_ROLE '{role}' (expected one of {ROLES})")
+    return role
+
+
+def socket_path() -> str:
+    return os.getenv("BROKER_SOCKET", DEFAULT_SOCKET_PATH)
+
+
+def _frame(payload: bytes) -> bytes:
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def _decode(payload: bytes) -> Dict:
+    return orjson.loads(payload) if orjson is not None else json.loads(payload)
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return await reader.readexactly(length)
+
+
+class _Worker:
+    """The leader's view of one connected worker"""
+
+    def __init__(self, worker_id: int, writer: asyncio.StreamWriter):
+        self.id = worker_id
+        self.writer = writer
+        self.connections = 0
+        self.legacy = 0
+        self.published = 0
+        self.connected_at = time.time()
+
+
+class BrokerServer:
+    """Leader side: accepts workers and publishes messages to all of them"""
+
+    def __init__(self, path: str = None, max_buffer: int = None):
+        self.path = path or socket_path()
+        # A worker this far behind is cut off; it reconnects and carries on from the next message
+        self.max_buffer = int(max_buffer or os.getenv("BROKER_MAX_BUFFER", 8 * 1024 * 1024))
+        self.workers: Dict[int, _Worker] = {}
+        self.published = 0
+        self.dropped_workers = 0
+        self._next_id = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)   # left over from an earlier leader
+        self._server = await asyncio.start_unix_server(self._handle, path=self.path)
+        print(f"📡 Broker listening on {self.path}")
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._next_id += 1
+        worker = _Worker(self._next_id, writer)
+        self.workers[worker.id] = worker
+        print(f"📡 Worker {worker.id} connected. Total workers: {len(self.workers)}")
+        try:
+            while True:
+                report = _decode(await _read_frame(reader))
+                worker.connections = int(report.get("connections", 0))
+                worker.legacy = int(report.get("legacy", 0))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            print(f"❌ Broker error from worker {worker.id}: {e}")
+        finally:
+            self._drop(worker)
+
+    def _drop(self, worker: _Worker):
+        if self.workers.pop(worker.id, None) is not None:
+            worker.writer.close()
+            print(f"📡 Worker {worker.id} disconnected. Total workers: {len(self.workers)}")
+
+    def publish(self, message: Dict):
+        """Send a message to every worker (serialized once); never waits on a socket"""
+        if not self.workers:
+            return
+        frame = _frame(encode_message(message).encode())
+        self.published += 1
+        for worker in list(self.workers.values()):
+            if worker.writer.transport.get_write_buffer_size() > self.max_buffer:
+                self.dropped_workers += 1
+                print(f"⚠️ Broker: worker {worker.id} fell {self.max_buffer} bytes behind, dropping it")
+                self._drop(worker)
+                continue
+            worker.writer.write(frame)
+            worker.published += 1
+
+    def audience(self) -> int:
+        """WebSocket clients connected across all workers"""
+        return sum(worker.connections for worker in self.workers.values())
+
+    def legacy_audience(self) -> int:
+        """Protocol-1 clients across all workers"""
+        return sum(worker.legacy for worker in self.workers.values())
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for worker in list(self.workers.values()):
+                self._drop(worker)
+            await self._server.wait_closed()
+            self._server = None
+
+    def stats(self) -> Dict:
+        return {
+            "socket": self.path,
+            "published": self.published,
+            "dropped_workers": self.dropped_workers,
+            "workers": [
+                {
+                    "id": worker.id,
+                    "connections": worker.connections,
+                    "legacy": worker.legacy,
+                    "published": worker.published,
+                    "buffered_bytes": worker.writer.transport.get_write_buffer_size(),
+                    "connected_seconds": round(time.time() - worker.connected_at, 1)
+                }
+                for worker in self.workers.values()
+            ]
+        }
+
+
+class BrokerClient:
+    """Worker side: stays connected to the leader and hands every message to `on_message`"""
+
+    def __init__(self, on_message: Callable[[Dict], Awaitable[None]], connections: Callable[[], int],
+                 path: str = None, legacy: Callable[[], int] = lambda: 0):
+        self.path = path or socket_path()
+        self.on_message = on_message
+        self.connections = connections
+        self.legacy = legacy
+        self.connected = False
+        self.received = 0
+        self.reconnects = 0
+
+    async def run(self):
+        """Receive until cancelled, reconnecting with backoff whenever the leader goes away"""
+        backoff = 0.5
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except (FileNotFoundError, ConnectionError) as e:
+                if backoff == 0.5:
+                    print(f"⏳ Waiting for broker at {self.path} ({e})")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 5.0)
+                continue
+
+            backoff = 0.5
+            self.connected = True
+            print(f"📡 Connected to broker at {self.path}")
+            reporter = asyncio.create_task(self._report(writer))
+            try:
+                while True:
+                    message = _decode(await _read_frame(reader))
+                    self.received += 1
+                    try:
+                        await self.on_message(message)
+                    except Exception as e:
+                        print(f"❌ Broker message error: {e}")
+            except (asyncio.IncompleteReadError, ConnectionError):
+                print("⚠️ Broker connection lost, reconnecting")
+            finally:
+                self.connected = False
+                self.reconnects += 1
+                reporter.cancel()
+                writer.close()
+
+    async def _report(self, writer: asyncio.StreamWriter):
+        """Tell the leader how many clients this worker has, and how many are on protocol 1"""
+        try:
+            while True:
+                report = {"connections": self.connections(), "legacy": self.legacy()}
+                writer.write(_frame(json.dumps(report).encode()))
+                await writer.drain()
+                await asyncio.sleep(REPORT_INTERVAL_SECONDS)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    def stats(self) -> Dict:
+        return {
+            "socket": self.path,
+            "connected": self.connected,
+            "received": self.received,
+            "reconnects": self.reconnects
+        }
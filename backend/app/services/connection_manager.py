@@ -0,0 +1,620 @@
+"""
+WebSocket Connection Manager
+Tracks dashboard connections and fans messages out to them
+
+A broadcast is serialized once into a text frame and that same frame goes
+to every client. orjson is used for encoding when it is installed (it also
+encodes NumPy values directly); otherwise the standard library's json with
+compact separators.
+
+Every connection has its own bounded outbound queue drained by its own
+writer task, so a broadcast never waits on a socket and one slow client
+cannot hold up the others. When a queue is full the slow-consumer policy
+decides what gives: the oldest queued frame, the client, or (conflate) the
+queued frame of the same message type is replaced by the newer one. Frames
+without a conflation key (alerts, echoes, replies, snapshots) are never
+evicted; the oldest state frame goes instead, and a queue holding nothing
+else drops the client.
+
+Clients may narrow what they receive by message type and by zone (see
+ConnectionManager.update_subscription); by default they get everything.
+Clients that negotiate binary frames get the bulky message types packed
+by app.services.binary_frames.
+
+The latest message of every state type (per zone for multi-zone payloads)
+is kept, and a client that connects gets all of it at once in one
+"snapshot" frame instead of waiting for each task's next tick.
+
+Liveness is the server's WebSocket ping/pong keepalive (uvicorn's
+ws_ping_interval/ws_ping_timeout); connections it closes, and any client
+stuck on one send for longer than the keepalive allows, are reaped from
+active_connections and counted. A keepalive timeout reaches the app as an
+abnormal close (1006, nothing was received from the peer), the same as a
+lost transport, so the two are counted together.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import WebSocket
+
+from app.services import binary_frames
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+# What happens when a client's queue is full
+SLOW_CONSUMER_POLICIES = ('drop_oldest', 'drop_client', 'conflate')
+
+# Event-like messages are never conflated: each one matters, not just the latest
+UNCONFLATED_TYPES = {"alert", "echo", "connection"}
+
+# Protocol versions a client can ask for (?protocol=N on connect, or {"action": "protocol"}).
+# Version 1 also carries the legacy single-zone/single-station duplicates; version 2 does not
+PROTOCOL_VERSIONS = (1, 2)
+LEGACY_TYPES = {"density_update", "metro_update"}
+
+# Type of the batched frame that replays the latest state to a new client
+SNAPSHOT_TYPE = "snapshot"
+
+# Close code sent to clients dropped for falling behind ("try again later")
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+# Close code for a connection that ended without a close frame from the peer: a lost
+# transport, or a peer the ping/pong keepalive gave up on
+ABNORMAL_CLOSE_CODE = 1006
+
+
+# Filter value meaning "every topic"
+ALL_TOPICS = "*"
+
+
+def encode_message(message: dict) -> str:
+    """Serialize a message to the text of one WebSocket frame"""
+    if orjson is not None:
+        return orjson.dumps(message, option=_ORJSON_OPTIONS).decode()
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def zone_subset(message: dict, zone_ids: Iterable[str]) -> dict:
+    """A multi-zone message narrowed to some of its zones (the summary stays city-wide)"""
+    zones = message["zones"]
+    return {**message, "zones": {zone_id: zones[zone_id] for zone_id in zone_ids}}
+
+
+def encode_frame(message: dict, binary: bool = False):
+    """A text frame, or the binary frame for clients that negotiated one (when the type has one)"""
+    if binary:
+        frame = binary_frames.pack(message)
+        if frame is not None:
+            return frame
+    return encode_message(message)
+
+
+class TopicFilter:
+    """
+    Which values of one topic (message type, zone) a client wants
+    Everything until narrowed; subscribing from "everything" keeps only the
+    subscribed values, unsubscribing from "everything" excludes them
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.include: Optional[Set[str]] = None
+        self.exclude: Set[str] = set()
+
+    @property
+    def is_all(self) -> bool:
+        return self.include is None and not self.exclude
+
+    def allows(self, value: str) -> bool:
+        if self.include is not None:
+            return value in self.include
+        return value not in self.exclude
+
+    def subscribe(self, values):
+        if values == ALL_TOPICS:
+            self.reset()
+        elif self.include is None and not self.exclude:
+            self.include = set(values)
+        elif self.include is None:
+            self.exclude.difference_update(values)
+        else:
+            self.include.update(values)
+
+    def unsubscribe(self, values):
+        if values == ALL_TOPICS:
+            self.include, self.exclude = set(), set()
+        elif self.include is None:
+            self.exclude.update(values)
+        else:
+            self.include.difference_update(values)
+
+    def describe(self):
+        """ "*", the subscribed values, or {"except": [...]}"""
+        if self.include is not None:
+            return sorted(self.include)
+        return {"except": sorted(self.exclude)} if self.exclude else ALL_TOPICS
+
+
+class ClientConnection:
+    """One connected client: a bounded queue of outbound frames and the task that writes them"""
+
+    def __init__(self, websocket: WebSocket, client_id: int, max_queue: int, policy: str, on_error,
+                 protocol: int = PROTOCOL_VERSIONS[0]):
+        self.websocket = websocket
+        self.id = client_id
+        self.protocol = protocol
+        self.max_queue = max_queue
+        self.policy = policy
+        self.connected_at = datetime.now()
+        self._on_error = on_error
+        self.types = TopicFilter()
+        self.zones = TopicFilter()
+
+        # Binary frames negotiated; delta mode: sequence number of the last frame queued per delta stream
+        self.binary = False
+        self.delta = False
+        self.stream_seq: Dict[str, int] = {}
+
+        # Entries are [conflation key, frame (text or bytes), enqueue time]
+        self.queue: Deque[List] = deque()
+        self._latest: Dict[str, List] = {}
+        self._ready = asyncio.Event()
+
+        # perf_counter() when the frame now being written was handed to the socket
+        self.sending_since: Optional[float] = None
+
+        self.sent = 0
+        self.dropped = 0
+        self.conflated = 0
+        self.latency_last = 0.0
+        self.latency_max = 0.0
+        self._latency_total = 0.0
+
+        self.writer = asyncio.create_task(self._write_loop())
+
+    def enqueue(self, frame, key: Optional[str] = None) -> bool:
+        """
+        Queue a frame without waiting
+        `key` is the frame's conflation key; frames without one are never evicted
+        Returns False when the queue is full and the policy is to drop the client,
+        or when nothing queued may be evicted
+        """
+        now = time.perf_counter()
+        if self.policy == 'conflate' and key is not None:
+            queued = self._latest.get(key)
+            if queued is not None:
+                # Newer state replaces the queued one in its place in line
+                queued[1], queued[2] = frame, now
+                self.conflated += 1
+                self.stream_seq.pop(key, None)
+                return True
+
+        if len(self.queue) >= self.max_queue:
+            if self.policy == 'drop_client':
+                return False
+            oldest = next((index for index, entry in enumerate(self.queue) if entry[0] is not None), None)
+            if oldest is None:
+                return False
+            dropped = self.queue[oldest]
+            del self.queue[oldest]
+            self._forget(dropped)
+            # A lost delta breaks the chain: that stream restarts from a keyframe
+            self.stream_seq.pop(dropped[0], None)
+            self.dropped += 1
+
+        entry = [key, frame, now]
+        self.queue.append(entry)
+        if self.policy == 'conflate' and key is not None:
+            self._latest[key] = entry
+        self._ready.set()
+        return True
+
+    def has_queued(self, key: str) -> bool:
+        """Whether a frame with this conflation key is waiting (conflate policy only)"""
+        return key in self._latest
+
+    def _forget(self, entry: List):
+        if entry[0] is not None and self._latest.get(entry[0]) is entry:
+            del self._latest[entry[0]]
+
+    async def _write_loop(self):
+        """Send queued frames in order until the connection fails or is closed"""
+        try:
+            while True:
+                if not self.queue:
+                    self._ready.clear()
+                    await self._ready.wait()
+                    continue
+
+                entry = self.queue.popleft()
+                self._forget(entry)
+                self.sending_since = time.perf_counter()
+                if isinstance(entry[1], bytes):
+                    await self.websocket.send_bytes(entry[1])
+                else:
+                    await self.websocket.send_text(entry[1])
+                self.sending_since = None
+
+                latency = time.perf_counter() - entry[2]
+                self.sent += 1
+                self.latency_last = latency
+                self.latency_max = max(self.latency_max, latency)
+                self._latency_total += latency
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._on_error(self, e)
+
+    def close(self):
+        """Stop the writer; queued frames are discarded"""
+        self.writer.cancel()
+        self.queue.clear()
+        self._latest.clear()
+
+    def stats(self) -> Dict:
+        client = getattr(self.websocket, "client", None)
+        return {
+            "id": self.id,
+            "address": f"{client.host}:{client.port}" if client else None,
+            "connected_at": self.connected_at.isoformat(),
+            "queue_depth": len(self.queue),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "conflated": self.conflated,
+            "protocol": self.protocol,
+            "subscription": {"types": self.types.describe(), "zones": self.zones.describe()},
+            "binary": self.binary,
+            "delta": self.delta,
+            "send_latency_ms": {
+                "last": round(self.latency_last * 1000, 3),
+                "avg": round(self._latency_total / self.sent * 1000, 3) if self.sent else 0.0,
+                "max": round(self.latency_max * 1000, 3)
+            }
+        }
+
+
+def _route(client: ClientConnection, message_type: str, zone_id: Optional[str], zones: Optional[Dict]):
+    """
+    Whether a client gets a message, and which of its zones when it is a
+    multi-zone message the client only follows part of (None: all of it)
+    """
+    if not client.types.allows(message_type):
+        return False, None
+    if message_type in LEGACY_TYPES and client.protocol >= 2:
+        return False, None
+    if zone_id is not None and not client.zones.allows(zone_id):
+        return False, None
+    if zones is None or client.zones.is_all:
+        return True, None
+    variant = tuple(zone for zone in zones if client.zones.allows(zone))
+    if not variant:
+        return False, None
+    return True, None if len(variant) == len(zones) else variant
+
+
+class ConnectionManager:
+    """Manages WebSocket connections and broadcasts messages to all connected clients"""
+
+    def __init__(self, max_queue: int = None, policy: str = None):
+        self.active_connections: Dict[WebSocket, ClientConnection] = {}
+        self.max_queue = max(1, int(max_queue or os.getenv("WS_SEND_QUEUE_SIZE", 32)))
+        self.policy = policy or os.getenv("WS_SLOW_CONSUMER_POLICY", "drop_oldest")
+        if self.policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow-consumer policy '{self.policy}' (expected one of {SLOW_CONSUMER_POLICIES})")
+        # For clients that do not ask for a version; 1 keeps existing dashboards working
+        self.default_protocol = int(os.getenv("WS_DEFAULT_PROTOCOL", PROTOCOL_VERSIONS[0]))
+        if self.default_protocol not in PROTOCOL_VERSIONS:
+            raise ValueError(f"Unknown protocol version {self.default_protocol} (expected one of {PROTOCOL_VERSIONS})")
+        self.dropped_clients = 0
+        # Dead connections taken out of active_connections, by how they were found
+        self.reaped = {"abnormal_close": 0, "stalled": 0, "send_error": 0}
+        self._next_id = 0
+
+        # Latest state per message type, replayed to new clients; encoded once until it changes
+        self.latest: Dict[str, Dict] = {}
+        self._snapshot_frame: Optional[str] = None
+
+    def register(self, websocket: WebSocket, protocol: int = None) -> ClientConnection:
+        """Start queueing for an accepted connection"""
+        self._next_id += 1
+        client = ClientConnection(websocket, self._next_id, self.max_queue, self.policy, self._writer_failed,
+                                  protocol or self.default_protocol)
+        self.active_connections[websocket] = client
+        return client
+
+    async def connect(self, websocket: WebSocket):
+        """Accept and register a new WebSocket connection"""
+        await websocket.accept()
+        requested = getattr(websocket, "query_params", {}).get("protocol")
+        protocol = int(requested) if requested and requested.isdigit() and int(requested) in PROTOCOL_VERSIONS else None
+        client = self.register(websocket, protocol)
+        print(f"Client connected. Total connections: {len(self.active_connections)}")
+
+        # Send welcome message to the newly connected client
+        await self.send_personal_message({
+            "type": "connection",
+            "message": "Successfully connected to Crowd Safety Intelligence System",
+            "protocol": client.protocol,
+            "protocols": list(PROTOCOL_VERSIONS),
+            "timestamp": datetime.now().isoformat()
+        }, websocket)
+
+        # Then everything it would otherwise wait for the next tick of
+        if self.latest:
+            self.send_snapshot(websocket)
+
+    def remember(self, message: dict):
+        """Keep a message as the latest state of its type (multi-zone payloads merge per zone)"""
+        message_type = message.get("type")
+        if message_type in UNCONFLATED_TYPES:
+            return   # events, not state
+        zones = message.get("zones")
+        previous = self.latest.get(message_type)
+        if isinstance(zones, dict) and previous is not None:
+            message = {**message, "zones": {**previous["zones"], **zones}}
+        self.latest[message_type] = message
+        self._snapshot_frame = None
+
+    def snapshot(self, client: Optional[ClientConnection] = None) -> Dict:
+        """The latest state as one batched message, narrowed to a client's subscriptions"""
+        messages = []
+        for message_type, message in self.latest.items():
+            if client is None:
+                messages.append(message)
+                continue
+            zones = message.get("zones") if isinstance(message.get("zones"), dict) else None
+            wanted, variant = _route(client, message_type, message.get("zone_id"), zones)
+            if wanted:
+                messages.append(message if variant is None else zone_subset(message, variant))
+        return {"type": SNAPSHOT_TYPE, "messages": messages, "timestamp": datetime.now().isoformat()}
+
+    def send_snapshot(self, websocket: WebSocket):
+        """Queue the latest state for a client as one frame"""
+        client = self.active_connections.get(websocket)
+        if client is None:
+            return
+        if client.types.is_all and client.zones.is_all and client.protocol < 2:
+            if self._snapshot_frame is None:
+                self._snapshot_frame = encode_message(self.snapshot())
+            frame = self._snapshot_frame
+        else:
+            frame = encode_message(self.snapshot(client))
+        # Replayed state restarts any delta stream from a keyframe
+        client.stream_seq.clear()
+        if not client.enqueue(frame):
+            self._drop_slow_client(client)
+
+    def _remove(self, websocket: WebSocket) -> Optional[ClientConnection]:
+        client = self.active_connections.pop(websocket, None)
+        if client is not None:
+            client.close()
+        return client
+
+    async def disconnect(self, websocket: WebSocket, code: Optional[int] = None):
+        """Remove a WebSocket connection (`code`: the close code it went away with, if known)"""
+        if self._remove(websocket) is not None:
+            if code == ABNORMAL_CLOSE_CODE:
+                self.reaped["abnormal_close"] += 1
+                print(f"Reaped dead client (no close frame). Total connections: {len(self.active_connections)}")
+            else:
+                print(f"Client disconnected. Total connections: {len(self.active_connections)}")
+
+    def _writer_failed(self, client: ClientConnection, error: Exception):
+        """A send failed: the socket is gone, so is the client"""
+        if self.active_connections.get(client.websocket) is client:
+            del self.active_connections[client.websocket]
+            client.queue.clear()
+            self.reaped["send_error"] += 1
+            print(f"Dropped client {client.id} after send error: {error}")
+
+    def reap_stalled(self, timeout: float) -> int:
+        """
+        Drop clients stuck on a single send for longer than `timeout` seconds
+        A backstop for half-open sockets the keepalive has not closed (or a
+        server without keepalive pings); returns how many were reaped
+        """
+        now = time.perf_counter()
+        stalled = [client for client in self.active_connections.values()
+                   if client.sending_since is not None and now - client.sending_since > timeout]
+        for client in stalled:
+            self._remove(client.websocket)
+            self.reaped["stalled"] += 1
+            print(f"Reaped client {client.id}: send stalled for over {timeout:.0f}s")
+            asyncio.create_task(self._close_quietly(client.websocket, SLOW_CONSUMER_CLOSE_CODE))
+        return len(stalled)
+
+    def _drop_slow_client(self, client: ClientConnection):
+        """Disconnect a client whose queue overflowed under the drop_client policy"""
+        self._remove(client.websocket)
+        self.dropped_clients += 1
+        print(f"Dropped slow client {client.id} (queue full at {client.max_queue} frames)")
+        asyncio.create_task(self._close_quietly(client.websocket, SLOW_CONSUMER_CLOSE_CODE))
+
+    @staticmethod
+    async def _close_quietly(websocket: WebSocket, code: int):
+        try:
+            await websocket.close(code=code)
+        except Exception:
+            pass
+
+    async def send_personal_message(self, message: dict, websocket: WebSocket):
+        """Send a message to a specific client (queued behind what it already has pending)"""
+        client = self.active_connections.get(websocket)
+        try:
+            if client is None:
+                await websocket.send_text(encode_message(message))
+            elif not client.enqueue(encode_message(message)):
+                self._drop_slow_client(client)
+        except Exception as e:
+            print(f"Error sending personal message: {e}")
+
+    def update_subscription(self, websocket: WebSocket, action: str, types=None, zones=None) -> Dict:
+        """
+        Apply a client's subscribe/unsubscribe request; returns the reply to send it
+        `types` and `zones` are lists of message types / zone ids, or "*" for all;
+        a field left out is not changed
+        """
+        client = self.active_connections.get(websocket)
+        for name, values in (("types", types), ("zones", zones)):
+            if values is not None and values != ALL_TOPICS and (
+                    not isinstance(values, list) or not all(isinstance(value, str) for value in values)):
+                return {
+                    "type": "subscription",
+                    "status": "error",
+                    "message": f"'{name}' must be a list of strings or \"{ALL_TOPICS}\"",
+                    "timestamp": datetime.now().isoformat()
+                }
+
+        if client is not None:
+            for topic, values in ((client.types, types), (client.zones, zones)):
+                if values is not None:
+                    getattr(topic, action)(values)
+            if zones is not None:
+                # Newly followed zones have no baseline to apply deltas to
+                client.stream_seq.clear()
+
+        return {
+            "type": "subscription",
+            "status": "ok",
+            "types": client.types.describe() if client else ALL_TOPICS,
+            "zones": client.zones.describe() if client else ALL_TOPICS,
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def set_protocol(self, websocket: WebSocket, version) -> Dict:
+        """Switch a client's protocol version; returns the reply to send it"""
+        client = self.active_connections.get(websocket)
+        supported = version in PROTOCOL_VERSIONS and not isinstance(version, bool)
+        if client is not None and supported:
+            client.protocol = version
+        return {
+            "type": "protocol",
+            "status": "ok" if supported else "error",
+            "version": client.protocol if client else version,
+            "protocols": list(PROTOCOL_VERSIONS),
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def legacy_clients(self) -> int:
+        """Clients on protocol 1, which still want the legacy duplicate messages"""
+        return sum(1 for client in self.active_connections.values() if client.protocol < 2)
+
+    def set_binary(self, websocket: WebSocket, enabled: bool):
+        """Switch a client between binary and JSON frames for the types that have a binary form"""
+        client = self.active_connections.get(websocket)
+        if client is not None:
+            client.binary = bool(enabled)
+
+    def set_delta(self, websocket: WebSocket, enabled: bool):
+        """Switch a client in or out of delta mode; either way it restarts from a keyframe"""
+        client = self.active_connections.get(websocket)
+        if client is not None:
+            client.delta = bool(enabled)
+            client.stream_seq.clear()
+
+    def request_keyframe(self, websocket: WebSocket):
+        """Make a delta client's next frame a keyframe (e.g. after it saw a sequence gap)"""
+        client = self.active_connections.get(websocket)
+        if client is not None:
+            client.stream_seq.clear()
+
+    def wants_delta(self) -> bool:
+        """Whether any client is in delta mode"""
+        return any(client.delta for client in self.active_connections.values())
+
+    async def broadcast(self, message: dict, delta_frames=None):
+        """
+        Send a message to every client subscribed to it, serialized once per
+        distinct payload and frame format: messages with a `zone_id` go to
+        clients following that zone, multi-zone messages are cut down to each
+        client's zones. With `delta_frames` (a density_delta.DeltaFrames for
+        this message), delta clients get the delta if they hold the previous
+        frame, else the keyframe
+        """
+        self.remember(message)
+        message_type = message.get("type")
+        key = None if message_type in UNCONFLATED_TYPES else message_type
+        zone_id = message.get("zone_id")
+        zones = message.get("zones") if isinstance(message.get("zones"), dict) else None
+        has_binary = binary_frames.packs(message_type)
+
+        frames: Dict[Tuple[str, Optional[Tuple[str, ...]], bool], object] = {}
+        for client in list(self.active_connections.values()):
+            wanted, variant = _route(client, message_type, zone_id, zones)
+            if not wanted:
+                continue
+
+            encoding, payload = "full", message
+            if delta_frames is not None and client.delta:
+                # A delta must not replace a queued frame (conflation) or follow a lost one
+                if (delta_frames.delta is not None
+                        and client.stream_seq.get(key) == delta_frames.seq - 1
+                        and not client.has_queued(key)):
+                    encoding, payload = "delta", delta_frames.delta
+                else:
+                    encoding, payload = "keyframe", delta_frames.keyframe
+
+            binary = has_binary and client.binary
+            frame = frames.get((encoding, variant, binary))
+            if frame is None:
+                frame = frames[encoding, variant, binary] = encode_frame(
+                    payload if variant is None else zone_subset(payload, variant), binary
+                )
+            if not client.enqueue(frame, key):
+                self._drop_slow_client(client)
+            elif encoding == "keyframe" or (encoding == "delta" and key in client.stream_seq):
+                # A delta whose base was just evicted is unusable: the next frame is a keyframe
+                client.stream_seq[key] = delta_frames.seq
+
+    async def broadcast_frame(self, frame: str, key: Optional[str] = None):
+        """
+        Queue an already encoded frame for every client, whatever it subscribed
+        to; never waits on a socket
+        `key` groups frames that conflate (normally the message type)
+        """
+        for client in list(self.active_connections.values()):
+            if not client.enqueue(frame, key):
+                self._drop_slow_client(client)
+
+    async def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until every queue has drained (or timeout); True if all drained"""
+        deadline = time.perf_counter() + timeout
+        for client in list(self.active_connections.values()):
+            while client.queue:
+                if time.perf_counter() > deadline:
+                    return False
+                await asyncio.sleep(0)
+        return True
+
+    def stats(self) -> Dict:
+        """Queue depth and send latency for every client"""
+        clients = [client.stats() for client in self.active_connections.values()]
+        return {
+            "policy": self.policy,
+            "max_queue": self.max_queue,
+            "connections": len(clients),
+            "dropped_clients": self.dropped_clients,
+            "reaped_connections": dict(self.reaped),
+            "default_protocol": self.default_protocol,
+            "legacy_clients": self.legacy_clients(),
+            "queued_frames": sum(client["queue_depth"] for client in clients),
+            "cached_types": list(self.latest),
+            "clients": clients
+        }
+
+
+# Global connection manager
+manager = ConnectionManager()
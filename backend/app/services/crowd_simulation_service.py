@@ -5,27 +5,23 @@ Crowd Simulation Service
 - Alert Logic
 """
 
-import random
-import math
-from datetime import datetime
+import numpy as np
 from typing import Dict, List, Tuple
+from app.utils import clock
+from app.utils.rng import stream, uniform_int
 from app.utils.constants import (
     BENGALURU_CENTER,
     STADIUM_LOCATION,
     METRO_LOCATION,
     DENSITY_THRESHOLD_HIGH,
     DENSITY_THRESHOLD_CRITICAL,
-    METRO_FLOW_THRESHOLD
+    METRO_FLOW_THRESHOLD,
+    ZONES
 )
-
-# Global state for crowd accumulation (persists between calls)
-_crowd_state = {
-    'phase': 'building',  # building, peak, dispersing, low
-    'base_intensity': 20,  # starts low
-    'hotspot_centers': [],
-    'cycle_count': 0,
-    'phase_duration': 0
-}
+from app.services.density_engine import zone_grid_size, zone_cell_size_deg
+from app.services.kernel_stamps import kernel_cache
+from app.services.hotspot_extractor import hotspot_extractor
+from app.services.state_store import state_store
 
 
 def simulate_metro_flow() -> Dict:
@@ -37,16 +33,20 @@ def simulate_metro_flow() -> Dict:
     - DISPERSING phase: High exits again (people leaving stadium)
     - LOW phase: Minimal flow
     """
-    global _crowd_state
+    crowd_state = state_store.stadium_crowd()
+    
+    current_hour = clock.now().hour
+    current_phase = crowd_state.get('phase', 'low')
+    base_intensity = crowd_state.get('base_intensity', 20)
     
-    current_hour = datetime.now().hour
-    current_phase = _crowd_state.get('phase', 'low')
-    base_intensity = _crowd_state.get('base_intensity', 20)
+    crowd_state['metro_ticks'] += 1
+    state_store.crowds.update("stadium", metro_ticks=crowd_state['metro_ticks'])
+    draws = stream("station", "mg_road_legacy", crowd_state['metro_ticks']).random(4).tolist()
     
     # Metro flow correlates with crowd phase
     if current_phase == 'building':
         # BUILDING: Many people arriving via metro → HIGH EXIT RATE
-        base_entry = random.randint(30, 45)
+        base_entry = uniform_int(draws[0], 30, 45)
         # Exit rate increases with crowd intensity
         exit_multiplier = min(base_intensity / 180, 1.0)  # 0.0 to 1.0
         base_exit = int(50 + (exit_multiplier * 50))  # 50-100
@@ -55,48 +55,48 @@ def simulate_metro_flow() -> Dict:
         
     elif current_phase == 'peak':
         # PEAK: Most people already at event → MODERATE FLOW
-        base_entry = random.randint(25, 40)
-        base_exit = random.randint(35, 55)
+        base_entry = uniform_int(draws[0], 25, 40)
+        base_exit = uniform_int(draws[1], 35, 55)
         status = "moderate"
         flow_reason = "Stable"
         
     elif current_phase == 'dispersing':
         # DISPERSING: Event ending, people leaving → HIGH EXIT RATE
         # Exit rate decreases as dispersal progresses
-        dispersal_progress = _crowd_state.get('phase_duration', 0) / 8.0  # 0.0 to 1.0
-        base_entry = random.randint(20, 35)
+        dispersal_progress = crowd_state.get('phase_duration', 0) / 8.0  # 0.0 to 1.0
+        base_entry = uniform_int(draws[0], 20, 35)
         base_exit = int(90 - (dispersal_progress * 40))  # 90 down to 50
         status = "high"
         flow_reason = "Departures"
         
     elif current_phase == 'low':
         # LOW: Minimal crowd → LOW FLOW
-        base_entry = random.randint(15, 25)
-        base_exit = random.randint(15, 25)
+        base_entry = uniform_int(draws[0], 15, 25)
+        base_exit = uniform_int(draws[1], 15, 25)
         status = "low"
         flow_reason = "Normal"
         
     else:
         # Fallback to time-based patterns
         if 8 <= current_hour <= 10:  # Morning rush
-            base_entry = random.randint(60, 90)
-            base_exit = random.randint(30, 50)
+            base_entry = uniform_int(draws[0], 60, 90)
+            base_exit = uniform_int(draws[1], 30, 50)
             status = "high"
             flow_reason = "Morning Rush"
         elif 17 <= current_hour <= 20:  # Evening rush
-            base_entry = random.randint(40, 60)
-            base_exit = random.randint(70, 100)
+            base_entry = uniform_int(draws[0], 40, 60)
+            base_exit = uniform_int(draws[1], 70, 100)
             status = "high"
             flow_reason = "Evening Rush"
         else:
-            base_entry = random.randint(20, 35)
-            base_exit = random.randint(20, 35)
+            base_entry = uniform_int(draws[0], 20, 35)
+            base_exit = uniform_int(draws[1], 20, 35)
             status = "moderate"
             flow_reason = "Normal"
     
     # Add natural variation
-    entry_rate = base_entry + random.randint(-5, 5)
-    exit_rate = base_exit + random.randint(-5, 5)
+    entry_rate = base_entry + uniform_int(draws[2], -5, 5)
+    exit_rate = base_exit + uniform_int(draws[3], -5, 5)
     
     # Ensure positive values
     entry_rate = max(10, entry_rate)
@@ -117,7 +117,7 @@ def simulate_metro_flow() -> Dict:
         "status": status,
         "flow_reason": flow_reason,
         "crowd_phase": current_phase,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": clock.now().isoformat()
     }
 
 
@@ -130,135 +130,105 @@ def simulate_crowd_density() -> Dict:
     - Then people gradually leave (dispersing phase)
     - Cycle repeats
     """
-    global _crowd_state
+    crowd_state = state_store.stadium_crowd()
     
-    current_hour = datetime.now().hour
-    grid_size = 10
-    grid = []
-    hotspots = []
+    current_hour = clock.now().hour
+    grid_size = zone_grid_size(ZONES["stadium"])
+    cell_size_deg = zone_cell_size_deg(ZONES["stadium"])
     
     # Event simulation (6 PM - 10 PM)
     is_event_time = 18 <= current_hour <= 22
     
     # ===== PHASE MANAGEMENT (Realistic Crowd Lifecycle) =====
-    _crowd_state['cycle_count'] += 1
-    _crowd_state['phase_duration'] += 1
+    crowd_state['cycle_count'] += 1
+    crowd_state['phase_duration'] += 1
     
-    current_phase = _crowd_state['phase']
+    current_phase = crowd_state['phase']
+    
+    # This tick's random values, drawn in bulk from the stadium stream
+    rng = stream("crowd", "stadium", crowd_state['cycle_count'])
+    phase_draws = rng.random(2).tolist()
+    peak_duration, low_duration = rng.integers([6, 4], [11, 9])
     
     # Phase transitions (each phase lasts ~5-10 updates = 2.5-5 minutes)
     if current_phase == 'building':
         # BUILDING: Gradually increase density
-        _crowd_state['base_intensity'] += random.uniform(8, 15)  # Slow buildup
+        crowd_state['base_intensity'] += 8 + 7 * phase_draws[0]  # Slow buildup
         
-        if _crowd_state['base_intensity'] > 180:
-            _crowd_state['phase'] = 'peak'
-            _crowd_state['phase_duration'] = 0
-            print(f"🔥 CROWD PHASE: BUILDING → PEAK (Density: {int(_crowd_state['base_intensity'])})")
+        if crowd_state['base_intensity'] > 180:
+            crowd_state['phase'] = 'peak'
+            crowd_state['phase_duration'] = 0
+            print(f"🔥 CROWD PHASE: BUILDING → PEAK (Density: {int(crowd_state['base_intensity'])})")
     
     elif current_phase == 'peak':
         # PEAK: Maintain high density with small variations
-        _crowd_state['base_intensity'] += random.uniform(-10, 10)
-        _crowd_state['base_intensity'] = min(250, _crowd_state['base_intensity'])
+        crowd_state['base_intensity'] += -10 + 20 * phase_draws[0]
+        crowd_state['base_intensity'] = min(250, crowd_state['base_intensity'])
         
-        if _crowd_state['phase_duration'] > random.randint(6, 10):  # Stay at peak for 3-5 min
-            _crowd_state['phase'] = 'dispersing'
-            _crowd_state['phase_duration'] = 0
-            print(f"⚠️ CROWD PHASE: PEAK → DISPERSING (Density: {int(_crowd_state['base_intensity'])})")
+        if crowd_state['phase_duration'] > peak_duration:  # Stay at peak for 3-5 min
+            crowd_state['phase'] = 'dispersing'
+            crowd_state['phase_duration'] = 0
+            print(f"⚠️ CROWD PHASE: PEAK → DISPERSING (Density: {int(crowd_state['base_intensity'])})")
     
     elif current_phase == 'dispersing':
         # DISPERSING: Gradually decrease as people leave
-        _crowd_state['base_intensity'] -= random.uniform(10, 20)  # Faster dispersal
+        crowd_state['base_intensity'] -= 10 + 10 * phase_draws[1]  # Faster dispersal
         
-        if _crowd_state['base_intensity'] < 40:
-            _crowd_state['phase'] = 'low'
-            _crowd_state['phase_duration'] = 0
-            _crowd_state['hotspot_centers'] = []  # Reset hotspots
-            print(f"✅ CROWD PHASE: DISPERSING → LOW (Density: {int(_crowd_state['base_intensity'])})")
+        if crowd_state['base_intensity'] < 40:
+            crowd_state['phase'] = 'low'
+            crowd_state['phase_duration'] = 0
+            crowd_state['hotspot_centers'] = []  # Reset hotspots
+            print(f"✅ CROWD PHASE: DISPERSING → LOW (Density: {int(crowd_state['base_intensity'])})")
     
     elif current_phase == 'low':
         # LOW: Minimal crowd, preparing for next buildup
-        _crowd_state['base_intensity'] = max(10, _crowd_state['base_intensity'] - 2)
+        crowd_state['base_intensity'] = max(10, crowd_state['base_intensity'] - 2)
         
-        if _crowd_state['phase_duration'] > random.randint(4, 8):  # Low period 2-4 min
-            _crowd_state['phase'] = 'building'
-            _crowd_state['phase_duration'] = 0
+        if crowd_state['phase_duration'] > low_duration:  # Low period 2-4 min
+            crowd_state['phase'] = 'building'
+            crowd_state['phase_duration'] = 0
             # Create new hotspot locations for next cycle
-            num_hotspots = random.randint(2, 4)
-            _crowd_state['hotspot_centers'] = [
-                {
-                    'i': random.randint(2, grid_size - 3),
-                    'j': random.randint(2, grid_size - 3),
-                }
-                for _ in range(num_hotspots)
+            num_hotspots = int(rng.integers(2, 5))
+            crowd_state['hotspot_centers'] = [
+                {'i': int(i), 'j': int(j)}
+                for i, j in rng.integers(2, grid_size - 2, size=(num_hotspots, 2))
             ]
             print(f"🟢 CROWD PHASE: LOW → BUILDING (Starting new cycle with {num_hotspots} hotspots)")
     
     # ===== GENERATE DENSITY GRID =====
     
     # Ensure we have hotspot centers
-    if not _crowd_state['hotspot_centers']:
-        num_hotspots = random.randint(2, 3)
-        _crowd_state['hotspot_centers'] = [
-            {
-                'i': random.randint(2, grid_size - 3),
-                'j': random.randint(2, grid_size - 3),
-            }
-            for _ in range(num_hotspots)
+    if not crowd_state['hotspot_centers']:
+        num_hotspots = int(rng.integers(2, 4))
+        crowd_state['hotspot_centers'] = [
+            {'i': int(i), 'j': int(j)}
+            for i, j in rng.integers(2, grid_size - 2, size=(num_hotspots, 2))
         ]
     
+    state_store.save_stadium_crowd(crowd_state)
+    
     # Calculate intensity for each hotspot based on phase
-    base_intensity = _crowd_state['base_intensity']
+    base_intensity = crowd_state['base_intensity']
     
-    for i in range(grid_size):
-        row = []
-        for j in range(grid_size):
-            # Start with very low ambient density
-            density = random.randint(0, 5)
-            
-            # Add influence from each hotspot
-            for hotspot in _crowd_state['hotspot_centers']:
-                distance = math.sqrt((i - hotspot['i'])**2 + (j - hotspot['j'])**2)
-                
-                # Intensity decreases with distance (inverse square law)
-                if distance < 0.5:
-                    density += base_intensity
-                elif distance < 2:
-                    falloff = base_intensity * (1 - distance / 2) ** 2
-                    density += int(falloff * random.uniform(0.7, 1.0))
-                elif distance < 4:
-                    falloff = base_intensity * (1 - distance / 4) ** 1.5
-                    density += int(falloff * random.uniform(0.3, 0.6))
-                elif distance < 6:
-                    falloff = base_intensity * (1 - distance / 6)
-                    density += int(falloff * random.uniform(0.1, 0.3))
-            
-            # Add natural variation
-            density = int(density * random.uniform(0.9, 1.1))
-            density = max(0, min(300, density))
-            
-            row.append(density)
-            
-            # Track significant hotspots
-            if density > 80:
-                center_i, center_j = grid_size // 2, grid_size // 2
-                lat_offset = (i - center_i) * 0.002
-                lon_offset = (j - center_j) * 0.002
-                hotspots.append({
-                    "lat": STADIUM_LOCATION[0] + lat_offset,
-                    "lon": STADIUM_LOCATION[1] + lon_offset,
-                    "density": density
-                })
-        
-        grid.append(row)
+    # Ambient density plus precomputed falloff stamps for every hotspot
+    density = rng.integers(0, 6, size=(grid_size, grid_size)).astype(np.float64)
+    density += kernel_cache.accumulate("piecewise", grid_size, crowd_state['hotspot_centers'],
+                                       base_intensity, rng)
+    
+    # Add natural variation
+    density = np.trunc(density * rng.uniform(0.9, 1.1, size=(grid_size, grid_size)))
+    density = np.clip(density, 0, 300).astype(np.int64)
+    grid = density.tolist()
     
     # Calculate statistics
-    flat_grid = [val for row in grid for val in row]
-    max_density = max(flat_grid)
-    avg_density = int(sum(flat_grid) / len(flat_grid))
+    max_density = int(density.max())
+    avg_density = int(density.sum() / density.size)
     
-    # Sort hotspots by density
-    hotspots_sorted = sorted(hotspots, key=lambda x: x['density'], reverse=True)[:5]
+    # Significant hotspots: one per blob of cells above 80, strongest first
+    hotspots_sorted = hotspot_extractor.extract(
+        density, 80, 5, STADIUM_LOCATION, cell_size_deg,
+        origin=grid_size // 2, value_key="density"
+    )
     
     # Phase-based status
     status = {
@@ -279,7 +249,7 @@ def simulate_crowd_density() -> Dict:
         "is_event_time": is_event_time,
         "phase": current_phase,
         "status": status,
-        "timestamp": datetime.now().isoformat()
+        "timestamp": clock.now().isoformat()
     }
 
 
@@ -306,7 +276,7 @@ def check_alerts(density_data: Dict, metro_data: Dict) -> List[Dict]:
                 "threshold": DENSITY_THRESHOLD_CRITICAL,
                 "recommendation": "Immediate crowd control measures required",
                 "location": STADIUM_LOCATION,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": clock.now().isoformat()
             })
         elif max_density > DENSITY_THRESHOLD_HIGH:
             alerts.append({
@@ -319,7 +289,7 @@ def check_alerts(density_data: Dict, metro_data: Dict) -> List[Dict]:
                 "threshold": DENSITY_THRESHOLD_HIGH,
                 "recommendation": "Monitor situation closely",
                 "location": STADIUM_LOCATION,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": clock.now().isoformat()
             })
     
     # Check metro flow
@@ -337,7 +307,7 @@ def check_alerts(density_data: Dict, metro_data: Dict) -> List[Dict]:
                 "threshold": METRO_FLOW_THRESHOLD,
                 "recommendation": "Prepare for crowd influx near metro",
                 "location": METRO_LOCATION,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": clock.now().isoformat()
             })
     
     # Combined alert: high metro exit + nearby high density
@@ -354,7 +324,7 @@ def check_alerts(density_data: Dict, metro_data: Dict) -> List[Dict]:
             "threshold": "Multiple thresholds exceeded",
             "recommendation": "Deploy crowd management personnel immediately",
             "location": STADIUM_LOCATION,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": clock.now().isoformat()
         })
     
     return alerts
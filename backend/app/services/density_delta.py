@@ -0,0 +1,120 @@
+"""
+Density Delta Encoder
+Turns successive multi_zone_density_update messages into a numbered stream
+of keyframes and deltas for clients that opt in to delta mode
+
+One published view of every zone grid is shared by all delta clients. Each
+tick, cells that moved more than the tolerance away from that view are sent
+as runs of new values and written into the view; the rest stay as they are,
+so error never accumulates past the tolerance. A zone where most cells
+moved is sent whole instead. A keyframe carries the whole
+view and is what a client gets when it joins, asks for one, or misses a
+frame. Every `keyframe_interval` frames the view is reset to the exact
+grids and everyone gets a keyframe.
+"""
+
+import os
+import numpy as np
+from typing import Dict, List, Optional
+
+
+class DeltaFrames:
+    """
+    One tick of the stream: the delta from the previous frame (None on a
+    periodic keyframe) and the keyframe, which is only built if someone needs it
+    """
+
+    def __init__(self, seq: int, message: Dict, key_zones: Dict, delta: Optional[Dict]):
+        self.seq = seq
+        self.delta = delta
+        self._message = message
+        self._key_zones = key_zones
+        self._keyframe = None
+
+    @property
+    def keyframe(self) -> Dict:
+        if self._keyframe is None:
+            zones = {
+                zone_id: zone if isinstance(zone, dict) else {**zone[0], "grid": zone[1].tolist()}
+                for zone_id, zone in self._key_zones.items()
+            }
+            self._keyframe = {**self._message, "seq": self.seq, "encoding": "keyframe", "zones": zones}
+        return self._keyframe
+
+
+def grid_runs(cells: np.ndarray, values: np.ndarray) -> List[List]:
+    """Changed cells as [[start, [v, v, ...]], ...] runs of consecutive row-major indices"""
+    if cells.size == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(cells) != 1) + 1
+    starts = np.concatenate(([0], breaks))
+    stops = np.concatenate((breaks, [cells.size]))
+    values = values.tolist()
+    return [[int(cells[a]), values[a:b]] for a, b in zip(starts, stops)]
+
+
+def apply_runs(grid: List[List], runs: List[List]) -> List[List]:
+    """Reference decoder: apply a zone's grid_delta runs to its grid in place"""
+    width = len(grid[0]) if grid else 0
+    for start, values in runs:
+        for offset, value in enumerate(values):
+            i, j = divmod(start + offset, width)
+            grid[i][j] = value
+    return grid
+
+
+class DensityDeltaEncoder:
+    """Keeps the published grid view and the sequence number of the density stream"""
+
+    def __init__(self, tolerance: float = None, keyframe_interval: int = None):
+        self.tolerance = float(os.getenv("DENSITY_DELTA_TOLERANCE", 2) if tolerance is None else tolerance)
+        self.keyframe_interval = max(1, int(keyframe_interval or os.getenv("DENSITY_KEYFRAME_INTERVAL", 20)))
+        self.seq = 0
+        self.reset()
+
+    def reset(self):
+        """Forget the published view; the next frame is a keyframe (sequence numbers carry on)"""
+        self._views: Dict[str, np.ndarray] = {}
+        self._since_keyframe = 0
+
+    def encode(self, message: Dict) -> DeltaFrames:
+        """Advance the stream by one multi_zone_density_update message"""
+        self.seq += 1
+        periodic = not self._views or self._since_keyframe + 1 >= self.keyframe_interval
+        self._since_keyframe = 0 if periodic else self._since_keyframe + 1
+
+        key_zones, delta_zones = {}, {}
+        views = {}
+        for zone_id, zone in message["zones"].items():
+            grid = np.asarray(zone["grid"])
+            view = self._views.get(zone_id)
+
+            if periodic or view is None or view.shape != grid.shape:
+                # Keyframe, new zone or new grid size: the zone starts over from the exact grid
+                view = grid.copy()
+                delta_zones[zone_id] = key_zones[zone_id] = zone
+            else:
+                fields = {name: value for name, value in zone.items() if name != "grid"}
+                flat_grid = grid.reshape(-1)
+                cells = np.flatnonzero(np.abs(flat_grid - view.reshape(-1)) > self.tolerance)
+                runs = grid_runs(cells, flat_grid[cells])
+                if cells.size + 2 * len(runs) >= flat_grid.size:
+                    # Most of the grid moved: the full grid is no bigger, and exact
+                    view = grid.copy()
+                    delta_zones[zone_id] = key_zones[zone_id] = zone
+                else:
+                    view = view.copy()   # the previous frame's keyframe may still be built from the old one
+                    view.reshape(-1)[cells] = flat_grid[cells]
+                    delta_zones[zone_id] = {**fields, "grid_delta": {"runs": runs}}
+                    key_zones[zone_id] = (fields, view)
+            views[zone_id] = view
+        self._views = views
+
+        if periodic:
+            return DeltaFrames(self.seq, message, key_zones, None)
+        delta = {**message, "seq": self.seq, "encoding": "delta", "base_seq": self.seq - 1, "zones": delta_zones}
+        return DeltaFrames(self.seq, message, key_zones, delta)
+
+
+# Global encoder for the multi-zone density stream
+density_deltas = DensityDeltaEncoder()
@@ -2,12 +2,15 @@
 First Responders Service
 Simulates emergency vehicles (Police, Ambulance, Fire Trucks) moving through Bengaluru
 Based on BMTC bus movement patterns but representing emergency response vehicles
+Responders live in the state store's responder table and move in one array pass
 """
 
-import random
-from datetime import datetime
+import numpy as np
 from typing import Dict, List
-from app.utils.constants import ZONES
+from app.utils import clock
+from app.utils.rng import stream, uniform_ints
+from app.services.zone_registry import zone_registry
+from app.services.state_store import state_store
 
 
 # First Responder Types with their properties
@@ -42,99 +45,124 @@ RESPONDER_TYPES = {
     }
 }
 
-# Convert ZONES to patrol zones format
+RESPONDER_STATUSES = ["patrolling", "responding", "on-scene", "available"]
+
+# Convert registry zones to patrol zones format
 def get_patrol_zones():
-    """Convert constants.ZONES to patrol zones with priority based on capacity"""
-    patrol_zones = []
-    for zone_id, zone_config in ZONES.items():
-        # Assign priority based on zone type and capacity
-        if zone_config["type"] in ["event_venue", "transit"]:
-            priority = "high"
-        elif zone_config["capacity"] > 50000:
-            priority = "high"
-        elif zone_config["capacity"] > 30000:
-            priority = "medium"
-        else:
-            priority = "low"
-        
-        patrol_zones.append({
+    """Convert the zone registry to patrol zones with priority based on type and capacity"""
+    registry = zone_registry
+    
+    # Assign priority based on zone type and capacity (whole registry at once)
+    busy_type = np.isin(registry.types, ["event_venue", "transit"])[registry.type_code]
+    priority = np.select(
+        [busy_type | (registry.capacity > 50000), registry.capacity > 30000],
+        ["high", "medium"],
+        "low"
+    )
+    
+    return [
+        {
             "id": zone_id,
-            "name": zone_config["name"],
-            "lat": zone_config["center"][0],
-            "lon": zone_config["center"][1],
-            "priority": priority,
-            "type": zone_config["type"]
-        })
-    return patrol_zones
+            "name": registry.zones[zone_id]["name"],
+            "lat": float(registry.lat[i]),
+            "lon": float(registry.lon[i]),
+            "priority": str(priority[i]),
+            "type": registry.zones[zone_id]["type"]
+        }
+        for i, zone_id in enumerate(registry.ids)
+    ]
 
 PATROL_ZONES = get_patrol_zones()
+PATROL_LAT = np.array([zone["lat"] for zone in PATROL_ZONES])
+PATROL_LON = np.array([zone["lon"] for zone in PATROL_ZONES])
+
+# Type order used by the responder table's type_code, with each type's speed range
+RESPONDER_TYPE_NAMES = list(RESPONDER_TYPES)
+_SPEED_LOW = np.array([RESPONDER_TYPES[t]["speed_range"][0] for t in RESPONDER_TYPE_NAMES])
+_SPEED_HIGH = np.array([RESPONDER_TYPES[t]["speed_range"][1] for t in RESPONDER_TYPE_NAMES])
+
+
+def _responder_roster() -> List[Dict]:
+    """Every responder's table key, type, display id and vehicle id (fixed by RESPONDER_TYPES)"""
+    roster = []
+    for responder_type, config in RESPONDER_TYPES.items():
+        for i in range(config["count"]):
+            responder_id = len(roster) + 1
+            roster.append({
+                "key": f"{responder_type}_{i+1}",
+                "type": responder_type,
+                "id": f"{responder_type.upper()}-{str(i+1).zfill(2)}",
+                "vehicle_id": f"KA01-{responder_type[:2].upper()}-{1000 + responder_id}"
+            })
+    return roster
 
-# Global state to track responder positions (simulates continuous movement)
-_responder_state = {}
+RESPONDER_ROSTER = _responder_roster()
 
 
 def initialize_responders():
     """Initialize responder positions if not already done"""
-    global _responder_state
-    
-    if not _responder_state:
-        responder_id = 0
-        for responder_type, config in RESPONDER_TYPES.items():
-            for i in range(config["count"]):
-                responder_id += 1
-                # Assign each responder to a patrol zone
-                zone = PATROL_ZONES[responder_id % len(PATROL_ZONES)]
-                
-                _responder_state[f"{responder_type}_{i+1}"] = {
-                    "id": f"{responder_type.upper()}-{str(i+1).zfill(2)}",
-                    "type": responder_type,
-                    "vehicle_id": f"KA01-{responder_type[:2].upper()}-{1000 + responder_id}",
-                    "lat": zone["lat"] + random.uniform(-0.01, 0.01),
-                    "lon": zone["lon"] + random.uniform(-0.01, 0.01),
-                    "target_zone": zone,
-                    "status": "patrolling",
-                    "speed": random.randint(*config["speed_range"]),
-                    "last_update": datetime.now()
-                }
+    responders = state_store.responders
+    
+    if not len(responders):
+        # Assign each responder to a patrol zone
+        zones = [(number + 1) % len(PATROL_ZONES) for number in range(len(RESPONDER_ROSTER))]
+        draws = np.array([stream("responder", entry["key"], 0).random(3) for entry in RESPONDER_ROSTER])
+        type_code = np.array([RESPONDER_TYPE_NAMES.index(entry["type"]) for entry in RESPONDER_ROSTER])
+        
+        responders.extend(
+            [entry["key"] for entry in RESPONDER_ROSTER],
+            type_code=type_code,
+            status=RESPONDER_STATUSES.index("patrolling"),
+            lat=PATROL_LAT[zones] - 0.01 + 0.02 * draws[:, 0],
+            lon=PATROL_LON[zones] - 0.01 + 0.02 * draws[:, 1],
+            speed=uniform_ints(draws[:, 2], _SPEED_LOW[type_code], _SPEED_HIGH[type_code]),
+            target_zone=zones,
+            last_update=clock.now().timestamp()
+        )
 
 
 def update_responder_positions():
     """Update responder positions to simulate realistic movement"""
-    global _responder_state
+    responders = state_store.responders
     
-    for key, responder in _responder_state.items():
-        # Simulate movement towards target zone with some randomness
-        target = responder["target_zone"]
-        current_lat = responder["lat"]
-        current_lon = responder["lon"]
-        
-        # Calculate direction to target with drift
-        lat_diff = target["lat"] - current_lat
-        lon_diff = target["lon"] - current_lon
-        
-        # Add random patrol movement (0.001 degrees ≈ 100 meters)
-        move_distance = 0.002
-        
-        # If far from target, move towards it; otherwise patrol randomly
-        if abs(lat_diff) > 0.02 or abs(lon_diff) > 0.02:
-            # Move towards target
-            responder["lat"] += lat_diff * 0.1 + random.uniform(-move_distance, move_distance)
-            responder["lon"] += lon_diff * 0.1 + random.uniform(-move_distance, move_distance)
-        else:
-            # Random patrol within zone
-            responder["lat"] += random.uniform(-move_distance, move_distance)
-            responder["lon"] += lon_diff * random.uniform(-move_distance, move_distance)
-        
-        # Randomly change target zone (simulates responding to calls)
-        if random.random() < 0.05:  # 5% chance to change zone
-            responder["target_zone"] = random.choice(PATROL_ZONES)
-            responder["status"] = random.choice(["patrolling", "responding", "on-scene", "available"])
-        
-        # Vary speed slightly
-        config = RESPONDER_TYPES[responder["type"]]
-        responder["speed"] = random.randint(*config["speed_range"])
-        
-        responder["last_update"] = datetime.now()
+    # Each responder's random values for this tick, from its own stream
+    responders['tick'] += 1
+    draws = np.array([
+        stream("responder", key, int(tick)).random(6)
+        for key, tick in zip(responders.keys, responders['tick'])
+    ]).reshape(-1, 6)
+    
+    # Simulate movement towards target zone with some randomness
+    lat, lon = responders['lat'], responders['lon']
+    target = responders['target_zone']
+    
+    # Calculate direction to target with drift
+    lat_diff = PATROL_LAT[target] - lat
+    lon_diff = PATROL_LON[target] - lon
+    
+    # Add random patrol movement (0.001 degrees ≈ 100 meters)
+    move_distance = 0.002
+    lat_drift = move_distance * (2 * draws[:, 0] - 1)
+    
+    # If far from target, move towards it; otherwise patrol randomly
+    far = (np.abs(lat_diff) > 0.02) | (np.abs(lon_diff) > 0.02)
+    lat += np.where(far, lat_diff * 0.1 + lat_drift, lat_drift)
+    lon += np.where(
+        far,
+        lon_diff * 0.1 + move_distance * (2 * draws[:, 1] - 1),
+        lon_diff * move_distance * (2 * draws[:, 1] - 1)
+    )
+    
+    # Randomly change target zone (simulates responding to calls)
+    change = draws[:, 2] < 0.05  # 5% chance to change zone
+    target[change] = uniform_ints(draws[change, 3], 0, len(PATROL_ZONES) - 1)
+    responders['status'][change] = uniform_ints(draws[change, 4], 0, len(RESPONDER_STATUSES) - 1)
+    
+    # Vary speed slightly
+    type_code = responders['type_code']
+    responders['speed'][...] = uniform_ints(draws[:, 5], _SPEED_LOW[type_code], _SPEED_HIGH[type_code])
+    
+    responders['last_update'][...] = clock.now().timestamp()
 
 
 async def get_first_responders_data() -> Dict:
@@ -145,39 +173,41 @@ async def get_first_responders_data() -> Dict:
     initialize_responders()
     update_responder_positions()
     
+    responders = state_store.responders.snapshot()
     responders_list = []
     
-    for key, responder in _responder_state.items():
-        config = RESPONDER_TYPES[responder["type"]]
+    for entry, type_code, lat, lon, speed, status, target in zip(
+        RESPONDER_ROSTER, responders['type_code'], responders['lat'], responders['lon'],
+        responders['speed'], responders['status'], responders['target_zone']
+    ):
+        config = RESPONDER_TYPES[entry["type"]]
         
         responders_list.append({
-            "id": responder["id"],
-            "vehicle_id": responder["vehicle_id"],
-            "type": responder["type"],
+            "id": entry["id"],
+            "vehicle_id": entry["vehicle_id"],
+            "type": entry["type"],
             "icon": config["icon"],
             "color": config["color"],
             "name": config["name"],
-            "lat": responder["lat"],
-            "lon": responder["lon"],
-            "speed": responder["speed"],
-            "status": responder["status"],
-            "zone": responder["target_zone"]["name"],
-            "timestamp": datetime.now().isoformat()
+            "lat": float(lat),
+            "lon": float(lon),
+            "speed": int(speed),
+            "status": RESPONDER_STATUSES[status],
+            "zone": PATROL_ZONES[target]["name"],
+            "timestamp": clock.now().isoformat()
         })
     
     # Sort by type for better organization
     responders_list.sort(key=lambda x: (x["type"], x["id"]))
     
+    counts = np.bincount(responders['type_code'], minlength=len(RESPONDER_TYPE_NAMES))
     return {
         "type": "first_responders_update",
         "count": len(responders_list),
         "responders": responders_list,
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": clock.now().isoformat(),
         "active_units": {
-            "police": sum(1 for r in responders_list if r["type"] == "police"),
-            "ambulance": sum(1 for r in responders_list if r["type"] == "ambulance"),
-            "fire": sum(1 for r in responders_list if r["type"] == "fire"),
-            "emergency": sum(1 for r in responders_list if r["type"] == "emergency")
+            responder_type: int(counts[code]) for code, responder_type in enumerate(RESPONDER_TYPE_NAMES)
         }
     }
 
@@ -200,23 +230,24 @@ def get_responders_near_location(lat: float, lon: float, radius: float = 0.01) -
     radius in degrees (0.01 ≈ 1km)
     """
     initialize_responders()
-    nearby = []
+    responders = state_store.responders
     
-    for key, responder in _responder_state.items():
-        distance = ((responder["lat"] - lat) ** 2 + (responder["lon"] - lon) ** 2) ** 0.5
-        if distance <= radius:
-            config = RESPONDER_TYPES[responder["type"]]
-            nearby.append({
-                "id": responder["id"],
-                "type": responder["type"],
-                "name": config["name"],
-                "icon": config["icon"],
-                "distance_km": distance * 111,  # Rough conversion to km
-                "eta_minutes": (distance * 111) / (responder["speed"] / 60),
-                "status": responder["status"]
-            })
+    distance = ((responders.view('lat') - lat) ** 2 + (responders.view('lon') - lon) ** 2) ** 0.5
+    nearby = []
+    for k in np.flatnonzero(distance <= radius):
+        entry = RESPONDER_ROSTER[k]
+        config = RESPONDER_TYPES[entry["type"]]
+        speed = int(responders['speed'][k])
+        nearby.append({
+            "id": entry["id"],
+            "type": entry["type"],
+            "name": config["name"],
+            "icon": config["icon"],
+            "distance_km": float(distance[k]) * 111,  # Rough conversion to km
+            "eta_minutes": (float(distance[k]) * 111) / (speed / 60),
+            "status": RESPONDER_STATUSES[responders['status'][k]]
+        })
     
     # Sort by distance
     nearby.sort(key=lambda x: x["distance_km"])
     return nearby
-
@@ -0,0 +1,216 @@
+"""
+Crowd Flow Model
+Cellular automaton in which people move between neighboring grid cells
+
+Every zone grid gets a static potential field: the distance to its nearest
+attractor (stadium gates, metro stations, or the zone center). Each tick a
+share of every cell's crowd flows to its downhill neighbors, or uphill and out
+across the grid edge while a zone disperses. A cell never receives more than
+its free capacity. All zones are stacked into one zero-padded 3D array, so a
+tick is a handful of whole-array stencil operations however many zones exist.
+"""
+
+import numpy as np
+from typing import Dict, Tuple
+from app.utils.constants import STADIUM_GATES
+from app.services.density_engine import (
+    METERS_PER_DEGREE, REFERENCE_RESOLUTION_M, zone_grid_size, zone_resolution
+)
+from app.services.metro_service import METRO_STATIONS
+from app.services.zone_registry import zone_registry
+from app.services.state_store import PHASES
+
+# Most people a cell holds (same ceiling as the stadium density grid)
+CELL_CAPACITY = 300
+
+# Crowd on site per unit of phase intensity, per reference-sized cell area
+MASS_PER_INTENSITY = 40
+
+# Share of the missing crowd that arrives in one tick
+ARRIVAL_SHARE = 0.3
+
+# Per phase: (direction, share of each cell that moves per tick)
+# +1 flows toward attractors, -1 flows away from them and out of the zone
+PHASE_FLOW = {
+    "building": (1, 0.3),
+    "peak": (1, 0.1),
+    "dispersing": (-1, 0.4),
+    "low": (-1, 0.2)
+}
+
+# PHASE_FLOW as arrays indexed by a phase column's code
+_PHASE_DIRECTION = np.array([PHASE_FLOW[phase][0] for phase in PHASES], dtype=np.float64)
+_PHASE_RATE = np.array([PHASE_FLOW[phase][1] for phase in PHASES], dtype=np.float64)
+
+# Neighbor offsets (row, col): up, down, left, right
+_NEIGHBORS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def _shifted(array: np.ndarray, offset: Tuple[int, int]) -> np.ndarray:
+    """View of a padded (zones, P, P) array, aligned so [:, i, j] is the neighbor of interior cell (i, j)"""
+    di, dj = offset
+    size = array.shape[1]
+    return array[:, 1 + di:size - 1 + di, 1 + dj:size - 1 + dj]
+
+
+class FlowModel:
+    """
+    Density fields for every zone, advanced by a shared stencil
+    Zone z occupies [z, 1:g+1, 1:g+1] of the padded arrays; everything else is outside
+    """
+
+    def __init__(self, zones: Dict = None):
+        self.zones = zones or zone_registry.zones
+        self.zone_ids = list(self.zones)
+        self.zone_index = {zone_id: index for index, zone_id in enumerate(self.zone_ids)}
+        self.grid_sizes = np.array([zone_grid_size(self.zones[z]) for z in self.zone_ids], dtype=np.int64)
+        self.resolutions = np.array([zone_resolution(self.zones[z]) for z in self.zone_ids], dtype=np.float64)
+
+        count, padded = len(self.zone_ids), int(self.grid_sizes.max()) + 2
+        self.density = np.zeros((count, padded, padded), dtype=np.float64)
+        self.inside = np.zeros((count, padded, padded), dtype=bool)
+        self.potential = np.zeros((count, padded, padded), dtype=np.float64)
+        self.entries = np.zeros((count, padded, padded), dtype=bool)
+
+        for index, zone_id in enumerate(self.zone_ids):
+            self._build_zone(index, self.zones[zone_id])
+
+        # Outside cells sit above every inside potential, so dispersing crowds drain out
+        self.potential[~self.inside] = self.potential[self.inside].max() + self.resolutions.max()
+        self.cell_mass = MASS_PER_INTENSITY * (REFERENCE_RESOLUTION_M / self.resolutions) ** 2
+
+    def _cell_of(self, index: int, lat: float, lon: float) -> Tuple[int, int]:
+        """Padded-array cell of a location in a zone's grid (may fall outside it)"""
+        center = self.zones[self.zone_ids[index]]["center"]
+        size, resolution = self.grid_sizes[index], self.resolutions[index]
+        row = int(np.floor((lat - center[0]) * METERS_PER_DEGREE / resolution + size / 2))
+        col = int(np.floor((lon - center[1]) * METERS_PER_DEGREE / resolution + size / 2))
+        return row + 1, col + 1
+
+    def _build_zone(self, index: int, zone_config: Dict):
+        """Inside mask, attractor potential and entry cells for one zone"""
+        size, resolution = self.grid_sizes[index], self.resolutions[index]
+        self.inside[index, 1:size + 1, 1:size + 1] = True
+
+        attractors = []
+        for lat, lon in STADIUM_GATES + [station["location"] for station in METRO_STATIONS.values()]:
+            row, col = self._cell_of(index, lat, lon)
+            if 1 <= row <= size and 1 <= col <= size:
+                attractors.append((row, col))
+        if not attractors:
+            attractors.append(self._cell_of(index, *zone_config["center"]))
+
+        # Distance (meters) from every cell to its nearest attractor
+        rows, cols = np.indices((size, size)) + 1
+        points = np.array(attractors, dtype=np.float64)
+        distance = np.sqrt(
+            (rows[None] - points[:, 0, None, None]) ** 2 + (cols[None] - points[:, 1, None, None]) ** 2
+        ).min(axis=0) * resolution
+        self.potential[index, 1:size + 1, 1:size + 1] = distance
+
+        # People arrive over the grid edge and at metro stations
+        edge = np.zeros((size, size), dtype=bool)
+        edge[[0, -1], :] = True
+        edge[:, [0, -1]] = True
+        self.entries[index, 1:size + 1, 1:size + 1] = edge
+        for station in METRO_STATIONS.values():
+            row, col = self._cell_of(index, *station["location"])
+            if 1 <= row <= size and 1 <= col <= size:
+                self.entries[index, row, col] = True
+
+    def target_mass(self, base_intensity: np.ndarray) -> np.ndarray:
+        """People each zone should hold for its current phase intensity"""
+        return np.maximum(0.0, base_intensity) * self.cell_mass
+
+    def arrive(self, targets: np.ndarray, arriving: np.ndarray):
+        """Add part of each arriving zone's missing crowd at its entry cells, within free capacity"""
+        current = self.density.sum(axis=(1, 2))
+        missing = np.where(arriving, np.maximum(0.0, targets - current), 0.0) * ARRIVAL_SHARE
+
+        free = np.where(self.entries, CELL_CAPACITY - self.density, 0.0).clip(min=0)
+        free_total = free.sum(axis=(1, 2))
+        share = np.divide(missing, free_total, out=np.zeros_like(missing), where=free_total > 0)
+        self.density += free * np.minimum(1.0, share)[:, None, None]
+
+    def flow(self, direction: np.ndarray, rate: np.ndarray) -> np.ndarray:
+        """
+        One stencil pass: move crowd to lower-potential neighbors, capped by their free space
+        Returns the number of people that left each zone over its edge
+        """
+        phi = self.potential * direction[:, None, None]
+        center = phi[:, 1:-1, 1:-1]
+        density = self.density[:, 1:-1, 1:-1]
+        inside = self.inside[:, 1:-1, 1:-1]
+        # Only dispersing zones may push people outside
+        may_exit = (direction < 0)[:, None, None]
+
+        drops = np.stack([
+            np.maximum(0.0, center - _shifted(phi, offset)) *
+            (_shifted(self.inside, offset) | may_exit)
+            for offset in _NEIGHBORS
+        ])
+        total_drop = drops.sum(axis=0)
+        moving = density * rate[:, None, None] * inside
+        outflow = drops * np.divide(moving, total_drop, out=np.zeros_like(moving), where=total_drop > 0)
+
+        # Receivers accept at most their free capacity; outside cells take everyone
+        inflow = np.zeros_like(self.density)
+        for offset, out in zip(_NEIGHBORS, outflow):
+            _shifted(inflow, offset)[...] += out
+        free = np.maximum(0.0, CELL_CAPACITY - self.density)
+        accept = np.where(
+            self.inside,
+            np.minimum(1.0, np.divide(free, inflow, out=np.ones_like(free), where=inflow > 0)),
+            1.0
+        )
+        outflow *= np.stack([_shifted(accept, offset) for offset in _NEIGHBORS])
+
+        inflow[...] = 0.0
+        for offset, out in zip(_NEIGHBORS, outflow):
+            _shifted(inflow, offset)[...] += out
+        self.density[:, 1:-1, 1:-1] -= outflow.sum(axis=0)
+        self.density += inflow
+
+        departed = np.where(self.inside, 0.0, self.density).sum(axis=(1, 2))
+        self.density[~self.inside] = 0.0
+        return departed
+
+    def step(self, zones: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Advance every zone by a tick; returns integer grids keyed by zone id
+        `zones` are the zone table's columns, row-aligned with the model's zones
+        """
+        direction = _PHASE_DIRECTION[zones['phase']]
+        rate = _PHASE_RATE[zones['phase']]
+
+        self.arrive(self.target_mass(zones['base_intensity']), direction > 0)
+        self.flow(direction, rate)
+
+        return {zone_id: self.grid(zone_id) for zone_id in self.zone_ids}
+
+    def grid(self, zone_id: str) -> np.ndarray:
+        """A zone's current density field as an int64 grid"""
+        index = self.zone_index[zone_id]
+        size = self.grid_sizes[index]
+        return np.rint(self.density[index, 1:size + 1, 1:size + 1]).astype(np.int64)
+
+    def peak_cells(self, count: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Densest cells of every zone as hotspot centers, strongest first
+        Returns (centers, counts): centers[z, k] is the (i, j) of zone z's k-th
+        peak for k < counts[z]; empty zones have none
+        """
+        cells = np.rint(self.density[:, 1:-1, 1:-1]).astype(np.int64)
+        zones, width = cells.shape[0], cells.shape[2]
+        flat = cells.reshape(zones, -1)
+
+        # Unique keys (denser first, then lower cell index) make the partial selection exact
+        keys = flat * -flat.shape[1] + np.arange(flat.shape[1])
+        count = min(count, flat.shape[1])
+        top = np.argpartition(keys, count - 1, axis=1)[:, :count]
+        top = np.take_along_axis(top, np.argsort(np.take_along_axis(keys, top, axis=1), axis=1), axis=1)
+
+        found = np.take_along_axis(flat, top, axis=1) > 0
+        centers = np.stack(np.divmod(top, width), axis=-1).astype(np.float64)
+        centers[~found] = 0.0
+        return centers, found.sum(axis=1)
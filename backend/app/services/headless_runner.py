@@ -0,0 +1,221 @@
+"""
+Headless Simulation Runner
+Drives the density, metro and first-responder simulations on a virtual clock
+as fast as the CPU allows, writing every tick to a JSON Lines file
+
+Usage (from backend/):
+    python -m app.services.headless_runner --hours 6 --output event_night.jsonl
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gzip
+import heapq
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from app.utils import clock
+from app.utils.clock import VirtualClock
+from app.utils.rng import rng_streams, set_simulation_seed
+from app.services.multi_zone_simulation import (
+    simulate_all_zones_density, check_multi_zone_alerts, configure_zone_executor,
+    get_zone_executor_config, reset_zone_simulation
+)
+from app.services.metro_service import simulate_all_metro_stations, legacy_metro_update
+from app.services.first_responders_service import get_first_responders_data
+from app.services.bmtc_service import reset_demo_buses
+from app.services.state_store import state_store
+
+# Same cadence as the background tasks in main.py (seconds)
+DEFAULT_INTERVALS = {
+    "density": 30,
+    "metro": 60,
+    "responders": 15
+}
+
+
+def _open_output(path: str):
+    """Open the tick log for writing (gzip when the path ends in .gz)"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "wt", encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+class HeadlessRunner:
+    """
+    Runs the simulators against a VirtualClock
+    Each job fires on its own interval of virtual seconds; the clock jumps
+    straight to the next due tick instead of sleeping
+    """
+
+    def __init__(self, duration_hours: float = 6.0, output_path: Optional[str] = None,
+                 start: Optional[datetime] = None, intervals: Optional[Dict[str, float]] = None,
+                 quiet: bool = True, seed: Optional[int] = None, zone_mode: Optional[str] = None,
+                 workers: Optional[int] = None, incremental: Optional[bool] = None,
+                 model: Optional[str] = None):
+        self.duration_seconds = duration_hours * 3600
+        self.output_path = output_path
+        self.start = start or datetime.now().replace(hour=17, minute=0, second=0, microsecond=0)
+        self.intervals = {**DEFAULT_INTERVALS, **(intervals or {})}
+        self.quiet = quiet
+        self.seed = seed
+        self.zone_mode = zone_mode
+        self.workers = workers
+        self.incremental = incremental
+        self.model = model
+
+        self.clock = VirtualClock(self.start)
+        self.latest_metro_data = None
+        self.stats = {
+            "ticks": {job: 0 for job in self.intervals},
+            "alerts": {"critical": 0, "warning": 0},
+            "phase_transitions": 0,
+            "peak_density": 0
+        }
+        self._zone_phases = {}
+
+    async def _tick_density(self) -> Dict:
+        """Advance every zone and collect alerts against the latest metro data"""
+        multi_zone_data = await simulate_all_zones_density()
+
+        alerts = []
+        if self.latest_metro_data:
+            alerts = check_multi_zone_alerts(multi_zone_data, self.latest_metro_data)
+        for alert in alerts:
+            self.stats["alerts"][alert["level"]] = self.stats["alerts"].get(alert["level"], 0) + 1
+
+        for zone_id, zone_data in multi_zone_data["zones"].items():
+            previous_phase = self._zone_phases.get(zone_id)
+            if previous_phase and previous_phase != zone_data["phase"]:
+                self.stats["phase_transitions"] += 1
+            self._zone_phases[zone_id] = zone_data["phase"]
+
+        self.stats["peak_density"] = max(self.stats["peak_density"],
+                                         multi_zone_data["summary"]["max_density_overall"])
+        return {"message": multi_zone_data, "alerts": alerts}
+
+    async def _tick_metro(self) -> Dict:
+        """All stations, plus the legacy MG Road view of the same step"""
+        multi_metro_data = simulate_all_metro_stations()
+        self.latest_metro_data = legacy_metro_update(multi_metro_data)
+        return {"message": multi_metro_data, "legacy": self.latest_metro_data}
+
+    async def _tick_responders(self) -> Dict:
+        return {"message": await get_first_responders_data()}
+
+    async def _run(self, output) -> Dict:
+        jobs = {
+            "density": self._tick_density,
+            "metro": self._tick_metro,
+            "responders": self._tick_responders
+        }
+
+        # (due virtual seconds, tie-breaker, job name)
+        schedule = [(0.0, order, name) for order, name in enumerate(jobs) if name in self.intervals]
+        heapq.heapify(schedule)
+
+        while schedule:
+            due, order, name = heapq.heappop(schedule)
+            if due > self.duration_seconds:
+                break
+
+            self.clock.advance_to(self.start + timedelta(seconds=due))
+            record = await jobs[name]()
+            self.stats["ticks"][name] += 1
+
+            if output is not None:
+                record.update({"job": name, "sim_time": self.clock.now().isoformat(), "elapsed_s": due})
+                output.write(json.dumps(record) + "\n")
+
+            heapq.heappush(schedule, (due + self.intervals[name], order, name))
+
+        return self.stats
+
+    def run(self) -> Dict:
+        """
+        Run the whole simulated period and return a summary
+        Every run starts from a fresh city, so the same seed writes the same
+        tick log however many runs came before it in this process;
+        the clock, seed and zone executor settings are put back afterwards
+        """
+        previous_clock = clock.set_clock(self.clock)
+        previous_seed = rng_streams.seed
+        previous_executor = get_zone_executor_config()
+        seed = set_simulation_seed(self.seed)
+        configure_zone_executor(self.zone_mode, self.workers, self.incremental, self.model)
+        state_store.reset()
+        reset_zone_simulation()
+        reset_demo_buses()
+        wall_start = time.perf_counter()
+
+        try:
+            with contextlib.ExitStack() as stack:
+                if self.quiet:
+                    devnull = stack.enter_context(open(os.devnull, "w"))
+                    stack.enter_context(contextlib.redirect_stdout(devnull))
+                output = stack.enter_context(_open_output(self.output_path)) if self.output_path else None
+                asyncio.run(self._run(output))
+        finally:
+            clock.set_clock(previous_clock)
+            set_simulation_seed(previous_seed)
+            configure_zone_executor(**previous_executor)
+
+        wall_seconds = time.perf_counter() - wall_start
+        return {
+            **self.stats,
+            "seed": seed,
+            "simulated_seconds": self.duration_seconds,
+            "simulated_start": self.start.isoformat(),
+            "simulated_end": self.clock.now().isoformat(),
+            "wall_seconds": round(wall_seconds, 3),
+            "speedup": round(self.duration_seconds / wall_seconds, 1) if wall_seconds else None,
+            "output": self.output_path
+        }
+
+
+def run_headless(duration_hours: float = 6.0, output_path: Optional[str] = None, **kwargs) -> Dict:
+    """Python API: simulate a period on a virtual clock and return the run summary"""
+    return HeadlessRunner(duration_hours, output_path, **kwargs).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fast-forward the crowd simulations on a virtual clock")
+    parser.add_argument("--hours", type=float, default=6.0, help="Simulated duration in hours (default: 6)")
+    parser.add_argument("--output", default="simulation_run.jsonl",
+                        help="Tick log path, JSON Lines (.gz for gzip)")
+    parser.add_argument("--start", help="Virtual start time, ISO format (default: today 17:00)")
+    parser.add_argument("--seed", type=int, help="Random seed; the same seed reproduces the same tick log")
+    parser.add_argument("--zone-mode", choices=["serial", "thread", "process"],
+                        help="How zone updates run (default: ZONE_SIMULATION_MODE or serial)")
+    parser.add_argument("--workers", type=int, help="Worker count for thread/process zone modes")
+    parser.add_argument("--incremental", action="store_true", default=None,
+                        help="Recompute only dirty grid regions each tick")
+    parser.add_argument("--model", choices=["phase", "agents", "flow"],
+                        help="Crowd model for zone grids (default: ZONE_CROWD_MODEL or phase)")
+    parser.add_argument("--verbose", action="store_true", help="Keep simulator log output")
+    for job, interval in DEFAULT_INTERVALS.items():
+        parser.add_argument(f"--{job}-interval", type=float, default=interval,
+                            help=f"Seconds between {job} ticks (default: {interval})")
+    args = parser.parse_args()
+
+    summary = run_headless(
+        args.hours,
+        args.output,
+        start=datetime.fromisoformat(args.start) if args.start else None,
+        intervals={job: getattr(args, f"{job}_interval") for job in DEFAULT_INTERVALS},
+        quiet=not args.verbose,
+        seed=args.seed,
+        zone_mode=args.zone_mode,
+        workers=args.workers,
+        incremental=args.incremental,
+        model=args.model
+    )
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Hotspot Extractor
+Turns a density grid into a few hotspots, one per connected blob of busy cells
+
+Cells above a threshold are labelled into 4-connected components (pure NumPy,
+no SciPy). Each component becomes one hotspot with its intensity-weighted
+centroid, area and peak; the strongest k are picked with a partial selection.
+Cell positions come from per-zone latitude/longitude tables built once.
+
+Component stats can also be kept between ticks and re-labelled only inside
+a window of the grid, for incremental density updates.
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+
+
+def label_components(mask: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Label 4-connected components of a boolean grid
+    Returns (labels, count): labels are 0..count-1 on the mask and -1 elsewhere
+    """
+    rows, cols = mask.shape
+    background = rows * cols
+    labels = np.where(mask, np.arange(background).reshape(rows, cols), background)
+    flat = labels.ravel()
+    foreground = mask.ravel()
+
+    while True:
+        # Take the smallest label among each cell and its neighbors...
+        merged = labels.copy()
+        np.minimum(merged[1:, :], labels[:-1, :], out=merged[1:, :])
+        np.minimum(merged[:-1, :], labels[1:, :], out=merged[:-1, :])
+        np.minimum(merged[:, 1:], labels[:, :-1], out=merged[:, 1:])
+        np.minimum(merged[:, :-1], labels[:, 1:], out=merged[:, :-1])
+        merged[~mask] = background
+
+        # ...then jump to the label of that label, so long chains collapse quickly
+        merged_flat = merged.ravel()
+        merged_flat[foreground] = merged_flat[merged_flat[foreground]]
+
+        if np.array_equal(merged, labels):
+            break
+        labels = merged
+        flat = labels.ravel()
+
+    compact = np.full(background, -1, dtype=np.int64)
+    roots, inverse = np.unique(flat[foreground], return_inverse=True)
+    compact[foreground] = inverse
+    return compact.reshape(rows, cols), len(roots)
+
+
+# Per-component stats: first cell (flat index), area, weight, weighted row/column
+# sums, peak value and cell, and bounding box (end-exclusive), all in grid cells
+COMPONENT_FIELDS = {
+    "first": np.int64, "area": np.int64, "weight": np.float64,
+    "moment_i": np.float64, "moment_j": np.float64, "peak": np.float64,
+    "peak_row": np.int64, "peak_col": np.int64,
+    "row_start": np.int64, "row_end": np.int64, "col_start": np.int64, "col_end": np.int64
+}
+
+
+def keep_components(components: Dict[str, np.ndarray], keep: np.ndarray) -> Dict[str, np.ndarray]:
+    """The components selected by a boolean mask"""
+    return {field: values[keep] for field, values in components.items()}
+
+
+def merge_components(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+    """Concatenate component stats from several windows"""
+    return {field: np.concatenate([part[field] for part in parts]).astype(dtype)
+            for field, dtype in COMPONENT_FIELDS.items()}
+
+
+class HotspotExtractor:
+    """Connected-component hotspot detection with cached coordinate tables"""
+
+    def __init__(self):
+        self._tables: Dict[Tuple, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def coordinate_tables(self, center: List[float], grid_size: int, cell_size_deg: float,
+                          origin: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Latitude of every row and longitude of every column of a zone grid
+        `origin` is the row/column that sits on the center (defaults to grid_size / 2)
+        """
+        origin = grid_size / 2 if origin is None else origin
+        key = (center[0], center[1], grid_size, cell_size_deg, origin)
+        tables = self._tables.get(key)
+        if tables is None:
+            offsets = (np.arange(grid_size) - origin) * cell_size_deg
+            tables = (center[0] + offsets, center[1] + offsets)
+            self._tables[key] = tables
+        return tables
+
+    def components(self, grid: np.ndarray, threshold: float,
+                   window: Optional[Tuple[slice, slice]] = None) -> Dict[str, np.ndarray]:
+        """
+        Stats for every blob of cells above threshold (see COMPONENT_FIELDS)
+        With a window (row and column slices), only blobs inside it are labelled;
+        positions stay in whole-grid cells
+        """
+        rows_window, cols_window = window or (slice(0, grid.shape[0]), slice(0, grid.shape[1]))
+        sub = grid[rows_window, cols_window]
+        mask = sub > threshold
+        if not mask.any():
+            return {field: np.zeros(0, dtype=dtype) for field, dtype in COMPONENT_FIELDS.items()}
+
+        labels, count = label_components(mask)
+        cells = np.flatnonzero(mask)
+        component = labels.ravel()[cells]
+        values = sub.ravel()[cells].astype(np.float64)
+        rows, cols = np.divmod(cells, sub.shape[1])
+        rows += rows_window.start
+        cols += cols_window.start
+
+        # Labels follow each blob's first cell in row-major order
+        first = np.unique(component, return_index=True)[1]
+
+        # Peak cell per component: sort by (component, value desc), first of each run
+        order = np.lexsort((-values, component))
+        runs = np.flatnonzero(np.r_[True, component[order][1:] != component[order][:-1]])
+        peak_cell = order[runs]
+
+        row_end = np.zeros(count, dtype=np.int64)
+        col_start = np.full(count, grid.shape[1], dtype=np.int64)
+        col_end = np.zeros(count, dtype=np.int64)
+        np.maximum.at(row_end, component, rows + 1)
+        np.minimum.at(col_start, component, cols)
+        np.maximum.at(col_end, component, cols + 1)
+
+        return {
+            "first": rows[first] * grid.shape[1] + cols[first],
+            "area": np.bincount(component, minlength=count),
+            "weight": np.bincount(component, weights=values, minlength=count),
+            "moment_i": np.bincount(component, weights=values * rows, minlength=count),
+            "moment_j": np.bincount(component, weights=values * cols, minlength=count),
+            "peak": values[peak_cell],
+            "peak_row": rows[peak_cell],
+            "peak_col": cols[peak_cell],
+            "row_start": rows[first],
+            "row_end": row_end,
+            "col_start": col_start,
+            "col_end": col_end
+        }
+
+    def select(self, components: Dict[str, np.ndarray], top_k: int, center: List[float], grid_size: int,
+               cell_size_deg: float, origin: Optional[float] = None,
+               value_key: str = "intensity") -> List[Dict]:
+        """
+        The top_k strongest components as hotspots, strongest first
+        Equal peaks keep row-major order of the blobs' first cells
+        """
+        peak = components["peak"]
+        count = peak.size
+        if not count:
+            return []
+
+        # Partial selection of the strongest components (and any tied with the k-th), then order just those
+        if count > top_k:
+            kth = -np.partition(-peak, top_k - 1)[top_k - 1]
+            chosen = np.flatnonzero(peak >= kth)
+        else:
+            chosen = np.arange(count)
+        chosen = chosen[np.lexsort((components["first"][chosen], -peak[chosen]))][:top_k]
+
+        weight = components["weight"][chosen]
+        lat_table, lon_table = self.coordinate_tables(center, grid_size, cell_size_deg, origin)
+        index = np.arange(grid_size)
+        lats = np.interp(components["moment_i"][chosen] / weight, index, lat_table)
+        lons = np.interp(components["moment_j"][chosen] / weight, index, lon_table)
+
+        return [
+            {
+                "lat": float(lat),
+                "lon": float(lon),
+                value_key: int(peak[c]),
+                "area_cells": int(components["area"][c]),
+                "peak_lat": float(lat_table[components["peak_row"][c]]),
+                "peak_lon": float(lon_table[components["peak_col"][c]])
+            }
+            for c, lat, lon in zip(chosen, lats, lons)
+        ]
+
+    def extract(self, grid: np.ndarray, threshold: float, top_k: int, center: List[float],
+                cell_size_deg: float, origin: Optional[float] = None,
+                value_key: str = "intensity") -> List[Dict]:
+        """
+        The top_k strongest blobs of cells above threshold, strongest first
+        Each hotspot has lat/lon (weighted centroid), the peak value under
+        `value_key`, area_cells and the peak cell's lat/lon
+        """
+        return self.select(self.components(grid, threshold), top_k, center, grid.shape[0],
+                           cell_size_deg, origin, value_key)
+
+
+# Global extractor instance
+hotspot_extractor = HotspotExtractor()
@@ -0,0 +1,150 @@
+"""
+Hotspot Kernel Stamps
+Precomputed falloff stamps for hotspot kernels
+
+A stamp is the kernel evaluated on a small square of cells around a hotspot.
+Stamps are cached per kernel type and grid resolution, with one variant per
+quantized sub-cell offset so float hotspot centers need no per-tick math.
+A grid is then built by adding scaled, jittered stamps - a fixed cost per
+hotspot that does not grow with zone size.
+"""
+
+import math
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Distances are in reference cells (see density_engine.REFERENCE_RESOLUTION_M)
+REFERENCE_RESOLUTION_M = 200
+
+# Sub-cell positions per axis a hotspot center is snapped to
+SUBCELL_STEPS = 8
+
+
+def _inverse_square_kernel(distance: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """1 / (1 + d^2) with 0.8-1.2 jitter; full intensity without jitter at the center"""
+    core = distance < 0.1
+    values = np.where(core, 1.0, 1.0 / (1.0 + distance ** 2))
+    jitter_low = np.where(core, 1.0, 0.8)
+    jitter_high = np.where(core, 1.0, 1.2)
+    return values, jitter_low, jitter_high, core
+
+
+def _piecewise_kernel(distance: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Stadium falloff: flat core, then power-law bands out to 6 cells with weaker jitter per band"""
+    core = distance < 0.5
+    inner = ~core & (distance < 2)
+    middle = (distance >= 2) & (distance < 4)
+    outer = (distance >= 4) & (distance < 6)
+
+    values = np.zeros_like(distance)
+    values[core] = 1.0
+    values[inner] = (1 - distance[inner] / 2) ** 2
+    values[middle] = (1 - distance[middle] / 4) ** 1.5
+    values[outer] = 1 - distance[outer] / 6
+
+    jitter_low = np.select([core, inner, middle, outer], [1.0, 0.7, 0.3, 0.1], 0.0)
+    jitter_high = np.select([core, inner, middle, outer], [1.0, 1.0, 0.6, 0.3], 0.0)
+    return values, jitter_low, jitter_high, core
+
+
+# name -> (kernel function, support radius in reference cells, truncate each contribution)
+KERNELS: Dict[str, Tuple[Callable, float, bool]] = {
+    # Cut where the falloff is below 1% of the hotspot intensity
+    "inverse_square": (_inverse_square_kernel, math.sqrt(1 / 0.01 - 1), False),
+    "piecewise": (_piecewise_kernel, 6.0, True)
+}
+
+
+class KernelStamp:
+    """
+    Stamps for one kernel at one resolution
+    Arrays are shaped (SUBCELL_STEPS, SUBCELL_STEPS, size, size)
+    """
+
+    def __init__(self, kernel: str, resolution: float):
+        kernel_fn, support, truncate = KERNELS[kernel]
+        scale = resolution / REFERENCE_RESOLUTION_M
+        self.radius = int(math.ceil(support / scale)) + 1
+        self.truncate = truncate
+        size = 2 * self.radius + 1
+
+        offsets = np.arange(SUBCELL_STEPS) / SUBCELL_STEPS
+        cells = np.arange(size) - self.radius
+        rows = cells[None, None, :, None] - offsets[:, None, None, None]
+        cols = cells[None, None, None, :] - offsets[None, :, None, None]
+        distance = np.sqrt(rows ** 2 + cols ** 2) * scale
+
+        self.values, self.jitter_low, jitter_high, self.core = kernel_fn(distance)
+        self.jitter_span = jitter_high - self.jitter_low
+
+    def place(self, center_i: float, center_j: float, grid_size: int,
+              window: Optional[Tuple[slice, slice]] = None):
+        """
+        Stamp variant and the grid/stamp slices for a hotspot center
+        With a window (row and column slices of the grid), the stamp is clipped
+        to it and the grid slice is relative to the window's corner
+        Returns None when the stamp falls entirely outside the grid (or window)
+        """
+        # Snap to the nearest sub-cell step; rounding up to a whole step moves to the next cell
+        base_i, sub_i = divmod(int(round(center_i * SUBCELL_STEPS)), SUBCELL_STEPS)
+        base_j, sub_j = divmod(int(round(center_j * SUBCELL_STEPS)), SUBCELL_STEPS)
+
+        rows, cols = window or (slice(0, grid_size), slice(0, grid_size))
+        top, left = base_i - self.radius, base_j - self.radius
+        size = 2 * self.radius + 1
+        row_start, row_end = max(rows.start, top), min(rows.stop, top + size)
+        col_start, col_end = max(cols.start, left), min(cols.stop, left + size)
+        if row_start >= row_end or col_start >= col_end:
+            return None
+
+        grid_slice = (slice(row_start - rows.start, row_end - rows.start),
+                      slice(col_start - cols.start, col_end - cols.start))
+        stamp_slice = (sub_i, sub_j, slice(row_start - top, row_end - top), slice(col_start - left, col_end - left))
+        return grid_slice, stamp_slice
+
+
+class KernelCache:
+    """Lazily built stamps keyed by (kernel, resolution)"""
+
+    def __init__(self):
+        self._stamps: Dict[Tuple[str, float], KernelStamp] = {}
+
+    def get(self, kernel: str, resolution: float) -> KernelStamp:
+        key = (kernel, float(resolution))
+        stamp = self._stamps.get(key)
+        if stamp is None:
+            stamp = KernelStamp(kernel, resolution)
+            self._stamps[key] = stamp
+        return stamp
+
+    def accumulate(self, kernel: str, grid_size: int, hotspot_centers: List[Dict], intensity: float,
+                   rng: np.random.Generator, resolution: float = REFERENCE_RESOLUTION_M,
+                   window: Optional[Tuple[slice, slice]] = None) -> np.ndarray:
+        """
+        Sum of jittered, intensity-scaled stamps for every hotspot
+        Returns a float64 (grid_size, grid_size) field, or just the window's
+        cells when one is given; jitter is only drawn for those cells
+        """
+        stamp = self.get(kernel, resolution)
+        rows, cols = window or (slice(0, grid_size), slice(0, grid_size))
+        field = np.zeros((rows.stop - rows.start, cols.stop - cols.start), dtype=np.float64)
+
+        for hotspot in hotspot_centers:
+            placement = stamp.place(hotspot['i'], hotspot['j'], grid_size, window)
+            if placement is None:
+                continue
+            grid_slice, stamp_slice = placement
+
+            values = stamp.values[stamp_slice]
+            jitter = stamp.jitter_low[stamp_slice] + stamp.jitter_span[stamp_slice] * rng.random(values.shape)
+            contribution = intensity * values * jitter
+            if stamp.truncate:
+                # Integer contributions outside the core, as in the scalar model
+                contribution = np.where(stamp.core[stamp_slice], contribution, np.trunc(contribution))
+            field[grid_slice] += contribution
+
+        return field
+
+
+# Global stamp cache
+kernel_cache = KernelCache()
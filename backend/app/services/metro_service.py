@@ -1,23 +1,17 @@
 """
 Metro Flow Simulation Service
 Simulates passenger flow at ALL metro stations
+Stations live in the state store's station table and are updated in one array pass
 """
 
-import random
-from datetime import datetime
+import numpy as np
 from typing import Dict, List
+from app.utils import clock
+from app.utils.rng import stream, uniform_ints
 from app.utils.constants import METRO_LOCATION
+from app.services.state_store import state_store
 
 
-# Global state for crowd phases (shared with density service)
-_crowd_state = {
-    'phase': 'building',
-    'base_intensity': 20,
-    'hotspot_centers': [],
-    'cycle_count': 0,
-    'phase_duration': 0
-}
-
 # Metro Stations Configuration (Based on Namma Metro lines)
 METRO_STATIONS = {
     "mg_road": {
@@ -60,85 +54,122 @@ METRO_STATIONS = {
 
 
 def get_crowd_state() -> Dict:
-    """Get current crowd state"""
-    return _crowd_state
+    """Get current crowd state (the stadium crowd shared with the density service)"""
+    return state_store.stadium_crowd()
 
 
-def simulate_station_flow(station_id: str, station_config: Dict) -> Dict:
+def initialize_stations():
+    """Add any station not yet in the state store's station table"""
+    stations = state_store.stations
+    new_ids = [station_id for station_id in METRO_STATIONS if station_id not in stations]
+    if new_ids:
+        stations.extend(new_ids, capacity=[METRO_STATIONS[s].get('capacity', 15000) for s in new_ids])
+
+
+def simulate_station_flows(station_ids: List[str]) -> Dict:
     """
-    Simulate metro passenger flow for a specific station
+    Simulate metro passenger flow for a set of stations in one array pass
     Flow SYNCHRONIZED with crowd density phase for realistic correlation
+    Returns per-station arrays (entry_rate, exit_rate, capacity_percent) plus
+    the status, flow_reason and crowd_phase they share
     """
-    global _crowd_state
+    initialize_stations()
+    stations = state_store.stations
+    crowd_state = state_store.stadium_crowd()
     
-    current_hour = datetime.now().hour
-    current_phase = _crowd_state.get('phase', 'low')
-    base_intensity = _crowd_state.get('base_intensity', 20)
-    capacity = station_config.get('capacity', 15000)
+    current_hour = clock.now().hour
+    current_phase = crowd_state['phase']
+    base_intensity = crowd_state['base_intensity']
+    rows = np.array([stations.id_of(station_id) for station_id in station_ids], dtype=np.int64)
+    count = len(rows)
+    
+    # Entry, exit and their natural variation come from each station's own stream
+    stations['tick'][rows] += 1
+    draws = np.array([
+        stream("station", station_id, int(tick)).random(4)
+        for station_id, tick in zip(station_ids, stations['tick'][rows])
+    ]).reshape(count, 4)
     
     # Metro flow correlates with crowd phase
     if current_phase == 'building':
         # BUILDING: Many people arriving via metro → HIGH EXIT RATE
-        base_entry = random.randint(30, 45)
+        base_entry = uniform_ints(draws[:, 0], 30, 45)
         exit_multiplier = min(base_intensity / 180, 1.0)
-        base_exit = int(50 + (exit_multiplier * 50))
+        base_exit = np.full(count, int(50 + (exit_multiplier * 50)))
         status = "high"
         flow_reason = "Arrivals"
         
     elif current_phase == 'peak':
         # PEAK: Most people already at event → MODERATE FLOW
-        base_entry = random.randint(25, 40)
-        base_exit = random.randint(35, 55)
+        base_entry = uniform_ints(draws[:, 0], 25, 40)
+        base_exit = uniform_ints(draws[:, 1], 35, 55)
         status = "moderate"
         flow_reason = "Stable"
         
     elif current_phase == 'dispersing':
         # DISPERSING: Event ending, people leaving → HIGH EXIT RATE
-        dispersal_progress = _crowd_state.get('phase_duration', 0) / 8.0
-        base_entry = random.randint(20, 35)
-        base_exit = int(90 - (dispersal_progress * 40))
+        dispersal_progress = crowd_state['phase_duration'] / 8.0
+        base_entry = uniform_ints(draws[:, 0], 20, 35)
+        base_exit = np.full(count, int(90 - (dispersal_progress * 40)))
         status = "high"
         flow_reason = "Departures"
         
     elif current_phase == 'low':
         # LOW: Minimal crowd → LOW FLOW
-        base_entry = random.randint(15, 25)
-        base_exit = random.randint(15, 25)
+        base_entry = uniform_ints(draws[:, 0], 15, 25)
+        base_exit = uniform_ints(draws[:, 1], 15, 25)
         status = "low"
         flow_reason = "Normal"
         
     else:
         # Fallback to time-based patterns
         if 8 <= current_hour <= 10:  # Morning rush
-            base_entry = random.randint(60, 90)
-            base_exit = random.randint(30, 50)
+            base_entry = uniform_ints(draws[:, 0], 60, 90)
+            base_exit = uniform_ints(draws[:, 1], 30, 50)
             status = "high"
             flow_reason = "Morning Rush"
         elif 17 <= current_hour <= 20:  # Evening rush
-            base_entry = random.randint(40, 60)
-            base_exit = random.randint(70, 100)
+            base_entry = uniform_ints(draws[:, 0], 40, 60)
+            base_exit = uniform_ints(draws[:, 1], 70, 100)
             status = "high"
             flow_reason = "Evening Rush"
         else:
-            base_entry = random.randint(20, 35)
-            base_exit = random.randint(20, 35)
+            base_entry = uniform_ints(draws[:, 0], 20, 35)
+            base_exit = uniform_ints(draws[:, 1], 20, 35)
             status = "moderate"
             flow_reason = "Normal"
     
     # Add station-specific variation based on capacity
+    capacity = stations['capacity'][rows]
     capacity_factor = capacity / 15000  # Normalize to base capacity
-    base_entry = int(base_entry * capacity_factor)
-    base_exit = int(base_exit * capacity_factor)
+    base_entry = (base_entry * capacity_factor).astype(np.int64)
+    base_exit = (base_exit * capacity_factor).astype(np.int64)
     
     # Add natural variation
-    entry_rate = max(10, base_entry + random.randint(-5, 5))
-    exit_rate = max(10, base_exit + random.randint(-5, 5))
+    entry_rate = np.maximum(10, base_entry + uniform_ints(draws[:, 2], -5, 5))
+    exit_rate = np.maximum(10, base_exit + uniform_ints(draws[:, 3], -5, 5))
+    stations['entry_rate'][rows] = entry_rate
+    stations['exit_rate'][rows] = exit_rate
     
     # Calculate capacity percentage
     total_flow = entry_rate + exit_rate
     max_flow = capacity // 100  # Assume ~1% of capacity per minute is max
-    capacity_percent = min(int((total_flow / max_flow) * 100), 100)
+    capacity_percent = np.minimum((total_flow / max_flow * 100).astype(np.int64), 100)
     
+    return {
+        "entry_rate": entry_rate,
+        "exit_rate": exit_rate,
+        "capacity_percent": capacity_percent,
+        "status": status,
+        "flow_reason": flow_reason,
+        "crowd_phase": current_phase
+    }
+
+
+def _station_payload(station_id: str, station_config: Dict, flows: Dict, k: int) -> Dict:
+    """One station's entry of the flows from simulate_station_flows"""
+    entry_rate = int(flows['entry_rate'][k])
+    exit_rate = int(flows['exit_rate'][k])
     return {
         "id": station_id,
         "station": station_config['name'],
@@ -147,29 +178,33 @@ def simulate_station_flow(station_id: str, station_config: Dict) -> Dict:
         "color": station_config['color'],
         "entry_rate": entry_rate,
         "exit_rate": exit_rate,
-        "total_flow": total_flow,
-        "capacity": capacity,
-        "capacity_percent": capacity_percent,
-        "status": status,
-        "flow_reason": flow_reason,
-        "crowd_phase": current_phase,
-        "timestamp": datetime.now().isoformat()
+        "total_flow": entry_rate + exit_rate,
+        "capacity": station_config.get('capacity', 15000),
+        "capacity_percent": int(flows['capacity_percent'][k]),
+        "status": flows['status'],
+        "flow_reason": flows['flow_reason'],
+        "crowd_phase": flows['crowd_phase'],
+        "timestamp": clock.now().isoformat()
     }
 
 
+def simulate_station_flow(station_id: str, station_config: Dict) -> Dict:
+    """Simulate metro passenger flow for a specific station"""
+    return _station_payload(station_id, station_config, simulate_station_flows([station_id]), 0)
+
+
 def simulate_all_metro_stations() -> Dict:
     """
     Simulate all metro stations and return aggregated data
     """
-    stations = []
-    total_entry = 0
-    total_exit = 0
-    
-    for station_id, station_config in METRO_STATIONS.items():
-        station_data = simulate_station_flow(station_id, station_config)
-        stations.append(station_data)
-        total_entry += station_data['entry_rate']
-        total_exit += station_data['exit_rate']
+    station_ids = list(METRO_STATIONS)
+    flows = simulate_station_flows(station_ids)
+    stations = [
+        _station_payload(station_id, METRO_STATIONS[station_id], flows, k)
+        for k, station_id in enumerate(station_ids)
+    ]
+    total_entry = int(flows['entry_rate'].sum())
+    total_exit = int(flows['exit_rate'].sum())
     
     return {
         "type": "multi_metro_update",
@@ -179,18 +214,18 @@ def simulate_all_metro_stations() -> Dict:
             "total_entry_rate": total_entry,
             "total_exit_rate": total_exit,
             "total_flow": total_entry + total_exit,
-            "crowd_phase": _crowd_state.get('phase', 'low')
+            "crowd_phase": flows['crowd_phase']
         },
-        "timestamp": datetime.now().isoformat()
+        "timestamp": clock.now().isoformat()
     }
 
 
-def simulate_metro_flow() -> Dict:
+def legacy_metro_update(multi_metro_data: Dict) -> Dict:
     """
-    LEGACY: Simulate metro passenger flow for MG Road station only
-    For backward compatibility
+    LEGACY: The single-station MG Road message, taken from an all-stations
+    result (no extra simulation step)
     """
-    mg_road_data = simulate_station_flow("mg_road", METRO_STATIONS["mg_road"])
+    mg_road_data = next(station for station in multi_metro_data['stations'] if station['id'] == "mg_road")
     
     return {
         "type": "metro_update",
@@ -207,6 +242,15 @@ def simulate_metro_flow() -> Dict:
     }
 
 
+def simulate_metro_flow() -> Dict:
+    """
+    LEGACY: Simulate metro passenger flow for MG Road station only
+    For backward compatibility
+    """
+    mg_road_data = simulate_station_flow("mg_road", METRO_STATIONS["mg_road"])
+    return legacy_metro_update({"stations": [mg_road_data]})
+
+
 def format_metro_summary(metro_data: Dict) -> str:
     """Format metro data for logging"""
     if metro_data:
@@ -2,209 +2,482 @@
 Multi-Zone Crowd Simulation Service
 Simulates crowd density across all monitored zones in Bengaluru
 Each zone has independent crowd dynamics with zone-specific characteristics
+
+Zone states live in the zone table of the state store; a tick advances
+every zone's phase in one array pass over its columns
 """
 
-import random
-import math
-from datetime import datetime
-from typing import Dict, List
-from app.utils.constants import ZONES, DENSITY_THRESHOLD_HIGH, DENSITY_THRESHOLD_CRITICAL
+import asyncio
+import os
+import time
+import numpy as np
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from app.utils import clock
+from app.utils.rng import RandomStreams, rng_streams
+from app.utils.constants import DENSITY_THRESHOLD_HIGH, DENSITY_THRESHOLD_CRITICAL
+from app.services.density_engine import (
+    REFERENCE_RESOLUTION_M, density_engine, zone_grid_size, zone_resolution, zone_cell_size_deg
+)
+from app.services.agent_engine import AgentEngine
+from app.services.flow_model import FlowModel
+from app.services.zone_registry import zone_registry
+from app.services.state_store import state_store, PHASES, PHASE_CODE, hotspot_list
+
+# Zones to simulate (built-in ZONES unless ZONES_FILE points at another dataset)
+ZONES = zone_registry.zones
+
+# Previous grids kept for incremental updates, by zone id
+_density_caches = {}
+
+# How zone updates are executed each tick (serial on the event loop, or sharded over a pool)
+ZONE_EXECUTOR_MODES = ('serial', 'thread', 'process')
+
+# Where zone grids come from: the phase heuristic's hotspot field, walking agents,
+# or crowd flowing between cells toward attractors
+CROWD_MODELS = ('phase', 'agents', 'flow')
+
+_executor_config = {
+    'mode': os.getenv("ZONE_SIMULATION_MODE", "serial"),
+    'workers': int(os.getenv("ZONE_SIMULATION_WORKERS", os.cpu_count() or 1)),
+    # 'incremental' recomputes only cells near changed hotspots; 'full' rebuilds every cell
+    'incremental': os.getenv("DENSITY_UPDATE_MODE", "full") == "incremental",
+    'model': os.getenv("ZONE_CROWD_MODEL", "phase")
+}
+_zone_executor = None
+
+# Agent engine and flow model for the 'agents' / 'flow' models (created on first use; live in this process)
+_agent_engine = None
+_flow_model = None
+
+# Wall time and per-shard timings of the latest tick
+_last_tick_timing = {}
+
+
+# Zone-specific dynamics by type: (low, high) ranges per tick
+ZONE_DYNAMICS = {
+    "event_venue": {"buildup": (10, 18), "dispersal": (12, 22), "peak_duration": (8, 12)},   # Fast buildup, longer peaks
+    "transit": {"buildup": (8, 14), "dispersal": (10, 18), "peak_duration": (5, 8)},         # Fast dispersal
+    "commercial": {"buildup": (6, 12), "dispersal": (8, 15), "peak_duration": (10, 15)},     # Steady, long peaks
+    "mixed": {"buildup": (7, 13), "dispersal": (9, 16), "peak_duration": (6, 10)},           # Balanced
+    "tourist": {"buildup": (5, 10), "dispersal": (7, 14), "peak_duration": (7, 11)}          # Slow buildup
+}
+
+
+def _dynamics_table() -> np.ndarray:
+    """ZONE_DYNAMICS as rows per registry zone type: buildup, dispersal, peak_duration (low, high)"""
+    rows = []
+    for zone_type in zone_registry.types:
+        dynamics = ZONE_DYNAMICS.get(zone_type, ZONE_DYNAMICS["tourist"])
+        rows.append(dynamics["buildup"] + dynamics["dispersal"] + dynamics["peak_duration"])
+    return np.array(rows, dtype=np.int64).reshape(-1, 6)
+
+
+# Indexed by the zone table's type_code
+_TYPE_DYNAMICS = _dynamics_table()
+
+
+def zone_rng(zone_id: str, tick: int, seed: Optional[int] = None) -> np.random.Generator:
+    """Random stream for a zone at a tick (seed defaults to the global simulation seed)"""
+    streams = rng_streams if seed is None else RandomStreams(seed)
+    return streams.generator("zone", zone_id, tick)
+
 
-# Global state for each zone's crowd accumulation
-_zone_states = {}
+def _next_tick_rngs(zones: Dict[str, np.ndarray], zone_ids: List[str],
+                    seed: Optional[int] = None) -> List[np.random.Generator]:
+    """Each zone's stream for the tick about to be simulated"""
+    return [zone_rng(zone_id, int(cycle) + 1, seed) for zone_id, cycle in zip(zone_ids, zones['cycle_count'])]
 
 
 def initialize_zone_states():
-    """Initialize crowd states for all zones"""
-    global _zone_states
+    """Add every zone to the state store's zone table (once)"""
+    zones = state_store.zones
     
     # Initialize only if empty OR if not all zones are present (partial initialization)
-    if not _zone_states or len(_zone_states) < len(ZONES):
-        if _zone_states:
-            print(f"⚠️ Partial initialization detected ({len(_zone_states)}/{len(ZONES)} zones). Re-initializing all zones...")
-            _zone_states.clear()
+    if len(zones) == len(ZONES):
+        return
+    if len(zones):
+        print(f"⚠️ Partial initialization detected ({len(zones)}/{len(ZONES)} zones). Re-initializing all zones...")
+        zones.clear()
+        _density_caches.clear()
+    
+    print(f"🔧 Initializing zone states for {len(ZONES)} zones...")
+    phases = []
+    intensities = []
+    for zone_id, zone_config in ZONES.items():
+        rng = zone_rng(zone_id, 0)
         
-        print(f"🔧 Initializing zone states for {len(ZONES)} zones...")
-        for zone_id, zone_config in ZONES.items():
-            # Different zones start at different phases for variety
-            phases = ['low', 'building', 'peak', 'dispersing']
-            initial_phase = random.choice(phases)
-            
-            # Base intensity correlates with zone capacity
-            capacity_factor = zone_config["capacity"] / 50000  # Normalize
-            max_intensity = max(10, int(30 * capacity_factor))  # Ensure min upper bound is safe
-            base_intensity = random.randint(10, max_intensity)
-            
-            _zone_states[zone_id] = {
-                'zone_id': zone_id,
-                'zone_name': zone_config["name"],
-                'phase': initial_phase,
-                'base_intensity': base_intensity,
-                'hotspot_centers': [],
-                'cycle_count': 0,
-                'phase_duration': 0,
-                'capacity': zone_config["capacity"],
-                'type': zone_config["type"]
-            }
-        print(f"✅ Initialized {len(_zone_states)} zone states: {list(_zone_states.keys())}")
-
-
-def update_zone_phase(zone_state: Dict):
-    """Update the crowd phase for a single zone"""
-    zone_state['cycle_count'] += 1
-    zone_state['phase_duration'] += 1
-    
-    current_phase = zone_state['phase']
-    zone_type = zone_state['type']
-    
-    # Zone-specific buildup rates based on type
-    if zone_type == "event_venue":
-        buildup_rate = random.uniform(10, 18)  # Fast buildup for events
-        dispersal_rate = random.uniform(12, 22)  # Moderate dispersal
-        peak_duration = random.randint(8, 12)  # Longer peaks
-    elif zone_type == "transit":
-        buildup_rate = random.uniform(8, 14)  # Moderate buildup
-        dispersal_rate = random.uniform(10, 18)  # Fast dispersal
-        peak_duration = random.randint(5, 8)  # Medium peaks
-    elif zone_type == "commercial":
-        buildup_rate = random.uniform(6, 12)  # Steady buildup
-        dispersal_rate = random.uniform(8, 15)  # Steady dispersal
-        peak_duration = random.randint(10, 15)  # Long peaks
-    elif zone_type == "mixed":
-        buildup_rate = random.uniform(7, 13)  # Balanced
-        dispersal_rate = random.uniform(9, 16)  # Balanced
-        peak_duration = random.randint(6, 10)  # Medium peaks
-    else:  # tourist
-        buildup_rate = random.uniform(5, 10)  # Slow buildup
-        dispersal_rate = random.uniform(7, 14)  # Moderate dispersal
-        peak_duration = random.randint(7, 11)  # Medium peaks
+        # Different zones start at different phases for variety
+        phases.append(int(rng.integers(len(PHASES))))
+        
+        # Base intensity correlates with zone capacity
+        capacity_factor = zone_config["capacity"] / 50000  # Normalize
+        max_intensity = max(10, int(30 * capacity_factor))  # Ensure min upper bound is safe
+        intensities.append(int(rng.integers(10, max_intensity + 1)))
+    
+    zones.extend(
+        ZONES,
+        phase=phases,
+        base_intensity=intensities,
+        capacity=zone_registry.capacity,
+        type_code=zone_registry.type_code,
+        grid_size=[zone_grid_size(zone_config) for zone_config in ZONES.values()]
+    )
+    print(f"✅ Initialized {len(zones)} zone states: {zones.keys}")
+
+
+def random_hotspot_centers(rng: np.random.Generator, count: int, grid_size: int) -> np.ndarray:
+    """Hotspot centers (i, j) at random float positions (not grid-aligned), away from the edges"""
+    return rng.uniform(2.0, grid_size - 3.0, size=(count, 2))
+
+
+def set_hotspot_centers(zones: Dict[str, np.ndarray], row: int, centers: np.ndarray):
+    """Replace the hotspot centers of one row of a zone (or crowd) table"""
+    zones['hotspots'][row] = 0.0
+    zones['hotspots'][row, :len(centers)] = centers
+    zones['hotspot_count'][row] = len(centers)
+
+
+def update_zone_phases(zones: Dict[str, np.ndarray], zone_ids: List[str], rngs: List[np.random.Generator],
+                       reseed_hotspots: bool = True):
+    """
+    Update the crowd phase of a block of zones in one array pass
+    `zones` are zone-table columns for those zones (updated in place); rngs[k] is zone_ids[k]'s stream
+    With reseed_hotspots=False a new cycle keeps its hotspots (models that move the crowd themselves)
+    """
+    zones['cycle_count'] += 1
+    zones['phase_duration'] += 1
+    
+    phase = zones['phase'].copy()
+    dynamics = _TYPE_DYNAMICS[zones['type_code']]
+    
+    # Draw this tick's random values in bulk, each zone from its own stream
+    rates = np.empty((len(zone_ids), 3))
+    durations = np.empty((len(zone_ids), 2), dtype=np.int64)
+    for k, rng in enumerate(rngs):
+        rates[k] = rng.random(3)
+        durations[k] = rng.integers([dynamics[k, 4], 4], [dynamics[k, 5] + 1, 11])
+    buildup_rate = dynamics[:, 0] + (dynamics[:, 1] - dynamics[:, 0]) * rates[:, 0]
+    dispersal_rate = dynamics[:, 2] + (dynamics[:, 3] - dynamics[:, 2]) * rates[:, 1]
+    peak_variation = -8 + 16 * rates[:, 2]
     
     # Capacity factor (larger zones build up slower but to higher densities)
-    capacity_factor = zone_state['capacity'] / 50000
-    max_intensity = int(200 * capacity_factor)
+    max_intensity = (200 * (zones['capacity'] / 50000)).astype(np.int64)
+    
+    building, peak, dispersing, low = (phase == PHASE_CODE[name] for name in ('building', 'peak', 'dispersing', 'low'))
+    intensity = zones['base_intensity']
+    intensity[building] += buildup_rate[building]
+    intensity[peak] = np.minimum(max_intensity[peak], intensity[peak] + peak_variation[peak])
+    intensity[dispersing] = np.maximum(0, intensity[dispersing] - dispersal_rate[dispersing])
+    intensity[low] = np.maximum(5, intensity[low] - 2)
     
     # Phase transitions
-    if current_phase == 'building':
-        zone_state['base_intensity'] += buildup_rate
-        
-        if zone_state['base_intensity'] > max_intensity * 0.9:
-            zone_state['phase'] = 'peak'
-            zone_state['phase_duration'] = 0
-            print(f"🔥 {zone_state['zone_name']}: BUILDING → PEAK (Density: {int(zone_state['base_intensity'])})")
-    
-    elif current_phase == 'peak':
-        zone_state['base_intensity'] += random.uniform(-8, 8)
-        zone_state['base_intensity'] = min(max_intensity, zone_state['base_intensity'])
-        
-        if zone_state['phase_duration'] > peak_duration:
-            zone_state['phase'] = 'dispersing'
-            zone_state['phase_duration'] = 0
-            print(f"⚠️ {zone_state['zone_name']}: PEAK → DISPERSING")
-    
-    elif current_phase == 'dispersing':
-        zone_state['base_intensity'] -= dispersal_rate
-        zone_state['base_intensity'] = max(0, zone_state['base_intensity'])
-        
-        if zone_state['base_intensity'] < 30:
-            zone_state['phase'] = 'low'
-            zone_state['phase_duration'] = 0
-            zone_state['hotspot_centers'] = []
-            print(f"✅ {zone_state['zone_name']}: DISPERSING → LOW")
-    
-    elif current_phase == 'low':
-        zone_state['base_intensity'] = max(5, zone_state['base_intensity'] - 2)
-        
-        low_duration = random.randint(4, 10)
-        if zone_state['phase_duration'] > low_duration:
-            zone_state['phase'] = 'building'
-            zone_state['phase_duration'] = 0
-            # Create new hotspots with RANDOM positions (not grid-aligned)
-            num_hotspots = random.randint(2, 4)
-            grid_size = 10
-            zone_state['hotspot_centers'] = [
-                {
-                    # Use floating-point for natural random distribution
-                    'i': random.uniform(2.0, grid_size - 3.0),
-                    'j': random.uniform(2.0, grid_size - 3.0),
-                }
-                for _ in range(num_hotspots)
-            ]
-            print(f"🟢 {zone_state['zone_name']}: LOW → BUILDING")
-
-
-def generate_zone_density_grid(zone_state: Dict) -> tuple:
-    """Generate density grid for a single zone"""
-    grid_size = 10
-    grid = []
-    hotspots = []
-    
-    # Ensure hotspots exist
-    if not zone_state['hotspot_centers']:
-        num_hotspots = random.randint(2, 3)
-        zone_state['hotspot_centers'] = [
-            {
-                # Use floating-point for natural random distribution
-                'i': random.uniform(2.0, grid_size - 3.0),
-                'j': random.uniform(2.0, grid_size - 3.0),
-            }
-            for _ in range(num_hotspots)
-        ]
+    to_peak = building & (intensity > max_intensity * 0.9)
+    to_dispersing = peak & (zones['phase_duration'] > durations[:, 0])
+    to_low = dispersing & (intensity < 30)
+    to_building = low & (zones['phase_duration'] > durations[:, 1])
+    for changed, new_phase in ((to_peak, 'peak'), (to_dispersing, 'dispersing'),
+                               (to_low, 'low'), (to_building, 'building')):
+        zones['phase'][changed] = PHASE_CODE[new_phase]
+        zones['phase_duration'][changed] = 0
     
-    base_intensity = zone_state['base_intensity']
+    if reseed_hotspots:
+        zones['hotspot_count'][to_low] = 0
+    for k in np.flatnonzero(to_building):
+        # Create new hotspots with RANDOM positions (not grid-aligned)
+        num_hotspots = int(rngs[k].integers(2, 5))
+        if reseed_hotspots:
+            set_hotspot_centers(zones, k, random_hotspot_centers(rngs[k], num_hotspots, zones['grid_size'][k]))
     
-    for i in range(grid_size):
-        row = []
-        for j in range(grid_size):
-            density = random.randint(0, 5)
-            
-            # Add hotspot influence with smoother falloff
-            for hotspot in zone_state['hotspot_centers']:
-                distance = math.sqrt((i - hotspot['i'])**2 + (j - hotspot['j'])**2)
-                
-                # Smoother inverse square falloff for more natural hotspots
-                if distance < 0.1:
-                    contribution = base_intensity
-                else:
-                    # Inverse square law with randomness
-                    falloff = 1 / (1 + distance**2) 
-                    contribution = base_intensity * falloff * random.uniform(0.8, 1.2)
-                
-                density += contribution
-            
-            # Add noise
-            density += random.uniform(-5, 5)
-            density = max(0, int(density))
-            
-            row.append(density)
-            
-            # Track hotspots with added jitter for natural positioning
-            if density > base_intensity * 0.7:
-                # Add small random offset to prevent grid alignment
-                lat_offset = (i - grid_size/2 + random.uniform(-0.3, 0.3)) * 0.002
-                lon_offset = (j - grid_size/2 + random.uniform(-0.3, 0.3)) * 0.002
-                hotspots.append({
-                    "lat": ZONES[zone_state['zone_id']]["center"][0] + lat_offset,
-                    "lon": ZONES[zone_state['zone_id']]["center"][1] + lon_offset,
-                    "intensity": density
-                })
-        
-        grid.append(row)
+    for k in np.flatnonzero(to_peak):
+        print(f"🔥 {ZONES[zone_ids[k]]['name']}: BUILDING → PEAK (Density: {int(intensity[k])})")
+    for k in np.flatnonzero(to_dispersing):
+        print(f"⚠️ {ZONES[zone_ids[k]]['name']}: PEAK → DISPERSING")
+    for k in np.flatnonzero(to_low):
+        print(f"✅ {ZONES[zone_ids[k]]['name']}: DISPERSING → LOW")
+    for k in np.flatnonzero(to_building):
+        print(f"🟢 {ZONES[zone_ids[k]]['name']}: LOW → BUILDING")
+
+
+def ensure_hotspot_centers(zones: Dict[str, np.ndarray], rngs: List[np.random.Generator]):
+    """Seed hotspot centers for zones that have none"""
+    for k in np.flatnonzero(zones['hotspot_count'] == 0):
+        num_hotspots = int(rngs[k].integers(2, 4))
+        set_hotspot_centers(zones, k, random_hotspot_centers(rngs[k], num_hotspots, zones['grid_size'][k]))
+
+
+def _zone_result(zone_id: str, grid_array: np.ndarray, hotspots: List[Dict], recomputed: int) -> Dict:
+    """One zone's grid and summary statistics for the tick"""
+    return {
+        "zone_id": zone_id,
+        "grid": grid_array,
+        "hotspots": hotspots,
+        "avg_density": float(grid_array.mean()),
+        "max_density": int(grid_array.max()),
+        "total": int(grid_array.sum()),
+        "cells_recomputed": recomputed
+    }
+
+
+def simulate_zone_shard(zones: Dict[str, np.ndarray], zone_ids: List[str], seed: Optional[int] = None,
+                        incremental: bool = False, caches: Optional[Dict[str, Dict]] = None) -> Dict:
+    """
+    Advance a block of zones by a tick and compute their grids; runs in the event loop or in a pool worker
+    All randomness comes from each zone's stream for the new tick, so the
+    result does not depend on which worker runs it
+    Returns the updated columns (and incremental caches) so results can come back from a worker process
+    """
+    start = time.perf_counter()
+    caches = {} if caches is None else caches
+    rngs = _next_tick_rngs(zones, zone_ids, seed)
+    update_zone_phases(zones, zone_ids, rngs)
+    ensure_hotspot_centers(zones, rngs)
+    
+    results = []
+    for k, zone_id in enumerate(zone_ids):
+        centers = hotspot_list(zones['hotspots'][k], zones['hotspot_count'][k])
+        base_intensity = float(zones['base_intensity'][k])
+        if incremental:
+            grid_array, hotspots, caches[zone_id], recomputed = density_engine.generate_incremental(
+                zone_id, ZONES[zone_id], centers, base_intensity, rngs[k], caches.get(zone_id)
+            )
+        else:
+            grid_array, hotspots = density_engine.generate(zone_id, ZONES[zone_id], centers, base_intensity, rngs[k])
+            recomputed = grid_array.size
+        results.append(_zone_result(zone_id, grid_array, hotspots, recomputed))
+    
+    return {
+        "state": zones,
+        "caches": caches,
+        "results": results,
+        "zones": len(zone_ids),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+    }
+
+
+def get_agent_engine() -> AgentEngine:
+    """The shared agent engine, created on first use"""
+    global _agent_engine
+    
+    if _agent_engine is None:
+        people_per_agent = float(os.getenv("AGENT_PEOPLE_PER_AGENT", "1"))
+        _agent_engine = AgentEngine(ZONES, people_per_agent=people_per_agent)
+    return _agent_engine
+
+
+def get_flow_model() -> FlowModel:
+    """The shared flow model, created on first use"""
+    global _flow_model
+    
+    if _flow_model is None:
+        _flow_model = FlowModel(ZONES)
+    return _flow_model
+
+
+def reset_crowd_models():
+    """Drop every agent and flow field; the next tick starts from an empty city"""
+    global _agent_engine, _flow_model
+    _agent_engine = None
+    _flow_model = None
+
+
+def reset_zone_simulation():
+    """Drop everything the zone simulation keeps between ticks (not the zone states themselves)"""
+    _density_caches.clear()
+    _last_tick_timing.clear()
+    density_engine.reset()
+    reset_crowd_models()
+
+
+def _model_zone_results(zones: Dict[str, np.ndarray], zone_ids: List[str],
+                        grids: Dict[str, np.ndarray], start: float) -> Dict:
+    """Shard output for models that produce every zone's grid in one step"""
+    results = []
+    for k, zone_id in enumerate(zone_ids):
+        grid_array = grids[zone_id]
+        hotspots = density_engine.extract_hotspots(grid_array, float(zones['base_intensity'][k]),
+                                                   ZONES[zone_id]["center"], zone_cell_size_deg(ZONES[zone_id]))
+        results.append(_zone_result(zone_id, grid_array, hotspots, grid_array.size))
+    
+    return {
+        "state": zones,
+        "caches": {},
+        "results": results,
+        "zones": len(zone_ids),
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)
+    }
+
+
+def simulate_zones_agents(zones: Dict[str, np.ndarray], zone_ids: List[str], seed: Optional[int] = None) -> Dict:
+    """
+    Advance every zone with the agent engine
+    Zone phases still set how many people each zone should hold and where its
+    gates (hotspot centers) are; the grids are rasterized agent positions
+    """
+    start = time.perf_counter()
+    engine = get_agent_engine()
+    streams = rng_streams if seed is None else RandomStreams(seed)
+    
+    rngs = _next_tick_rngs(zones, zone_ids, seed)
+    update_zone_phases(zones, zone_ids, rngs)
+    ensure_hotspot_centers(zones, rngs)
+    
+    grids = engine.step(zones, engine.elapsed(clock.now()),
+                        streams.generator("agents", "engine", engine.tick + 1))
+    return _model_zone_results(zones, zone_ids, grids, start)
+
+
+def simulate_zones_flow(zones: Dict[str, np.ndarray], zone_ids: List[str], seed: Optional[int] = None) -> Dict:
+    """
+    Advance every zone with the cellular-automaton flow model
+    Phases set where the crowd flows and how many arrive; hotspots are no longer
+    re-seeded at random but follow the densest cells of the flow field
+    """
+    start = time.perf_counter()
+    model = get_flow_model()
+    
+    update_zone_phases(zones, zone_ids, _next_tick_rngs(zones, zone_ids, seed), reseed_hotspots=False)
+    
+    grids = model.step(zones)
+    centers, counts = model.peak_cells()
+    zones['hotspots'][...] = 0.0
+    zones['hotspots'][:, :centers.shape[1]] = centers
+    zones['hotspot_count'][...] = counts
+    return _model_zone_results(zones, zone_ids, grids, start)
+
+
+def configure_zone_executor(mode: str = None, workers: int = None, incremental: bool = None,
+                            model: str = None):
+    """
+    Select how zone updates run: 'serial' (on the event loop), 'thread' or 'process',
+    whether grids are updated incrementally (dirty regions only)
+    and which crowd model produces them ('phase' or 'agents')
+    Replaces any running pool so the new settings take effect on the next tick
+    """
+    global _zone_executor
     
-    # Limit to top 3 hotspots per zone (sorted by intensity)
-    hotspots.sort(key=lambda h: h['intensity'], reverse=True)
-    top_hotspots = hotspots[:3]  # Keep only top 3
+    if mode is not None:
+        if mode not in ZONE_EXECUTOR_MODES:
+            raise ValueError(f"Unknown zone executor mode '{mode}' (expected one of {ZONE_EXECUTOR_MODES})")
+        _executor_config['mode'] = mode
+    if workers is not None:
+        _executor_config['workers'] = max(1, int(workers))
+    if incremental is not None:
+        _executor_config['incremental'] = bool(incremental)
+    if model is not None:
+        if model not in CROWD_MODELS:
+            raise ValueError(f"Unknown crowd model '{model}' (expected one of {CROWD_MODELS})")
+        _executor_config['model'] = model
     
-    return grid, top_hotspots
+    shutdown_zone_executor()
+
+
+def get_zone_executor_config() -> Dict:
+    """Current zone executor settings, in the keyword form configure_zone_executor takes"""
+    return dict(_executor_config)
+
+
+def shutdown_zone_executor():
+    """Shut down the zone worker pool if one is running"""
+    global _zone_executor
+    
+    if _zone_executor is not None:
+        _zone_executor.shutdown(wait=False, cancel_futures=True)
+        _zone_executor = None
+
+
+def _get_zone_executor() -> Executor:
+    """Lazily create the worker pool for the configured mode"""
+    global _zone_executor
+    
+    if _zone_executor is None:
+        workers = _executor_config['workers']
+        if _executor_config['mode'] == 'process':
+            _zone_executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _zone_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="zone-sim")
+    return _zone_executor
+
+
+def _shard_rows(count: int, shard_count: int) -> List[Tuple[int, int]]:
+    """Split zone rows into contiguous, near-equal (start, stop) blocks"""
+    shard_count = max(1, min(shard_count, count))
+    size, extra = divmod(count, shard_count)
+    shards = []
+    start = 0
+    for index in range(shard_count):
+        end = start + size + (1 if index < extra else 0)
+        shards.append((start, end))
+        start = end
+    return shards
+
+
+async def _run_zone_shards() -> List[Dict]:
+    """Run zone updates with the configured executor; returns one output per shard"""
+    zones = state_store.zones
+    mode = _executor_config['mode']
+    
+    # Pass the seed explicitly so process workers use the same streams as the parent
+    seed = rng_streams.seed
+    incremental = _executor_config['incremental']
+    if not incremental:
+        _density_caches.clear()
+    
+    model = _executor_config['model']
+    if model != 'phase':
+        # One shared agent population / flow field: runs as a single job, off the loop unless serial
+        simulate = simulate_zones_agents if model == 'agents' else simulate_zones_flow
+        if mode == 'serial':
+            output = simulate(zones.columns(), list(zones.keys), seed)
+        else:
+            output = await asyncio.to_thread(simulate, zones.columns(), list(zones.keys), seed)
+        output['start'] = 0
+        return [output]
+    
+    if mode == 'serial' or len(zones) <= 1:
+        shards = [(0, len(zones))]
+    else:
+        shards = _shard_rows(len(zones), _executor_config['workers'])
+    jobs = [
+        (zones.columns(start, stop), zones.keys[start:stop],
+         {zone_id: _density_caches[zone_id] for zone_id in zones.keys[start:stop] if zone_id in _density_caches})
+        for start, stop in shards
+    ]
+    
+    if len(jobs) == 1:
+        outputs = [simulate_zone_shard(columns, zone_ids, seed, incremental, caches) for columns, zone_ids, caches in jobs]
+    else:
+        loop = asyncio.get_running_loop()
+        executor = _get_zone_executor()
+        outputs = await asyncio.gather(*(
+            loop.run_in_executor(executor, simulate_zone_shard, columns, zone_ids, seed, incremental, caches)
+            for columns, zone_ids, caches in jobs
+        ))
+    
+    for (start, _), output in zip(shards, outputs):
+        output['start'] = start
+    return outputs
 
 
 async def simulate_all_zones_density() -> Dict:
     """
     Simulate crowd density for all zones
+    Zone updates are sharded across a worker pool when one is configured
     Returns comprehensive multi-zone data
     """
-    global _zone_states
-    
     initialize_zone_states()
+    tick_start = time.perf_counter()
+    
+    zones = state_store.zones
+    shard_outputs = await _run_zone_shards()
+    for shard_output in shard_outputs:
+        # Worker processes return copies; write them back as the new state
+        zones.assign(shard_output['state'], shard_output['start'])
+        _density_caches.update(shard_output['caches'])
+    
+    phase = zones.view('phase')
+    grid_size = zones.view('grid_size')
+    capacity = zones.view('capacity')
     
     zones_data = {}
     all_hotspots = []
@@ -212,65 +485,126 @@ async def simulate_all_zones_density() -> Dict:
     max_density_overall = 0
     critical_zones = []
     warning_zones = []
+    cells_recomputed = 0
+    cells_total = 0
     
-    for zone_id, zone_state in _zone_states.items():
-        # Update phase
-        update_zone_phase(zone_state)
-        
-        # Generate grid
-        grid, hotspots = generate_zone_density_grid(zone_state)
-        
-        # Calculate statistics
-        flat_densities = [d for row in grid for d in row]
-        avg_density = sum(flat_densities) / len(flat_densities)
-        max_density = max(flat_densities)
-        
-        total_people += int(avg_density * 100)  # Rough estimate
-        max_density_overall = max(max_density_overall, max_density)
-        
-        # Track zone status
-        if max_density > DENSITY_THRESHOLD_CRITICAL:
-            critical_zones.append(zone_state['zone_name'])
-        elif max_density > DENSITY_THRESHOLD_HIGH:
-            warning_zones.append(zone_state['zone_name'])
-        
-        zones_data[zone_id] = {
-            "zone_id": zone_id,
-            "zone_name": zone_state['zone_name'],
-            "grid": grid,
-            "hotspots": hotspots,
-            "avg_density": round(avg_density, 2),
-            "max_density": int(max_density),
-            "phase": zone_state['phase'],
-            "center": ZONES[zone_id]["center"],
-            "capacity": zone_state['capacity'],
-            "occupancy_percent": round((avg_density / (zone_state['capacity'] / 100)) * 100, 1),
-            "status": "critical" if max_density > DENSITY_THRESHOLD_CRITICAL else 
-                     "warning" if max_density > DENSITY_THRESHOLD_HIGH else "normal"
-        }
-        
-        all_hotspots.extend(hotspots)
+    for shard_output in shard_outputs:
+        for zone_result in shard_output['results']:
+            zone_id = zone_result['zone_id']
+            row = zones.id_of(zone_id)
+            zone_name = ZONES[zone_id]["name"]
+            zone_capacity = int(capacity[row])
+            
+            grid_array = zone_result['grid']
+            hotspots = zone_result['hotspots']
+            avg_density = zone_result['avg_density']
+            max_density = zone_result['max_density']
+            density_engine.update_pyramid(zone_id, grid_array)
+            
+            # Cells hold density per reference-sized cell, so a sum counts people only after area scaling
+            total_people += zone_result['total'] * (zone_resolution(ZONES[zone_id]) / REFERENCE_RESOLUTION_M) ** 2
+            cells_recomputed += zone_result['cells_recomputed']
+            cells_total += grid_array.size
+            max_density_overall = max(max_density_overall, max_density)
+            
+            # Track zone status
+            if max_density > DENSITY_THRESHOLD_CRITICAL:
+                critical_zones.append(zone_name)
+            elif max_density > DENSITY_THRESHOLD_HIGH:
+                warning_zones.append(zone_name)
+            
+            zones_data[zone_id] = {
+                "zone_id": zone_id,
+                "zone_name": zone_name,
+                "grid": grid_array.tolist(),
+                "hotspots": hotspots,
+                "avg_density": round(avg_density, 2),
+                "max_density": int(max_density),
+                "phase": PHASES[phase[row]],
+                "center": ZONES[zone_id]["center"],
+                "grid_size": int(grid_size[row]),
+                "resolution_m": zone_resolution(ZONES[zone_id]),
+                "cell_size_deg": zone_cell_size_deg(ZONES[zone_id]),
+                "pyramid_levels": density_engine.pyramid_depth(zone_id),
+                "capacity": zone_capacity,
+                "occupancy_percent": round((avg_density / (zone_capacity / 100)) * 100, 1),
+                "status": "critical" if max_density > DENSITY_THRESHOLD_CRITICAL else 
+                         "warning" if max_density > DENSITY_THRESHOLD_HIGH else "normal"
+            }
+            
+            all_hotspots.extend(hotspots)
     
     result = {
         "type": "multi_zone_density_update",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": clock.now().isoformat(),
         "zones": zones_data,
         "summary": {
             "total_zones": len(zones_data),
-            "total_people_estimate": total_people,
+            "total_people_estimate": int(round(total_people)),
             "max_density_overall": max_density_overall,
             "critical_zones": critical_zones,
             "warning_zones": warning_zones,
-            "all_hotspots": all_hotspots[:21]  # Max 3 per zone × 7 zones = 21
+            # Each zone contributes at most max_hotspots, so the cap grows with the zone table
+            "all_hotspots": all_hotspots[:density_engine.max_hotspots * len(zones_data)]
         }
     }
     
+    # Timings are kept out of the payload so identical seeds give identical payloads
+    _last_tick_timing.update({
+        "timestamp": result["timestamp"],
+        "mode": _executor_config['mode'],
+        "workers": _executor_config['workers'],
+        "incremental": _executor_config['incremental'],
+        "model": _executor_config['model'],
+        "agents": _agent_engine.stats() if _executor_config['model'] == 'agents' else None,
+        "cells_recomputed": cells_recomputed,
+        "cells_total": cells_total,
+        "wall_ms": round((time.perf_counter() - tick_start) * 1000, 2),
+        "shards": [
+            {"zones": output['zones'], "elapsed_ms": output['elapsed_ms']}
+            for output in shard_outputs
+        ]
+    })
+    
     total_hotspots = sum(len(z.get('hotspots', [])) for z in zones_data.values())
-    print(f"📊 Generated multi-zone data: {len(zones_data)} zones with {total_hotspots} total hotspots (max 3/zone)")
+    timing = _last_tick_timing
+    print(f"📊 Generated multi-zone data: {len(zones_data)} zones with {total_hotspots} total hotspots "
+          f"(max 3/zone) in {timing['wall_ms']}ms [{timing['mode']} × {len(shard_outputs)} shards]")
     
     return result
 
 
+def get_zone_tick_timing() -> Dict:
+    """Timing of the latest density tick (wall time and per-shard elapsed)"""
+    return dict(_last_tick_timing)
+
+
+def get_zone_grid_level(zone_id: str, level: int = 0) -> Optional[Dict]:
+    """
+    Get a zone's latest grid at a pyramid level
+    Level 0 is full resolution; each level halves the grid side by sum-pooling
+    """
+    grid = density_engine.get_level(zone_id, level)
+    if grid is None:
+        return None
+    
+    depth = density_engine.pyramid_depth(zone_id)
+    level = min(max(0, level), depth - 1)
+    zone_config = ZONES[zone_id]
+    scale = 2 ** level
+    
+    return {
+        "zone_id": zone_id,
+        "level": level,
+        "levels": depth,
+        "grid": grid.tolist(),
+        "grid_size": grid.shape[0],
+        "resolution_m": zone_resolution(zone_config) * scale,
+        "cell_size_deg": zone_cell_size_deg(zone_config) * scale,
+        "center": zone_config["center"]
+    }
+
+
 def check_multi_zone_alerts(zone_density_data: Dict, metro_data: Dict) -> List[Dict]:
     """
     Check alerts for all zones
@@ -301,7 +635,7 @@ def check_multi_zone_alerts(zone_density_data: Dict, metro_data: Dict) -> List[D
                 "threshold": DENSITY_THRESHOLD_CRITICAL,
                 "recommendation": "Immediate crowd control measures required",
                 "location": zone_center,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": clock.now().isoformat()
             })
         
         # Warning density alert
@@ -317,7 +651,7 @@ def check_multi_zone_alerts(zone_density_data: Dict, metro_data: Dict) -> List[D
                 "threshold": DENSITY_THRESHOLD_HIGH,
                 "recommendation": "Monitor situation closely",
                 "location": zone_center,
-                "timestamp": datetime.now().isoformat()
+                "timestamp": clock.now().isoformat()
             })
     
     # Metro-specific alerts (if MG Road Metro has high exit rate)
@@ -337,7 +671,7 @@ def check_multi_zone_alerts(zone_density_data: Dict, metro_data: Dict) -> List[D
                 "threshold": "Multiple thresholds exceeded",
                 "recommendation": "Deploy crowd management personnel immediately",
                 "location": ZONES["mg_road_metro"]["center"],
-                "timestamp": datetime.now().isoformat()
+                "timestamp": clock.now().isoformat()
             })
     
     return alerts
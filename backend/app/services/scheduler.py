@@ -0,0 +1,241 @@
+"""
+Job Scheduler
+Owns every periodic background job: when it runs, what happens when it
+fails, and how long it takes
+
+Deadlines are absolute (first run at `delay`, then every `interval`), so the
+time a run takes never pushes later runs back. Simulation jobs follow the
+simulation clock, and so follow its speed; `realtime` jobs (network
+housekeeping) use the monotonic clock. A job never overlaps itself: a deadline
+that comes while the previous run is still going is skipped and counted, as
+are deadlines that passed while the loop could not wake up (missed). A run
+that raises is retried after an exponential backoff, and the backoff resets
+on the first success. Optional jitter spreads a job's start over a few
+seconds after each deadline.
+"""
+
+import asyncio
+import math
+import os
+import random
+import time
+import traceback
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional
+
+from app.utils import clock
+
+# Retry delays after a failed run: BACKOFF_BASE, doubling up to BACKOFF_MAX (wall seconds)
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+
+
+class Job:
+    """One periodic job and its timing stats"""
+
+    def __init__(self, name: str, func: Callable[[], Awaitable[None]], interval: float, delay: float = 0.0,
+                 jitter: float = 0.0, condition: Optional[Callable[[], bool]] = None, realtime: bool = False):
+        if interval <= 0:
+            raise ValueError(f"Job '{name}' needs a positive interval, got {interval}")
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.delay = delay
+        self.jitter = max(0.0, jitter)
+        self.condition = condition
+        self.realtime = realtime
+
+        self.state = "stopped"
+        self.deadline = 0.0
+        self.running: Optional[asyncio.Task] = None
+        self._supervisor: Optional[asyncio.Task] = None
+
+        # Scheduled runs, and attempts (a run plus its retries); durations are per attempt
+        self.runs = 0
+        self.attempts = 0
+        self.failures = 0
+        self.retries = 0
+        self.consecutive_failures = 0
+        self.missed = 0
+        self.overlaps = 0
+        self.idle = 0
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.last_run: Optional[datetime] = None
+        self.duration_last = 0.0
+        self.duration_max = 0.0
+        self._duration_total = 0.0
+        self.lateness_last = 0.0
+        self.lateness_max = 0.0
+
+    def elapsed(self) -> float:
+        return time.monotonic() if self.realtime else clock.elapsed()
+
+    async def sleep_until(self, deadline: float):
+        if self.realtime:
+            await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+        else:
+            await clock.get_clock().sleep_until(deadline)
+
+    def wall_seconds(self, seconds: float) -> float:
+        """A span in this job's time base, in wall seconds"""
+        return seconds if self.realtime else seconds / clock.get_speed()
+
+    def stats(self) -> Dict:
+        return {
+            "interval_s": self.interval,
+            "realtime": self.realtime,
+            "jitter_s": self.jitter,
+            "state": self.state,
+            "runs": self.runs,
+            "attempts": self.attempts,
+            "failures": self.failures,
+            "retries": self.retries,
+            "consecutive_failures": self.consecutive_failures,
+            "missed_deadlines": self.missed,
+            "skipped_overlaps": self.overlaps,
+            "skipped_idle": self.idle,
+            "supervisor_restarts": self.restarts,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_error": self.last_error,
+            "next_run_in_s": round(max(0.0, self.wall_seconds(self.deadline - self.elapsed())), 3)
+            if self.state != "stopped" else None,
+            "duration_ms": {
+                "last": round(self.duration_last * 1000, 3),
+                "avg": round(self._duration_total / self.attempts * 1000, 3) if self.attempts else 0.0,
+                "max": round(self.duration_max * 1000, 3)
+            },
+            "start_lateness_ms": {
+                "last": round(self.lateness_last * 1000, 3),
+                "max": round(self.lateness_max * 1000, 3)
+            }
+        }
+
+
+class Scheduler:
+    """Runs registered jobs on absolute deadlines under supervision"""
+
+    def __init__(self, jitter: float = None):
+        # Default jitter (seconds) for jobs that don't set their own
+        self.jitter = float(jitter if jitter is not None else os.getenv("SCHEDULER_JITTER", 0))
+        self.jobs: Dict[str, Job] = {}
+        # Jitter draws come from their own generator so they never shift seeded simulation streams
+        self._random = random.Random()
+
+    def add(self, name: str, func: Callable[[], Awaitable[None]], interval: float, delay: float = 0.0,
+            jitter: float = None, condition: Optional[Callable[[], bool]] = None, realtime: bool = False) -> Job:
+        """
+        Register a periodic job (call start() to run it)
+        `condition`: checked at each deadline; when False the run is skipped
+        """
+        if name in self.jobs:
+            raise ValueError(f"Job '{name}' is already scheduled")
+        job = Job(name, func, interval, delay, self.jitter if jitter is None else jitter, condition, realtime)
+        self.jobs[name] = job
+        return job
+
+    def start(self, name: str = None):
+        """Start one job, or every job that is not running yet"""
+        for job in ([self.jobs[name]] if name else self.jobs.values()):
+            if job._supervisor is None or job._supervisor.done():
+                job._supervisor = asyncio.create_task(self._supervise(job))
+
+    async def stop(self):
+        """Cancel every job and any run in progress"""
+        tasks = []
+        for job in self.jobs.values():
+            for task in (job._supervisor, job.running):
+                if task is not None and not task.done():
+                    task.cancel()
+                    tasks.append(task)
+            job.state = "stopped"
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _supervise(self, job: Job):
+        """Keep the job's deadline loop alive; restart it with backoff if it ever dies"""
+        job.deadline = job.elapsed() + job.delay
+        while True:
+            try:
+                await self._loop(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.restarts += 1
+                backoff = min(BACKOFF_BASE_SECONDS * 2 ** (job.restarts - 1), BACKOFF_MAX_SECONDS)
+                job.state = "backoff"
+                job.last_error = f"scheduler: {e}"
+                print(f"❌ Scheduler loop for '{job.name}' crashed ({e}); restarting in {backoff:.0f}s")
+                await asyncio.sleep(backoff)
+
+    async def _loop(self, job: Job):
+        while True:
+            if job.running is None or job.running.done():
+                job.state = "waiting"
+            offset = self._random.uniform(0, job.jitter) if job.jitter else 0.0
+            await job.sleep_until(job.deadline + offset)
+
+            if job.running is not None and not job.running.done():
+                job.overlaps += 1
+            elif job.condition is not None and not job.condition():
+                job.idle += 1
+            else:
+                job.lateness_last = job.wall_seconds(job.elapsed() - job.deadline - offset)
+                job.lateness_max = max(job.lateness_max, job.lateness_last)
+                job.running = asyncio.create_task(self._run(job))
+
+            # Next deadline on the original grid; ones already gone by are missed, not run late
+            job.deadline += job.interval
+            behind = job.elapsed() - job.deadline
+            if behind > 0:
+                skipped = math.floor(behind / job.interval) + 1
+                job.missed += skipped
+                job.deadline += skipped * job.interval
+
+    async def _run(self, job: Job):
+        """One run, retried after a backoff while it keeps failing"""
+        job.runs += 1
+        while True:
+            job.state = "running"
+            job.last_run = datetime.now()
+            started = time.perf_counter()
+            try:
+                await job.func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                job.failures += 1
+                job.consecutive_failures += 1
+                job.last_error = f"{type(e).__name__}: {e}"
+                print(f"❌ Job '{job.name}' failed: {job.last_error}")
+                traceback.print_exc()
+                backoff = min(BACKOFF_BASE_SECONDS * 2 ** (job.consecutive_failures - 1), BACKOFF_MAX_SECONDS)
+                # Retry before the next deadline if there is room; otherwise that deadline is the retry
+                if backoff >= job.wall_seconds(job.deadline - job.elapsed()):
+                    job.state = "waiting"
+                    return
+                job.state = "backoff"
+                await asyncio.sleep(backoff)
+                job.retries += 1
+                continue
+            finally:
+                duration = time.perf_counter() - started
+                job.duration_last = duration
+                job.duration_max = max(job.duration_max, duration)
+                job._duration_total += duration
+                job.attempts += 1
+
+            job.consecutive_failures = 0
+            job.state = "waiting"
+            return
+
+    def stats(self) -> Dict:
+        """Timing and failure stats for every job"""
+        return {
+            "clock_speed": clock.get_speed(),
+            "default_jitter_s": self.jitter,
+            "jobs": {name: job.stats() for name, job in self.jobs.items()}
+        }
+
+
+# Global scheduler for the server's background jobs
+scheduler = Scheduler()
@@ -0,0 +1,189 @@
+"""
+Simulation Executor
+Runs the simulation ticks on one dedicated thread, off the event loop that
+serves /ws and the REST API
+
+The thread has its own asyncio loop, so the async simulators run there
+unchanged and the zone worker pools still fan out from it. Every tick comes
+back as a TickResult: immutable, and its message is never touched by the
+simulation thread again, so the server loop can publish it as-is. Simulation
+state (state_store, density pyramids) is only read and written on this
+thread; REST endpoints that read it go through call(). Log lines are printed
+from this thread too, so stdout writes never block the server loop.
+
+What the server loop still does per tick is the handoff: history, alerts and
+queueing frames, timed per job as handoff_ms. LoopLagMonitor measures how
+late the loop wakes from a short sleep. That lag is the loop's blocking time,
+and it is checked against LOOP_LAG_BUDGET_MS.
+"""
+
+import asyncio
+import inspect
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, NamedTuple
+
+# How often the loop-lag monitor samples, and how many samples it keeps (one minute)
+LAG_SAMPLE_INTERVAL_SECONDS = 0.1
+LAG_WINDOW_SAMPLES = 600
+
+
+class TickResult(NamedTuple):
+    """One finished simulation tick, handed from the simulation thread to the server loop"""
+    job: str
+    message: Dict
+    compute_ms: float
+    queued_ms: float
+
+
+class _JobTiming:
+    def __init__(self):
+        self.ticks = 0
+        self.compute_last = 0.0
+        self.compute_max = 0.0
+        self.compute_total = 0.0
+        self.queued_max = 0.0
+        self.handoff_last = 0.0
+        self.handoff_max = 0.0
+
+    def stats(self) -> Dict:
+        return {
+            "ticks": self.ticks,
+            "compute_ms": {
+                "last": round(self.compute_last, 3),
+                "avg": round(self.compute_total / self.ticks, 3) if self.ticks else 0.0,
+                "max": round(self.compute_max, 3)
+            },
+            "queued_ms_max": round(self.queued_max, 3),
+            "handoff_ms": {"last": round(self.handoff_last, 3), "max": round(self.handoff_max, 3)}
+        }
+
+
+class SimulationExecutor:
+    """A single simulation thread running its own event loop"""
+
+    def __init__(self):
+        self._loop: asyncio.AbstractEventLoop = None
+        self._thread: threading.Thread = None
+        self._start_lock = threading.Lock()
+        self.timings: Dict[str, _JobTiming] = {}
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._start_lock:
+            if self._loop is None:
+                ready = threading.Event()
+
+                def run():
+                    self._loop = asyncio.new_event_loop()
+                    asyncio.set_event_loop(self._loop)
+                    ready.set()
+                    self._loop.run_forever()
+
+                self._thread = threading.Thread(target=run, name="simulation", daemon=True)
+                self._thread.start()
+                ready.wait()
+        return self._loop
+
+    async def _on_thread(self, func: Callable, args) -> Any:
+        result = func(*args)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def call(self, func: Callable, *args) -> Any:
+        """Run func (plain or async) on the simulation thread and await its result"""
+        future = asyncio.run_coroutine_threadsafe(self._on_thread(func, args), self._ensure_started())
+        return await asyncio.wrap_future(future)
+
+    async def tick(self, job: str, func: Callable, *args) -> TickResult:
+        """Run one simulation tick on the simulation thread; the message it returns is the loop's from now on"""
+        submitted = time.perf_counter()
+
+        async def timed():
+            started = time.perf_counter()
+            message = await self._on_thread(func, args)
+            return message, started, time.perf_counter()
+
+        message, started, finished = await self.call(timed)
+        result = TickResult(job, message, (finished - started) * 1000, (started - submitted) * 1000)
+
+        timing = self.timings.setdefault(job, _JobTiming())
+        timing.ticks += 1
+        timing.compute_last = result.compute_ms
+        timing.compute_max = max(timing.compute_max, result.compute_ms)
+        timing.compute_total += result.compute_ms
+        timing.queued_max = max(timing.queued_max, result.queued_ms)
+        return result
+
+    @contextmanager
+    def handoff(self, job: str):
+        """Time the server loop's share of a tick (history, alerts, queueing frames)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            timing = self.timings.setdefault(job, _JobTiming())
+            timing.handoff_last = (time.perf_counter() - started) * 1000
+            timing.handoff_max = max(timing.handoff_max, timing.handoff_last)
+
+    def log(self, text: str):
+        """Print from the simulation thread instead of the server loop"""
+        self._ensure_started().call_soon_threadsafe(print, text)
+
+    def shutdown(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+            self._loop = None
+            self._thread = None
+
+    def stats(self) -> Dict:
+        return {
+            "thread": self._thread.name if self._thread else None,
+            "running": bool(self._thread and self._thread.is_alive()),
+            "jobs": {job: timing.stats() for job, timing in self.timings.items()}
+        }
+
+
+class LoopLagMonitor:
+    """How late the server loop wakes from a short sleep: its worst-case blocking time"""
+
+    def __init__(self, budget_ms: float = None):
+        self.budget_ms = float(budget_ms or os.getenv("LOOP_LAG_BUDGET_MS", 50))
+        self.samples: Deque[float] = deque(maxlen=LAG_WINDOW_SAMPLES)
+        self.max_ms = 0.0
+        self.over_budget = 0
+        self.total_samples = 0
+
+    async def run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(LAG_SAMPLE_INTERVAL_SECONDS)
+            lag_ms = max(0.0, (time.perf_counter() - started - LAG_SAMPLE_INTERVAL_SECONDS) * 1000)
+            self.samples.append(lag_ms)
+            self.total_samples += 1
+            self.max_ms = max(self.max_ms, lag_ms)
+            if lag_ms > self.budget_ms:
+                self.over_budget += 1
+
+    def stats(self) -> Dict:
+        recent = sorted(self.samples)
+        pick = lambda p: round(recent[min(len(recent) - 1, int(p / 100 * len(recent)))], 3) if recent else None
+        return {
+            "budget_ms": self.budget_ms,
+            "window_seconds": round(len(recent) * LAG_SAMPLE_INTERVAL_SECONDS, 1),
+            "p50_ms": pick(50),
+            "p99_ms": pick(99),
+            "window_max_ms": round(recent[-1], 3) if recent else None,
+            "max_ms": round(self.max_ms, 3),
+            "samples": self.total_samples,
+            "over_budget": self.over_budget
+        }
+
+
+# Global simulation executor and loop-lag monitor for the server
+sim_executor = SimulationExecutor()
+loop_lag = LoopLagMonitor()
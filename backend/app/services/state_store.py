@@ -0,0 +1,252 @@
+"""
+Simulation State Store
+Live state of every simulated entity - zones, metro stations, first
+responders and the legacy stadium crowd - in one place
+
+Each kind of entity is a table of typed NumPy columns (structure of arrays)
+with stable integer ids, so a simulator updates a whole population in one
+array pass. Readers get read-only views, or read-only copies as snapshots,
+instead of the live buffers.
+"""
+
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+# Crowd lifecycle phases; a phase column stores the index into this tuple
+PHASES = ('low', 'building', 'peak', 'dispersing')
+PHASE_CODE = {phase: code for code, phase in enumerate(PHASES)}
+
+# Most hotspot centers a zone or crowd keeps
+MAX_HOTSPOTS = 4
+
+# Column name -> (dtype, per-row shape)
+ZONE_COLUMNS = {
+    "phase": (np.int8, ()),
+    "base_intensity": (np.float64, ()),
+    "cycle_count": (np.int64, ()),
+    "phase_duration": (np.int32, ()),
+    "capacity": (np.int64, ()),
+    "type_code": (np.int16, ()),          # index into zone_registry.types
+    "grid_size": (np.int32, ()),
+    "hotspot_count": (np.int8, ()),
+    "hotspots": (np.float64, (MAX_HOTSPOTS, 2))   # (i, j) grid positions
+}
+
+CROWD_COLUMNS = {
+    "phase": (np.int8, ()),
+    "base_intensity": (np.float64, ()),
+    "cycle_count": (np.int64, ()),
+    "phase_duration": (np.int32, ()),
+    "metro_ticks": (np.int64, ()),
+    "hotspot_count": (np.int8, ()),
+    "hotspots": (np.float64, (MAX_HOTSPOTS, 2))
+}
+
+STATION_COLUMNS = {
+    "tick": (np.int64, ()),
+    "capacity": (np.int32, ()),
+    "entry_rate": (np.int32, ()),
+    "exit_rate": (np.int32, ())
+}
+
+RESPONDER_COLUMNS = {
+    "type_code": (np.int8, ()),           # index into RESPONDER_TYPES
+    "status": (np.int8, ()),              # index into RESPONDER_STATUSES
+    "lat": (np.float64, ()),
+    "lon": (np.float64, ()),
+    "speed": (np.int16, ()),
+    "target_zone": (np.int32, ()),        # index into PATROL_ZONES
+    "tick": (np.int64, ()),
+    "last_update": (np.float64, ())       # POSIX seconds of simulation time
+}
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+def hotspot_list(hotspots: np.ndarray, count: int) -> List[Dict]:
+    """A row's hotspot centers as the [{'i': .., 'j': ..}] list the density engines take"""
+    return [{'i': float(i), 'j': float(j)} for i, j in hotspots[:int(count)]]
+
+
+class EntityTable:
+    """
+    Typed columns for one kind of entity; row i holds the entity with id i
+    Ids are given out in insertion order and never reused while the table lives
+    """
+
+    def __init__(self, name: str, columns: Dict[str, Tuple], capacity: int = 16):
+        self.name = name
+        self.schema = {column: (np.dtype(dtype), tuple(shape)) for column, (dtype, shape) in columns.items()}
+        self.keys: List[str] = []
+        self.ids: Dict[str, int] = {}
+        self._columns = {
+            column: np.zeros((capacity,) + shape, dtype=dtype)
+            for column, (dtype, shape) in self.schema.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.ids
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        """Live, writable view of a column (for the simulator that owns the table)"""
+        return self._columns[column][:len(self.keys)]
+
+    def __setitem__(self, column: str, values):
+        """Overwrite a whole column (also what `table[column] += ...` ends in)"""
+        self._columns[column][:len(self.keys)] = values
+
+    @property
+    def capacity(self) -> int:
+        return len(next(iter(self._columns.values())))
+
+    def _reserve(self, rows: int):
+        """Grow every column to hold at least `rows` entities (doubling)"""
+        if rows <= self.capacity:
+            return
+        capacity = max(rows, 2 * self.capacity)
+        for column, array in self._columns.items():
+            grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            grown[:len(self.keys)] = array[:len(self.keys)]
+            self._columns[column] = grown
+
+    def id_of(self, key: str) -> int:
+        return self.ids[key]
+
+    def add(self, key: str, **values) -> int:
+        """Append one entity; returns its id"""
+        return int(self.extend([key], **{column: [value] for column, value in values.items()})[0])
+
+    def extend(self, keys: Iterable[str], **columns) -> np.ndarray:
+        """Append many entities at once; columns not given start at zero. Returns their ids"""
+        keys = list(keys)
+        duplicates = [key for key in keys if key in self.ids]
+        if duplicates or len(set(keys)) != len(keys):
+            raise ValueError(f"Duplicate {self.name} keys: {duplicates or keys}")
+
+        start = len(self.keys)
+        self._reserve(start + len(keys))
+        for column, values in columns.items():
+            self._columns[column][start:start + len(keys)] = values
+        for offset, key in enumerate(keys):
+            self.ids[key] = start + offset
+        self.keys.extend(keys)
+        return np.arange(start, start + len(keys))
+
+    def columns(self, start: int = 0, stop: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Live, writable views of every column over a block of rows"""
+        stop = len(self.keys) if stop is None else stop
+        return {column: array[start:stop] for column, array in self._columns.items()}
+
+    def assign(self, columns: Dict[str, np.ndarray], start: int = 0):
+        """Write a block of rows back (e.g. columns updated in a worker process)"""
+        for column, values in columns.items():
+            self._columns[column][start:start + len(values)] = values
+
+    def view(self, column: str) -> np.ndarray:
+        """Read-only view of a column; follows later updates"""
+        return _read_only(self[column])
+
+    def snapshot(self) -> Dict[str, np.ndarray]:
+        """Read-only copy of every column as of now"""
+        return {column: _read_only(self[column].copy()) for column in self._columns}
+
+    def row(self, entity: Union[str, int]) -> Dict:
+        """One entity as a dict of Python values"""
+        index = self.ids[entity] if isinstance(entity, str) else int(entity)
+        return {column: array[index].tolist() for column, array in self._columns.items()}
+
+    def update(self, entity: Union[str, int], **values):
+        """Set columns of one entity"""
+        index = self.ids[entity] if isinstance(entity, str) else int(entity)
+        for column, value in values.items():
+            self._columns[column][index] = value
+
+    def clear(self):
+        """Drop every entity (ids start again from 0)"""
+        self.keys = []
+        self.ids = {}
+        for array in self._columns.values():
+            array[...] = 0
+
+    def stats(self) -> Dict:
+        row_bytes = sum(
+            dtype.itemsize * int(np.prod(shape, dtype=np.int64)) for dtype, shape in self.schema.values()
+        )
+        return {
+            "count": len(self.keys),
+            "capacity": self.capacity,
+            "bytes_per_entity": row_bytes,
+            "bytes": sum(array.nbytes for array in self._columns.values())
+        }
+
+
+class StateStore:
+    """Every entity table of the running simulation"""
+
+    def __init__(self):
+        self.zones = EntityTable("zones", ZONE_COLUMNS)
+        self.crowds = EntityTable("crowds", CROWD_COLUMNS, capacity=1)
+        self.stations = EntityTable("stations", STATION_COLUMNS)
+        self.responders = EntityTable("responders", RESPONDER_COLUMNS)
+
+    def stadium_crowd(self) -> Dict:
+        """
+        The legacy single-stadium crowd (created on first use), with its phase
+        by name and hotspot centers as a list; the density and metro simulators share it
+        """
+        if "stadium" not in self.crowds:
+            self.crowds.add("stadium", phase=PHASE_CODE['building'], base_intensity=20)
+        crowd = self.crowds.row("stadium")
+        crowd['phase'] = PHASES[crowd['phase']]
+        crowd['hotspot_centers'] = hotspot_list(np.array(crowd.pop('hotspots')), crowd.pop('hotspot_count'))
+        return crowd
+
+    def save_stadium_crowd(self, crowd: Dict):
+        """Write back a crowd dict in the shape stadium_crowd returns"""
+        centers = [(center['i'], center['j']) for center in crowd['hotspot_centers']][:MAX_HOTSPOTS]
+        hotspots = np.zeros((MAX_HOTSPOTS, 2))
+        hotspots[:len(centers)] = np.array(centers).reshape(-1, 2)
+        self.crowds.update(
+            "stadium",
+            phase=PHASE_CODE[crowd['phase']],
+            base_intensity=crowd['base_intensity'],
+            cycle_count=crowd['cycle_count'],
+            phase_duration=crowd['phase_duration'],
+            metro_ticks=crowd['metro_ticks'],
+            hotspots=hotspots,
+            hotspot_count=len(centers)
+        )
+
+    def tables(self) -> Dict[str, EntityTable]:
+        return {
+            "zones": self.zones,
+            "crowds": self.crowds,
+            "stations": self.stations,
+            "responders": self.responders
+        }
+
+    def snapshot(self) -> Dict[str, Dict]:
+        """Read-only copies of every table, with the keys that map ids back to entities"""
+        return {
+            name: {"keys": list(table.keys), "columns": table.snapshot()}
+            for name, table in self.tables().items()
+        }
+
+    def stats(self) -> Dict:
+        return {name: table.stats() for name, table in self.tables().items()}
+
+    def reset(self):
+        """Forget every entity; simulators re-create theirs on their next tick"""
+        for table in self.tables().values():
+            table.clear()
+
+
+# Global state store
+state_store = StateStore()
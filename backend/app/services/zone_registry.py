@@ -0,0 +1,245 @@
+"""
+Zone Registry
+Monitored zones loaded from GeoJSON or CSV into compact arrays,
+with a uniform-grid spatial index for point-to-zone and nearest-zone lookups
+
+The hand-written ZONES dict in constants.py is the default dataset;
+set ZONES_FILE to a .geojson/.json or .csv file to load another one.
+"""
+
+import csv
+import json
+import math
+import os
+import numpy as np
+from typing import Dict, Iterator, List, Optional, Tuple
+from app.utils.constants import DEFAULT_ZONE_RESOLUTION, ZONES
+
+# Approximate meters per degree around Bengaluru (same as the density grids)
+METERS_PER_DEGREE = 111000
+
+# Optional per-zone fields and their defaults
+ZONE_DEFAULTS = {
+    "resolution": DEFAULT_ZONE_RESOLUTION,
+    "icon": "📍",
+    "color": "#666666",
+    "monitoring": True
+}
+
+
+def _zone_config(zone_id: str, name: str, lat: float, lon: float, radius: float,
+                 capacity: int, zone_type: str, extra: Dict) -> Dict:
+    """Zone config in the same shape as the entries of constants.ZONES"""
+    config = {
+        "id": zone_id,
+        "name": name or zone_id,
+        "center": [float(lat), float(lon)],
+        "radius": float(radius),
+        "capacity": int(capacity),
+        "type": zone_type or "mixed"
+    }
+    for key, default in ZONE_DEFAULTS.items():
+        config[key] = extra.get(key, default) if extra.get(key) not in (None, "") else default
+    config["resolution"] = float(config["resolution"])
+    if isinstance(config["monitoring"], str):
+        config["monitoring"] = config["monitoring"].strip().lower() not in ("false", "0", "no")
+    return config
+
+
+def _polygon_center_radius(coordinates: List) -> Tuple[float, float, float]:
+    """Centroid (vertex mean) of a polygon's outer ring and the distance to its farthest vertex"""
+    ring = np.asarray(coordinates[0], dtype=np.float64)
+    lon, lat = ring[:, 0].mean(), ring[:, 1].mean()
+    radius = np.hypot(ring[:, 0] - lon, ring[:, 1] - lat).max() * METERS_PER_DEGREE
+    return lat, lon, radius
+
+
+def read_geojson(path: str) -> Dict[str, Dict]:
+    """
+    Zones from a GeoJSON FeatureCollection
+    Point features need a radius property; Polygon features get one from their extent
+    """
+    with open(path, encoding="utf-8") as f:
+        collection = json.load(f)
+
+    zones = {}
+    for index, feature in enumerate(collection.get("features", [])):
+        properties = feature.get("properties") or {}
+        geometry = feature.get("geometry") or {}
+        if geometry.get("type") == "Point":
+            lon, lat = geometry["coordinates"][:2]
+            radius = properties.get("radius", 500)
+        elif geometry.get("type") == "Polygon":
+            lat, lon, radius = _polygon_center_radius(geometry["coordinates"])
+            radius = properties.get("radius", radius)
+        else:
+            continue
+
+        zone_id = str(properties.get("id", feature.get("id", f"zone_{index}")))
+        zones[zone_id] = _zone_config(
+            zone_id, properties.get("name"), lat, lon, radius,
+            properties.get("capacity", 10000), properties.get("type"), properties
+        )
+    return zones
+
+
+def read_csv(path: str) -> Dict[str, Dict]:
+    """Zones from a CSV file with columns id,name,lat,lon,radius,capacity,type (plus optional extras)"""
+    zones = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            zone_id = row["id"].strip()
+            zones[zone_id] = _zone_config(
+                zone_id, row.get("name"), float(row["lat"]), float(row["lon"]),
+                float(row.get("radius") or 500), int(float(row.get("capacity") or 10000)),
+                row.get("type"), row
+            )
+    return zones
+
+
+class ZoneRegistry:
+    """
+    Zones as parallel NumPy arrays plus a bucket index
+    Every bucket lists the zones whose circle overlaps it, so a point lookup
+    only tests the handful of zones in one bucket
+    """
+
+    def __init__(self, zones: Dict[str, Dict]):
+        self.zones = zones
+        self.ids = list(zones)
+        self.index = {zone_id: i for i, zone_id in enumerate(self.ids)}
+
+        configs = list(zones.values())
+        self.lat = np.array([z["center"][0] for z in configs], dtype=np.float64)
+        self.lon = np.array([z["center"][1] for z in configs], dtype=np.float64)
+        self.radius = np.array([z["radius"] for z in configs], dtype=np.float64)
+        self.capacity = np.array([z["capacity"] for z in configs], dtype=np.int64)
+        self.types, self.type_code = np.unique([z["type"] for z in configs], return_inverse=True)
+
+        # Planar meters (x east, y north), same convention as the zone grids
+        self.x = self.lon * METERS_PER_DEGREE
+        self.y = self.lat * METERS_PER_DEGREE
+        self._build_index()
+
+    def _build_index(self):
+        """Bucket side ~ the typical zone diameter keeps buckets small"""
+        self.bucket_size = max(1.0, 2 * float(np.median(self.radius))) if self.ids else 1.0
+        self.buckets: Dict[Tuple[int, int], np.ndarray] = {}
+        self.center_buckets: Dict[Tuple[int, int], np.ndarray] = {}
+
+        overlap: Dict[Tuple[int, int], List[int]] = {}
+        centers: Dict[Tuple[int, int], List[int]] = {}
+        for i in range(len(self.ids)):
+            x0, x1 = self._bucket(self.x[i] - self.radius[i]), self._bucket(self.x[i] + self.radius[i])
+            y0, y1 = self._bucket(self.y[i] - self.radius[i]), self._bucket(self.y[i] + self.radius[i])
+            for bx in range(x0, x1 + 1):
+                for by in range(y0, y1 + 1):
+                    overlap.setdefault((bx, by), []).append(i)
+            centers.setdefault((self._bucket(self.x[i]), self._bucket(self.y[i])), []).append(i)
+
+        self.buckets = {key: np.array(members, dtype=np.int64) for key, members in overlap.items()}
+        self.center_buckets = {key: np.array(members, dtype=np.int64) for key, members in centers.items()}
+        if centers:
+            keys = np.array(list(centers))
+            self._bucket_extent = (keys[:, 0].min(), keys[:, 0].max(), keys[:, 1].min(), keys[:, 1].max())
+
+    def _bucket(self, meters: float) -> int:
+        return int(math.floor(meters / self.bucket_size))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.zones.values())
+
+    def __contains__(self, zone_id: str) -> bool:
+        return zone_id in self.zones
+
+    def get(self, zone_id: str) -> Optional[Dict]:
+        return self.zones.get(zone_id)
+
+    def _distances(self, candidates: np.ndarray, lat: float, lon: float) -> np.ndarray:
+        """Distances (meters) from a point to candidate zone centers"""
+        return np.hypot(self.x[candidates] - lon * METERS_PER_DEGREE, self.y[candidates] - lat * METERS_PER_DEGREE)
+
+    def zones_at(self, lat: float, lon: float) -> List[str]:
+        """Ids of every zone containing a point, closest center first"""
+        x, y = lon * METERS_PER_DEGREE, lat * METERS_PER_DEGREE
+        candidates = self.buckets.get((self._bucket(x), self._bucket(y)))
+        if candidates is None:
+            return []
+        distance = self._distances(candidates, lat, lon)
+        inside = distance <= self.radius[candidates]
+        order = np.argsort(distance[inside], kind='stable')
+        return [self.ids[i] for i in candidates[inside][order]]
+
+    def zone_at(self, lat: float, lon: float) -> Optional[str]:
+        """The zone containing a point (closest center if zones overlap), or None"""
+        zones = self.zones_at(lat, lon)
+        return zones[0] if zones else None
+
+    def nearest(self, lat: float, lon: float, count: int = 1) -> List[Tuple[str, float]]:
+        """
+        The closest zone centers to a point as (zone id, meters)
+        Searches rings of buckets outward until no closer center can remain
+        """
+        if not self.ids:
+            return []
+        count = min(count, len(self.ids))
+        bx, by = self._bucket(lon * METERS_PER_DEGREE), self._bucket(lat * METERS_PER_DEGREE)
+        min_x, max_x, min_y, max_y = self._bucket_extent
+        max_ring = max(abs(bx - min_x), abs(bx - max_x), abs(by - min_y), abs(by - max_y))
+
+        found: List[np.ndarray] = []
+        for ring in range(max_ring + 1):
+            for key in self._ring(bx, by, ring):
+                members = self.center_buckets.get(key)
+                if members is not None:
+                    found.append(members)
+            if found:
+                candidates = np.concatenate(found)
+                distance = self._distances(candidates, lat, lon)
+                # Anything in a farther ring is at least ring * bucket_size away
+                if len(candidates) >= count and np.sort(distance)[count - 1] <= ring * self.bucket_size:
+                    break
+
+        candidates = np.concatenate(found)
+        distance = self._distances(candidates, lat, lon)
+        order = np.argsort(distance, kind='stable')[:count]
+        return [(self.ids[i], float(d)) for i, d in zip(candidates[order], distance[order])]
+
+    @staticmethod
+    def _ring(bx: int, by: int, ring: int) -> List[Tuple[int, int]]:
+        """Bucket keys at Chebyshev distance `ring` from (bx, by)"""
+        if ring == 0:
+            return [(bx, by)]
+        keys = []
+        for dx in range(-ring, ring + 1):
+            keys.append((bx + dx, by - ring))
+            keys.append((bx + dx, by + ring))
+        for dy in range(-ring + 1, ring):
+            keys.append((bx - ring, by + dy))
+            keys.append((bx + ring, by + dy))
+        return keys
+
+
+def load_zones(path: Optional[str] = None) -> Dict[str, Dict]:
+    """Zone configs from a GeoJSON/CSV file, or the built-in ZONES when no path is given"""
+    if not path:
+        return ZONES
+    if path.lower().endswith(".csv"):
+        return read_csv(path)
+    return read_geojson(path)
+
+
+def load_zone_registry(path: Optional[str] = None) -> ZoneRegistry:
+    """Build a registry from a file (defaults to ZONES_FILE, then the built-in ZONES)"""
+    path = path if path is not None else os.getenv("ZONES_FILE")
+    registry = ZoneRegistry(load_zones(path))
+    if path:
+        print(f"🗺️ Loaded {len(registry)} zones from {path}")
+    return registry
+
+
+# Global zone registry
+zone_registry = load_zone_registry()
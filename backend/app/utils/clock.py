@@ -0,0 +1,168 @@
+"""
+Simulation Clock
+Single source of "now" for simulators, so runs can use wall time
+or a virtual clock that is advanced explicitly (headless fast-forward)
+
+The wall clock runs at an adjustable speed (0.5x-10x for drills and demos).
+Background tasks wait on absolute simulation-time deadlines, so changing the
+speed never lets their schedules drift apart.
+"""
+
+import asyncio
+import math
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Optional
+
+MIN_SPEED = 0.5
+MAX_SPEED = 10.0
+
+
+class WallClock:
+    """Real time scaled by a speed multiplier - the default for the live server"""
+
+    def __init__(self, speed: float = 1.0):
+        self._speed = speed
+        self._anchor_real = time.monotonic()
+        self._anchor_elapsed = 0.0
+        self._anchor_now = datetime.now()
+        self._speed_changed: Optional[asyncio.Event] = None
+
+    @property
+    def speed(self) -> float:
+        return self._speed
+
+    def elapsed(self) -> float:
+        """Simulation seconds since the clock started"""
+        return self._anchor_elapsed + (time.monotonic() - self._anchor_real) * self._speed
+
+    def now(self) -> datetime:
+        return self._anchor_now + timedelta(seconds=self.elapsed() - self._anchor_elapsed)
+
+    def set_speed(self, speed: float) -> float:
+        """
+        Change the speed from this instant on; simulation time never jumps
+        Wakes sleeping tasks so they re-plan against the new rate
+        """
+        speed = max(MIN_SPEED, min(MAX_SPEED, float(speed)))
+        self._anchor_now = self.now()
+        self._anchor_elapsed = self.elapsed()
+        self._anchor_real = time.monotonic()
+        self._speed = speed
+
+        if self._speed_changed is not None:
+            self._speed_changed.set()
+            self._speed_changed = None
+        return speed
+
+    async def sleep_until(self, deadline: float):
+        """Wait until elapsed() reaches deadline (simulation seconds)"""
+        while True:
+            remaining = deadline - self.elapsed()
+            if remaining <= 0:
+                return
+            if self._speed_changed is None:
+                self._speed_changed = asyncio.Event()
+            try:
+                await asyncio.wait_for(self._speed_changed.wait(), remaining / self._speed)
+            except asyncio.TimeoutError:
+                pass
+
+
+class VirtualClock:
+    """
+    Clock that only moves when advanced
+    Lets a headless runner simulate hours of ticks as fast as the CPU allows
+    """
+
+    def __init__(self, start: Optional[datetime] = None):
+        self._start = start or datetime.now()
+        self._now = self._start
+
+    @property
+    def speed(self) -> float:
+        return 1.0
+
+    def elapsed(self) -> float:
+        return (self._now - self._start).total_seconds()
+
+    def now(self) -> datetime:
+        return self._now
+
+    def advance(self, seconds: float):
+        """Move the clock forward"""
+        self._now += timedelta(seconds=seconds)
+
+    def advance_to(self, moment: datetime):
+        """Move the clock to a point in time (never backwards)"""
+        if moment > self._now:
+            self._now = moment
+
+    def set_speed(self, speed: float) -> float:
+        """Virtual time has no rate; its driver decides how fast it advances"""
+        return 1.0
+
+    async def sleep_until(self, deadline: float):
+        """Jump straight to the deadline instead of waiting"""
+        if deadline > self.elapsed():
+            self.advance(deadline - self.elapsed())
+        await asyncio.sleep(0)
+
+
+_clock = WallClock()
+
+
+def get_clock():
+    """Get the active clock"""
+    return _clock
+
+
+def set_clock(clock):
+    """Install a clock; returns the previously active one so callers can restore it"""
+    global _clock
+    previous = _clock
+    _clock = clock
+    return previous
+
+
+def now() -> datetime:
+    """Current simulation time"""
+    return _clock.now()
+
+
+def elapsed() -> float:
+    """Simulation seconds since the active clock started"""
+    return _clock.elapsed()
+
+
+def get_speed() -> float:
+    """Current speed multiplier"""
+    return _clock.speed
+
+
+def set_speed(speed: float) -> float:
+    """Set the speed multiplier (clamped to MIN_SPEED-MAX_SPEED); returns the applied value"""
+    return _clock.set_speed(speed)
+
+
+async def sleep(seconds: float):
+    """Sleep for a span of simulation time"""
+    await _clock.sleep_until(_clock.elapsed() + seconds)
+
+
+async def every(interval: float, delay: float = 0.0) -> AsyncIterator[int]:
+    """
+    Yield once per `interval` simulation seconds, first after `delay`
+    Deadlines are absolute (start + n * interval), so work time and speed
+    changes don't accumulate drift; ticks missed while busy are skipped
+    """
+    deadline = _clock.elapsed() + delay
+    tick = 0
+    while True:
+        await _clock.sleep_until(deadline)
+        yield tick
+        tick += 1
+        deadline += interval
+        behind = _clock.elapsed() - deadline
+        if behind > interval:
+            deadline += math.floor(behind / interval) * interval
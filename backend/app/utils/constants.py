@@ -12,6 +12,17 @@ BENGALURU_LON = 77.5946
 STADIUM_LOCATION = [12.9789, 77.5993]
 METRO_LOCATION = [12.9756, 77.6057]
 
+# Chinnaswamy Stadium entry gates
+STADIUM_GATES = [
+    [12.9801, 77.5993],  # North
+    [12.9789, 77.6006],  # East
+    [12.9777, 77.5993],  # South
+    [12.9789, 77.5980]   # West
+]
+
+# Default density grid resolution (meters per cell) for zones that don't set one
+DEFAULT_ZONE_RESOLUTION = 200
+
 # Multi-Zone Configuration (Bangalore Metro Line Colors)
 ZONES = {
     "stadium": {
@@ -19,6 +30,7 @@ ZONES = {
         "name": "Chinnaswamy Stadium",
         "center": [12.9789, 77.5993],
         "radius": 1000,  # meters
+        "resolution": 200,  # meters per grid cell
         "capacity": 40000,
         "type": "event_venue",
         "icon": "🏟️",
@@ -30,6 +42,7 @@ ZONES = {
         "name": "MG Road Metro",
         "center": [12.9756, 77.6057],
         "radius": 500,
+        "resolution": 100,
         "capacity": 15000,
         "type": "transit",
         "icon": "🚇",
@@ -41,6 +54,7 @@ ZONES = {
         "name": "Majestic Bus Stand",
         "center": [12.9767, 77.5713],
         "radius": 800,
+        "resolution": 160,
         "capacity": 50000,
         "type": "transit",
         "icon": "🚌",
@@ -52,6 +66,7 @@ ZONES = {
         "name": "Electronic City",
         "center": [12.8450, 77.6628],
         "radius": 2000,
+        "resolution": 100,
         "capacity": 100000,
         "type": "commercial",
         "icon": "💼",
@@ -63,6 +78,7 @@ ZONES = {
         "name": "Koramangala",
         "center": [12.9352, 77.6245],
         "radius": 1500,
+        "resolution": 150,
         "capacity": 60000,
         "type": "mixed",
         "icon": "🛍️",
@@ -74,6 +90,7 @@ ZONES = {
         "name": "Indiranagar",
         "center": [12.9784, 77.6408],
         "radius": 1200,
+        "resolution": 120,
         "capacity": 45000,
         "type": "mixed",
         "icon": "🏠",
@@ -85,6 +102,7 @@ ZONES = {
         "name": "Cubbon Park Area",
         "center": [12.9762, 77.5929],
         "radius": 1000,
+        "resolution": 200,
         "capacity": 30000,
         "type": "tourist",
         "icon": "🏛️",
@@ -93,7 +111,7 @@ ZONES = {
     }
 }
 
-# Alert thresholds
+# Alert thresholds (density per reference-sized 200 m cell, at any zone resolution)
 DENSITY_THRESHOLD_HIGH = 150
 DENSITY_THRESHOLD_CRITICAL = 200
 METRO_FLOW_THRESHOLD = 80  # passengers/min
@@ -0,0 +1,65 @@
+"""
+Random Streams
+Seeded, counter-based random number streams for the simulators
+
+Every simulated entity (zone, metro station, responder, bus) draws from its
+own Philox stream keyed by (seed, kind, entity id). The tick number is placed
+in the high word of the Philox counter, so the generator for any entity at any
+tick can be rebuilt anywhere - in the event loop or in a pool worker - without
+carrying generator state around. Same seed, same numbers, in any execution mode.
+"""
+
+import hashlib
+import os
+import secrets
+from typing import Optional
+
+import numpy as np
+
+
+def _env_seed() -> Optional[int]:
+    value = os.getenv("SIMULATION_SEED")
+    return int(value) if value not in (None, "") else None
+
+
+class RandomStreams:
+    """Factory for per-entity, per-tick Philox generators"""
+
+    def __init__(self, seed: Optional[int] = None):
+        # Without a configured seed pick one, so the run can still be replayed from logs
+        self.seed = seed if seed is not None else secrets.randbits(63)
+
+    def key(self, kind: str, entity_id) -> int:
+        """128-bit Philox key for an entity, stable across processes and runs"""
+        digest = hashlib.blake2b(f"{self.seed}:{kind}:{entity_id}".encode(), digest_size=16).digest()
+        return int.from_bytes(digest, "little")
+
+    def generator(self, kind: str, entity_id, tick: int = 0) -> np.random.Generator:
+        """Independent generator for one entity at one tick"""
+        counter = [0, 0, 0, tick]
+        return np.random.Generator(np.random.Philox(key=self.key(kind, entity_id), counter=counter))
+
+
+# Global stream factory (SIMULATION_SEED makes runs reproducible)
+rng_streams = RandomStreams(_env_seed())
+
+
+def set_simulation_seed(seed: Optional[int] = None) -> int:
+    """Reseed every stream; returns the seed in use"""
+    rng_streams.seed = seed if seed is not None else secrets.randbits(63)
+    return rng_streams.seed
+
+
+def stream(kind: str, entity_id, tick: int = 0) -> np.random.Generator:
+    """Generator for an entity at a tick from the global stream factory"""
+    return rng_streams.generator(kind, entity_id, tick)
+
+
+def uniform_int(u: float, low: int, high: int) -> int:
+    """Map a uniform [0, 1) draw onto an inclusive integer range (like random.randint)"""
+    return low + int(u * (high - low + 1))
+
+
+def uniform_ints(u: np.ndarray, low: int, high: int) -> np.ndarray:
+    """uniform_int over an array of draws"""
+    return low + (np.asarray(u) * (high - low + 1)).astype(np.int64)
@@ -0,0 +1,4 @@
+"""
+Benchmarks
+Standalone performance scripts, run from backend/ with python -m benchmarks.<name>
+"""
@@ -0,0 +1,88 @@
+"""
+Agent Engine Benchmark
+Times movement and rasterization for large agent populations
+
+Usage (from backend/):
+    python -m benchmarks.agent_engine --agents 100000 1000000 --steps 20
+"""
+
+import argparse
+import json
+import math
+import time
+import numpy as np
+
+from app.services.zone_registry import zone_registry
+from app.services.agent_engine import AgentEngine, MAX_SUBSTEP_SECONDS
+from app.services.multi_zone_simulation import random_hotspot_centers
+from app.services.density_engine import zone_grid_size
+from app.services.state_store import MAX_HOTSPOTS
+
+
+def populate(engine: AgentEngine, count: int, rng: np.random.Generator):
+    """Spread `count` walking agents over the zones in proportion to capacity"""
+    hotspots = np.zeros((len(engine.zone_ids), MAX_HOTSPOTS, 2))
+    for index, zone_id in enumerate(engine.zone_ids):
+        hotspots[index, :3] = random_hotspot_centers(rng, 3, zone_grid_size(zone_registry.zones[zone_id]))
+    capacity = np.array([zone_registry.zones[zone_id]["capacity"] for zone_id in engine.zone_ids], dtype=np.float64)
+    counts = np.floor(count * capacity / capacity.sum()).astype(np.int64)
+    counts[0] += count - counts.sum()
+    engine.spawn(counts, engine.gate_tables(hotspots, np.full(len(engine.zone_ids), 3)), rng)
+
+    # Start everyone somewhere inside their zone instead of at the entry points
+    active = np.flatnonzero(engine.state)
+    zone = engine.zone[active]
+    radius = np.array([zone_registry.zones[zone_id]["radius"] for zone_id in engine.zone_ids])[zone]
+    angle = rng.uniform(0, 2 * math.pi, active.size)
+    distance = radius * np.sqrt(rng.random(active.size))
+    engine.x[active] = engine.zone_x[zone] + distance * np.cos(angle)
+    engine.y[active] = engine.zone_y[zone] + distance * np.sin(angle)
+
+
+def run(agents: int, steps: int, seed: int = 0) -> dict:
+    """Benchmark one population size"""
+    rng = np.random.default_rng(seed)
+    engine = AgentEngine(zone_registry.zones, capacity=agents)
+    populate(engine, agents, rng)
+
+    timings = {"move": 0.0, "rasterize": 0.0}
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    for _ in range(steps):
+        start = time.perf_counter()
+        engine.move(MAX_SUBSTEP_SECONDS)
+        timings["move"] += time.perf_counter() - start
+
+        start = time.perf_counter()
+        engine.rasterize()
+        timings["rasterize"] += time.perf_counter() - start
+    wall = time.perf_counter() - wall_start
+    cpu = time.process_time() - cpu_start
+
+    agent_steps = agents * steps
+    return {
+        "agents": agents,
+        "steps": steps,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(cpu, 3),
+        "move_ms_per_step": round(timings["move"] / steps * 1000, 2),
+        "rasterize_ms_per_step": round(timings["rasterize"] / steps * 1000, 2),
+        "agents_per_second": round(agent_steps / wall),
+        # CPU time covers every core NumPy used, so this is the per-core rate
+        "agents_per_second_per_core": round(agent_steps / cpu) if cpu else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the vectorized agent engine")
+    parser.add_argument("--agents", type=int, nargs="+", default=[100000, 1000000],
+                        help="Population sizes to benchmark")
+    parser.add_argument("--steps", type=int, default=20, help="Movement steps per population")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    results = [run(agents, args.steps, args.seed) for agents in args.agents]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Broadcast Benchmark
+CPU time per broadcast of a multi-zone density payload, encoding the message
+once per connection (the old path) versus once per broadcast and fanned out
+through the per-client send queues
+
+Clients are in-memory sockets that accept every frame, so the numbers are
+the server's own serialization and fan-out cost without network I/O.
+
+Usage (from backend/):
+    python -m benchmarks.broadcast --clients 10 1000 10000 --rounds 5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+
+from app.utils.rng import set_simulation_seed
+from app.services.connection_manager import ConnectionManager, encode_message, orjson
+from app.services.multi_zone_simulation import simulate_all_zones_density
+
+
+class SinkSocket:
+    """Stands in for a connected client; keeps only the size of what it was sent"""
+
+    def __init__(self):
+        self.bytes_received = 0
+
+    async def send_text(self, text: str):
+        self.bytes_received += len(text)
+
+
+async def broadcast_per_connection(manager: ConnectionManager, message: dict):
+    """The previous broadcast: json.dumps inside the per-connection loop"""
+    for connection in list(manager.active_connections):
+        await connection.send_text(json.dumps(message))
+
+
+async def measure(broadcast, manager: ConnectionManager, message: dict, rounds: int) -> dict:
+    """CPU and wall time per broadcast (until every client has its copy), averaged over rounds"""
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    for _ in range(rounds):
+        await broadcast(manager, message)
+        await manager.flush(timeout=600)
+    return {
+        "cpu_ms_per_broadcast": round((time.process_time() - cpu_start) / rounds * 1000, 2),
+        "wall_ms_per_broadcast": round((time.perf_counter() - wall_start) / rounds * 1000, 2)
+    }
+
+
+async def run(clients: int, message: dict, rounds: int) -> dict:
+    """Benchmark both paths for one client count"""
+    manager = ConnectionManager(max_queue=rounds + 1)
+    for _ in range(clients):
+        manager.register(SinkSocket())
+
+    per_connection = await measure(broadcast_per_connection, manager, message, rounds)
+    encode_once = await measure(lambda m, msg: m.broadcast(msg), manager, message, rounds)
+    for websocket in list(manager.active_connections):
+        await manager.disconnect(websocket)
+    return {
+        "clients": clients,
+        "per_connection": per_connection,
+        "encode_once": encode_once,
+        "speedup": round(per_connection["cpu_ms_per_broadcast"] / max(encode_once["cpu_ms_per_broadcast"], 1e-3), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark WebSocket broadcast serialization")
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 1000, 10000],
+                        help="Connection counts to benchmark")
+    parser.add_argument("--rounds", type=int, default=5, help="Broadcasts per measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    set_simulation_seed(args.seed)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        message = asyncio.run(simulate_all_zones_density())
+    frame = encode_message(message)
+
+    print(json.dumps({
+        "encoder": "orjson" if orjson is not None else "json",
+        "payload_bytes": len(frame.encode()),
+        "results": [asyncio.run(run(clients, message, args.rounds)) for clients in args.clients]
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
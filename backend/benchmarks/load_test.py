@@ -0,0 +1,341 @@
+"""
+WebSocket Load Test
+Opens many concurrent /ws clients against a running backend and measures
+what they see: tick-to-receipt latency (p50/p99), messages per second,
+disconnects, and the server's CPU and memory over the same window
+
+Latency is the receipt time minus the message's own `timestamp`. Simulator
+messages are stamped on the simulation clock, so they are mapped back to
+wall time with the speed and offset read from /api/status (the harness and
+server must share a host, as they do for a local instance). Clients are spread
+over --processes so the harness itself is not the bottleneck; its own CPU
+is reported too.
+
+Usage (from backend/, with the server already running):
+    python -m benchmarks.load_test --clients 2000 --processes 4 --duration 120
+    python -m benchmarks.load_test --clients 500 --slow-fraction 0.1 --slow-delay 0.5 \\
+        --types multi_zone_density_update alert --zones stadium --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import resource
+import time
+import urllib.request
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+import websockets
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+# Replies and replays, not ticks; their timestamps say nothing about delivery latency
+UNTIMED_TYPES = {"connection", "snapshot", "subscription", "protocol", "binary_mode", "delta_mode", "echo"}
+
+# Stamped with datetime.now() rather than the simulation clock
+WALL_CLOCK_TYPES = {"gps_update", "weather_update", "test"}
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+def _loads(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def http_base(url: str) -> str:
+    parsed = urlparse(url)
+    scheme = "https" if parsed.scheme == "wss" else "http"
+    return f"{scheme}://{parsed.netloc}"
+
+
+def http_json(url: str, method: str = "GET") -> Dict:
+    request = urllib.request.Request(url, method=method)
+    with urllib.request.urlopen(request, timeout=10) as response:
+        return json.loads(response.read())
+
+
+def percentiles(values: List[float]) -> Dict:
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+    pick = lambda p: values[min(len(values) - 1, int(p / 100 * len(values)))]
+    return {
+        "count": len(values),
+        "p50": round(pick(50), 2),
+        "p90": round(pick(90), 2),
+        "p99": round(pick(99), 2),
+        "max": round(values[-1], 2)
+    }
+
+
+class SimulationClock:
+    """Maps the server's simulation timestamps back to wall time"""
+
+    def __init__(self, status: Dict):
+        self.speed = status["simulation"]["speed"]
+        self.wall_ref = datetime.fromisoformat(status["timestamp"]).timestamp()
+        self.sim_ref = datetime.fromisoformat(status["simulation"]["time"]).timestamp()
+
+    def sent_at(self, message_type: str, timestamp: str) -> float:
+        stamp = datetime.fromisoformat(timestamp).timestamp()
+        if message_type in WALL_CLOCK_TYPES:
+            return stamp
+        return self.wall_ref + (stamp - self.sim_ref) / self.speed
+
+
+class ProcessStats:
+    """What one harness process's clients saw during the measurement window"""
+
+    def __init__(self):
+        self.measuring = False
+        self.connected = 0
+        self.connect_failures = 0
+        self.closed: Dict[str, int] = {}
+        self.messages = 0
+        self.bytes = 0
+        self.latencies: Dict[str, List[float]] = {}
+
+
+async def run_client(args, clock: SimulationClock, stats: ProcessStats,
+                     stop: asyncio.Event, slow: bool):
+    url = args.url if args.protocol is None else f"{args.url}?protocol={args.protocol}"
+    try:
+        websocket = await websockets.connect(url, max_size=None, open_timeout=60, ping_interval=None)
+    except Exception:
+        stats.connect_failures += 1
+        return
+    stats.connected += 1
+
+    try:
+        if args.types or args.zones:
+            await websocket.send(json.dumps({"action": "subscribe", "types": args.types, "zones": args.zones}))
+
+        async def receive():
+            async for data in websocket:
+                received = time.time()
+                if not stats.measuring:
+                    continue
+                stats.messages += 1
+                stats.bytes += len(data)
+                if isinstance(data, str):
+                    message = _loads(data)
+                    message_type = message.get("type")
+                    timestamp = message.get("timestamp")
+                    if message_type not in UNTIMED_TYPES and isinstance(timestamp, str):
+                        latency = (received - clock.sent_at(message_type, timestamp)) * 1000
+                        stats.latencies.setdefault(message_type, []).append(latency)
+                if slow:
+                    await asyncio.sleep(args.slow_delay)
+
+        receiver = asyncio.create_task(receive())
+        stopped = asyncio.create_task(stop.wait())
+        await asyncio.wait({receiver, stopped}, return_when=asyncio.FIRST_COMPLETED)
+        if receiver.done() and not stop.is_set():
+            code = str(websocket.close_code)
+            stats.closed[code] = stats.closed.get(code, 0) + 1
+        receiver.cancel()
+        stopped.cancel()
+    finally:
+        await websocket.close()
+
+
+async def run_process(process_index: int, clients: int, args, clock: SimulationClock, barrier) -> Dict:
+    """Connect this process's share of clients, wait for the others, then measure"""
+    stats = ProcessStats()
+    stop = asyncio.Event()
+    slow_every = round(1 / args.slow_fraction) if args.slow_fraction > 0 else 0
+    rate = args.ramp / args.processes
+
+    tasks = []
+    for k in range(clients):
+        index = process_index + k * args.processes
+        slow = slow_every > 0 and index % slow_every == 0
+        tasks.append(asyncio.create_task(run_client(args, clock, stats, stop, slow)))
+        await asyncio.sleep(1 / rate)
+    while stats.connected + stats.connect_failures < clients:
+        await asyncio.sleep(0.1)
+
+    await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+    stats.measuring = True
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    await asyncio.sleep(args.duration)
+    stats.measuring = False
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    stop.set()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return {
+        "connected": stats.connected,
+        "connect_failures": stats.connect_failures,
+        "closed": stats.closed,
+        "messages": stats.messages,
+        "bytes": stats.bytes,
+        "latencies": stats.latencies,
+        "cpu_percent": round(cpu / wall * 100, 1)
+    }
+
+
+def process_main(process_index: int, clients: int, args, status: Dict, barrier, results):
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    clock = SimulationClock(status)
+    results.put(asyncio.run(run_process(process_index, clients, args, clock, barrier)))
+
+
+def process_tree(pid: int) -> List[int]:
+    """A pid and all its descendants (uvicorn --workers forks its workers)"""
+    pids = [pid]
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children") as f:
+                for child in f.read().split():
+                    pids.extend(process_tree(int(child)))
+    except OSError:
+        pass
+    return pids
+
+
+def sample_usage(pids: List[int]) -> Optional[Dict]:
+    """CPU seconds and resident memory summed over the server processes"""
+    cpu_seconds, rss_kb, found = 0.0, 0, False
+    for pid in {p for root in pids for p in process_tree(root)}:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{pid}/status") as f:
+                rss = next((line.split()[1] for line in f if line.startswith("VmRSS:")), "0")
+        except OSError:
+            continue
+        found = True
+        cpu_seconds += (int(fields[11]) + int(fields[12])) / CLOCK_TICKS
+        rss_kb += int(rss)
+    return {"cpu_seconds": cpu_seconds, "rss_kb": rss_kb, "time": time.monotonic()} if found else None
+
+
+def monitor_server(pids: List[int], duration: float) -> Optional[Dict]:
+    """CPU percent and RSS of the server, sampled once a second for the window"""
+    previous = sample_usage(pids)
+    if previous is None:
+        return None
+    cpu_percent, rss_mb = [], []
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        time.sleep(min(1.0, max(0.0, deadline - time.monotonic())))
+        sample = sample_usage(pids)
+        if sample is None:
+            break
+        elapsed = sample["time"] - previous["time"]
+        if elapsed > 0:
+            cpu_percent.append((sample["cpu_seconds"] - previous["cpu_seconds"]) / elapsed * 100)
+        rss_mb.append(sample["rss_kb"] / 1024)
+        previous = sample
+    return {
+        "pids": pids,
+        "cpu_percent_avg": round(sum(cpu_percent) / len(cpu_percent), 1) if cpu_percent else None,
+        "cpu_percent_max": round(max(cpu_percent), 1) if cpu_percent else None,
+        "rss_mb_avg": round(sum(rss_mb) / len(rss_mb), 1) if rss_mb else None,
+        "rss_mb_max": round(max(rss_mb), 1) if rss_mb else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the WebSocket endpoint of a running backend")
+    parser.add_argument("--url", default="ws://localhost:8000/ws")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--processes", type=int, default=max(1, min(4, os.cpu_count() or 1)),
+                        help="Harness processes the clients are spread over")
+    parser.add_argument("--duration", type=float, default=120, help="Measurement window in seconds, after ramp-up")
+    parser.add_argument("--ramp", type=float, default=200, help="New connections per second during ramp-up")
+    parser.add_argument("--types", nargs="+", help="Subscribe every client to these message types")
+    parser.add_argument("--zones", nargs="+", help="Subscribe every client to these zones")
+    parser.add_argument("--protocol", type=int, help="Protocol version to connect with (server default if unset)")
+    parser.add_argument("--slow-fraction", type=float, default=0.0, help="Share of clients that read slowly")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="Seconds a slow client waits after each message")
+    parser.add_argument("--speed", type=float, help="Set the simulation speed first, for more ticks per window")
+    parser.add_argument("--server-pid", type=int, nargs="+",
+                        help="Server processes to monitor (default: the pid /api/deployment reports)")
+    parser.add_argument("--output", help="Write the JSON report here as well as to stdout")
+    args = parser.parse_args()
+
+    base = http_base(args.url)
+    if args.speed is not None:
+        http_json(f"{base}/api/control/speed?speed={args.speed}", method="POST")
+    status = http_json(f"{base}/api/status")
+    server_pids = args.server_pid or [http_json(f"{base}/api/deployment")["pid"]]
+
+    barrier = multiprocessing.Barrier(args.processes + 1)
+    results = multiprocessing.Queue()
+    shares = [args.clients // args.processes + (1 if k < args.clients % args.processes else 0)
+              for k in range(args.processes)]
+    processes = [multiprocessing.Process(target=process_main, args=(k, share, args, status, barrier, results))
+                 for k, share in enumerate(shares)]
+    for process in processes:
+        process.start()
+
+    barrier.wait()
+    server = monitor_server(server_pids, args.duration)
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    latencies: Dict[str, List[float]] = {}
+    closed: Dict[str, int] = {}
+    for report in reports:
+        for message_type, values in report["latencies"].items():
+            latencies.setdefault(message_type, []).extend(values)
+        for code, count in report["closed"].items():
+            closed[code] = closed.get(code, 0) + count
+    messages = sum(report["messages"] for report in reports)
+
+    try:
+        server_clients = http_json(f"{base}/api/websocket/clients")
+        server_drops = {"policy": server_clients["policy"], "dropped_clients": server_clients["dropped_clients"]}
+    except Exception:
+        server_drops = None
+
+    result = {
+        "config": {
+            "url": args.url,
+            "clients": args.clients,
+            "processes": args.processes,
+            "duration_seconds": args.duration,
+            "types": args.types,
+            "zones": args.zones,
+            "protocol": args.protocol,
+            "slow_fraction": args.slow_fraction,
+            "slow_delay_seconds": args.slow_delay,
+            "simulation_speed": status["simulation"]["speed"],
+            "timestamp": datetime.now().isoformat()
+        },
+        "connections": {
+            "connected": sum(report["connected"] for report in reports),
+            "connect_failures": sum(report["connect_failures"] for report in reports),
+            "closed_during_run": closed
+        },
+        "messages": messages,
+        "messages_per_second": round(messages / args.duration, 1),
+        "megabytes_per_second": round(sum(report["bytes"] for report in reports) / args.duration / 1e6, 3),
+        "latency_ms": percentiles([value for values in latencies.values() for value in values]),
+        "latency_ms_by_type": {message_type: percentiles(values) for message_type, values in sorted(latencies.items())},
+        "server": server,
+        "server_slow_consumers": server_drops,
+        "harness_cpu_percent": [report["cpu_percent"] for report in reports]
+    }
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Wire Format Benchmark
+Bytes on the wire and encode time of the binary frame format against JSON
+text frames, for the message types that have a binary form
+
+Payloads come from the running simulators. The default zone grids are small
+(100m cells), so the density payload is also measured with every grid
+upsampled to --grid-size cells per side, as at street-level resolution.
+
+Usage (from backend/):
+    python -m benchmarks.wire_format --rounds 200 --grid-size 100
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+import numpy as np
+
+from app.utils.rng import set_simulation_seed
+from app.services import binary_frames
+from app.services.connection_manager import encode_message, orjson
+from app.services.multi_zone_simulation import simulate_all_zones_density
+from app.services.first_responders_service import get_first_responders_data
+from app.services.bmtc_service import _get_demo_buses
+
+
+def upsampled(message: dict, grid_size: int) -> dict:
+    """The density message with every zone grid scaled up to grid_size x grid_size"""
+    zones = {}
+    for zone_id, zone in message["zones"].items():
+        grid = np.asarray(zone["grid"])
+        factor = -(-grid_size // grid.shape[0])
+        zones[zone_id] = {**zone, "grid": np.kron(grid, np.ones((factor, factor), dtype=grid.dtype))[:grid_size, :grid_size].tolist()}
+    return {**message, "zones": zones}
+
+
+def timed(encode, message: dict, rounds: int) -> float:
+    """Microseconds per encode, averaged over rounds"""
+    start = time.perf_counter()
+    for _ in range(rounds):
+        encode(message)
+    return (time.perf_counter() - start) / rounds * 1e6
+
+
+def measure(name: str, message: dict, rounds: int) -> dict:
+    json_bytes = len(encode_message(message).encode())
+    binary_bytes = len(binary_frames.pack(message))
+    return {
+        "message": name,
+        "json_bytes": json_bytes,
+        "binary_bytes": binary_bytes,
+        "size_ratio": round(binary_bytes / json_bytes, 3),
+        "json_encode_us": round(timed(encode_message, message, rounds), 1),
+        "binary_encode_us": round(timed(binary_frames.pack, message, rounds), 1)
+    }
+
+
+async def payloads(grid_size: int) -> list:
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        density = await simulate_all_zones_density()
+        responders = await get_first_responders_data()
+        buses = _get_demo_buses()
+    return [
+        ("multi_zone_density_update", density),
+        (f"multi_zone_density_update ({grid_size}x{grid_size} grids)", upsampled(density, grid_size)),
+        ("first_responders_update", responders),
+        ("gps_update (demo buses)", buses)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare binary frames with JSON text frames")
+    parser.add_argument("--rounds", type=int, default=200, help="Encodes per measurement")
+    parser.add_argument("--grid-size", type=int, default=100, help="Cells per side for the upsampled density case")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    set_simulation_seed(args.seed)
+    messages = asyncio.run(payloads(args.grid_size))
+    results = {
+        "json_encoder": "orjson" if orjson is not None else "json",
+        "results": [measure(name, message, args.rounds) for name, message in messages]
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,10 @@ FastAPI backend with WebSocket support for real-time data streaming
 import asyncio
 import json
 from datetime import datetime
-from typing import Set, Optional
+from typing import Optional
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Body, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 import os
 from dotenv import load_dotenv
 
@@ -16,7 +17,7 @@ from dotenv import load_dotenv
 from app.services import (
     fetch_bmtc_bus_data, fetch_weather_data, 
     format_bus_summary, format_weather_summary,
-    simulate_metro_flow, simulate_all_metro_stations, simulate_crowd_density, 
+    simulate_all_metro_stations, legacy_metro_update, simulate_crowd_density, 
     check_alerts, format_metro_summary, format_density_summary,
     history_manager, ai_service
 )
@@ -24,8 +25,19 @@ from app.services.first_responders_service import (
     get_first_responders_data, format_responders_summary
 )
 from app.services.multi_zone_simulation import (
-    simulate_all_zones_density, check_multi_zone_alerts
+    simulate_all_zones_density, check_multi_zone_alerts, get_zone_grid_level,
+    get_zone_tick_timing, shutdown_zone_executor
 )
+from app.services.zone_registry import zone_registry
+from app.services.state_store import state_store
+from app.services.connection_manager import manager
+from app.services.density_delta import density_deltas
+from app.services import binary_frames
+from app.services.broker import BrokerServer, BrokerClient, deployment_role
+from app.services.scheduler import scheduler
+from app.services.sim_executor import sim_executor, loop_lag
+from app.utils import clock
+from app.utils.rng import rng_streams
 from app.config import config_manager
 
 # Load environment variables
@@ -35,6 +47,23 @@ load_dotenv()
 latest_density_data = None
 latest_metro_data = None
 
+# standalone, leader (simulations, publishes to workers) or worker (fans the leader's messages out)
+ROLE = deployment_role()
+broker_server = BrokerServer() if ROLE == "leader" else None
+broker_client = None
+
+# WebSocket ping/pong keepalive: a ping every interval; no pong within the timeout closes the connection.
+# Read from the variables the uvicorn CLI reads itself, so `uvicorn main:app` (and every worker it
+# starts) pings with the same settings the stalled-send reaper uses; __main__ below passes them on
+for _legacy in ("WS_PING_INTERVAL", "WS_PING_TIMEOUT"):
+    if _legacy in os.environ:
+        raise RuntimeError(f"{_legacy} is not read by the uvicorn CLI; set UVICORN_{_legacy} instead")
+WS_PING_INTERVAL = float(os.getenv("UVICORN_WS_PING_INTERVAL", 20))
+WS_PING_TIMEOUT = float(os.getenv("UVICORN_WS_PING_TIMEOUT", 20))
+
+# The synthetic "Backend WebSocket is working!" broadcast, for debugging the pipe only
+TEST_BROADCAST = os.getenv("WS_TEST_BROADCAST", "0") == "1"
+
 # Initialize FastAPI app
 app = FastAPI(title="Crowd Safety Intelligence System")
 
@@ -47,276 +76,206 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# WebSocket connection manager
-class ConnectionManager:
-    """Manages WebSocket connections and broadcasts messages to all connected clients"""
-    
-    def __init__(self):
-        self.active_connections: Set[WebSocket] = set()
-        self._lock = asyncio.Lock()
-    
-    async def connect(self, websocket: WebSocket):
-        """Accept and register a new WebSocket connection"""
-        await websocket.accept()
-        async with self._lock:
-            self.active_connections.add(websocket)
-        print(f"Client connected. Total connections: {len(self.active_connections)}")
-        
-        # Send welcome message to the newly connected client
-        await self.send_personal_message({
-            "type": "connection",
-            "message": "Successfully connected to Crowd Safety Intelligence System",
-            "timestamp": datetime.now().isoformat()
-        }, websocket)
-    
-    async def disconnect(self, websocket: WebSocket):
-        """Remove a WebSocket connection"""
-        async with self._lock:
-            self.active_connections.discard(websocket)
-        print(f"Client disconnected. Total connections: {len(self.active_connections)}")
-    
-    async def send_personal_message(self, message: dict, websocket: WebSocket):
-        """Send a message to a specific client"""
-        try:
-            await websocket.send_text(json.dumps(message))
-        except Exception as e:
-            print(f"Error sending personal message: {e}")
-    
-    async def broadcast(self, message: dict):
-        """Broadcast a message to all connected clients"""
-        disconnected = set()
-        # Create a snapshot of connections under lock to ensure thread-safe iteration
-        async with self._lock:
-            connections_snapshot = list(self.active_connections)
-        
-        # Send to all connections (without lock to allow concurrent operations)
-        for connection in connections_snapshot:
-            try:
-                await connection.send_text(json.dumps(message))
-            except RuntimeError as e:
-                # Handle "websocket.close" and other closed connection errors
-                if "websocket.close" in str(e) or "websocket.send" in str(e) or "already completed" in str(e):
-                    disconnected.add(connection)
-                else:
-                    print(f"Error broadcasting to client: {e}")
-            except Exception as e:
-                print(f"Error broadcasting to client: {e}")
-                disconnected.add(connection)
-        
-        # Clean up disconnected clients
-        if disconnected:
-            async with self._lock:
-                for conn in disconnected:
-                    self.active_connections.discard(conn)
 
-# Initialize connection manager
-manager = ConnectionManager()
+def audience() -> int:
+    """WebSocket clients that will see a broadcast (on every worker, for the leader)"""
+    local = len(manager.active_connections)
+    return local + broker_server.audience() if broker_server else local
+
+
+def legacy_audience() -> int:
+    """Protocol-1 clients, the only ones still sent density_update and metro_update"""
+    local = manager.legacy_clients()
+    return local + broker_server.legacy_audience() if broker_server else local
+
+
+def legacy_density_update(multi_zone_data: dict) -> Optional[dict]:
+    """The single-zone density_update (stadium zone) that legacy components read"""
+    stadium_data = multi_zone_data.get("zones", {}).get("stadium")
+    if stadium_data is None:
+        return None
+    return {
+        "type": "density_update",
+        "grid": stadium_data["grid"],
+        "hotspots": stadium_data["hotspots"],
+        "avg_density": stadium_data["avg_density"],
+        "max_density": stadium_data["max_density"],
+        "phase": stadium_data["phase"],
+        "center_location": stadium_data["center"],
+        "grid_size": stadium_data["grid_size"],
+        "cell_size_deg": stadium_data["cell_size_deg"],
+        "timestamp": multi_zone_data["timestamp"]
+    }
+
+
+async def deliver(message: dict):
+    """Broadcast to this process's clients (density as keyframes/deltas to clients in delta mode)"""
+    if message.get("type") == "multi_zone_density_update" and manager.wants_delta():
+        await manager.broadcast(message, density_deltas.encode(message))
+    else:
+        await manager.broadcast(message)
+
+
+async def publish(message: dict):
+    """Send a simulation message to every client, through the broker when running as leader"""
+    if broker_server:
+        broker_server.publish(message)
+    await deliver(message)
+
+
+async def receive_from_leader(message: dict):
+    """Worker: keep the latest data the REST endpoints read, then fan the message out"""
+    global latest_density_data, latest_metro_data
+    # The legacy messages only arrive while some client is on protocol 1, so derive them when absent
+    if message.get("type") == "density_update":
+        latest_density_data = message
+    elif message.get("type") == "metro_update":
+        latest_metro_data = message
+    elif message.get("type") == "multi_zone_density_update":
+        latest_density_data = legacy_density_update(message) or latest_density_data
+    elif message.get("type") == "multi_metro_update":
+        latest_metro_data = legacy_metro_update(message)
+    await deliver(message)
+
+
+# Periodic jobs, run by app.services.scheduler (intervals and order are registered in startup_event)
+
+async def connection_reaper_task():
+    """Backstop for the ping/pong keepalive: drop clients stuck on one send past its deadline"""
+    manager.reap_stalled(WS_PING_INTERVAL + WS_PING_TIMEOUT)
+
 
-# Background task to send test messages
 async def test_broadcast_task():
-    """Background task that sends test messages every 10 seconds"""
-    await asyncio.sleep(2)  # Wait 2 seconds before first message
-    
-    while True:
-        if manager.active_connections:
-            test_message = {
-                "type": "test",
-                "message": "Backend WebSocket is working!",
-                "timestamp": datetime.now().isoformat(),
-                "active_connections": len(manager.active_connections)
-            }
-            await manager.broadcast(test_message)
-            print(f"Test broadcast sent to {len(manager.active_connections)} clients")
-        
-        await asyncio.sleep(10)  # Send every 10 seconds
+    """Send a test message (opt-in with WS_TEST_BROADCAST=1)"""
+    test_message = {
+        "type": "test",
+        "message": "Backend WebSocket is working!",
+        "timestamp": datetime.now().isoformat(),
+        "active_connections": audience()
+    }
+    await publish(test_message)
+    sim_executor.log(f"Test broadcast sent to {audience()} clients")
 
 
-# Background task for BMTC bus GPS data
 async def bmtc_data_task():
-    """Fetch and broadcast BMTC bus GPS data every 30 seconds"""
-    await asyncio.sleep(5)  # Initial delay
-    
-    print("BMTC data task started")
+    """Fetch and broadcast BMTC bus GPS data"""
+    bus_data = await fetch_bmtc_bus_data()
     
-    while True:
-        if manager.active_connections:
-            try:
-                bus_data = await fetch_bmtc_bus_data()
-                
-                if bus_data:
-                    await manager.broadcast(bus_data)
-                    print(f"📍 BMTC broadcast: {format_bus_summary(bus_data)}")
-                else:
-                    print("⚠️ BMTC: No data received")
-                    
-            except Exception as e:
-                print(f"❌ BMTC task error: {e}")
-        
-        await asyncio.sleep(30)  # Fetch every 30 seconds
+    if bus_data:
+        await publish(bus_data)
+        sim_executor.log(f"📍 BMTC broadcast: {format_bus_summary(bus_data)}")
+    else:
+        sim_executor.log("⚠️ BMTC: No data received")
 
 
-# Background task for weather data
 async def weather_data_task():
-    """Fetch and broadcast weather data every 5 minutes"""
-    await asyncio.sleep(1)  # Minimal initial delay for immediate weather display
+    """Fetch and broadcast weather data"""
+    weather_data = await fetch_weather_data()
     
-    print("Weather data task started")
-    
-    while True:
-        if manager.active_connections:
-            try:
-                weather_data = await fetch_weather_data()
-                
-                # weather_data should always return something (simulated fallback)
-                if weather_data:
-                    await manager.broadcast(weather_data)
-                    print(f"🌦️ Weather broadcast: {format_weather_summary(weather_data)}")
-                else:
-                    print("⚠️ Weather: No data received (unexpected)")
-                    
-            except Exception as e:
-                print(f"❌ Weather task error: {e}")
-        
-        await asyncio.sleep(300)  # Fetch every 5 minutes (300 seconds)
+    # weather_data should always return something (simulated fallback)
+    if weather_data:
+        await publish(weather_data)
+        sim_executor.log(f"🌦️ Weather broadcast: {format_weather_summary(weather_data)}")
+    else:
+        sim_executor.log("⚠️ Weather: No data received (unexpected)")
 
 
-# Background task for metro flow simulation
 async def metro_simulation_task():
-    """Generate and broadcast metro flow data every 60 seconds"""
+    """Generate and broadcast metro flow data for all stations"""
     global latest_metro_data
-    await asyncio.sleep(7)  # Initial delay
     
-    print("Metro simulation task started - ALL STATIONS")
+    # One simulation step for every station, on the simulation thread
+    tick = await sim_executor.tick("metro", simulate_all_metro_stations)
+    multi_metro_data = tick.message
     
-    while True:
-        if manager.active_connections and not config_manager.simulations_paused:
-            try:
-                # Get single-station data for backward compatibility
-                metro_data = simulate_metro_flow()
-                latest_metro_data = metro_data
-                config_manager.increment_message_count()
-                
-                # Add to history
-                history_manager.add_metro_data(metro_data)
-                
-                # Add trend to data
-                metro_data['trend'] = history_manager.get_metro_trend()
-                
-                # Broadcast single-station data (legacy)
-                await manager.broadcast(metro_data)
-                print(f"🚇 Metro (MG Road): {format_metro_summary(metro_data)}")
-                
-                # Get multi-station data
-                multi_metro_data = simulate_all_metro_stations()
-                config_manager.increment_message_count()
-                
-                # Broadcast multi-station data
-                await manager.broadcast(multi_metro_data)
-                summary = multi_metro_data['summary']
-                print(f"🚇 Multi-Metro: {summary['total_stations']} stations, Total Flow: {summary['total_flow']}/min, Phase: {summary['crowd_phase']}")
-                
-                # Check alerts (using MG Road data for now)
-                if latest_density_data:
-                    alerts = check_alerts(latest_density_data, metro_data)
-                    for alert in alerts:
-                        await manager.broadcast(alert)
-                        print(f"⚠️  Alert: {alert['level'].upper()} - {alert['message']}")
-                        
-            except Exception as e:
-                print(f"❌ Metro task error: {e}")
+    with sim_executor.handoff("metro"):
+        config_manager.increment_message_count()
+        
+        # Single-station (MG Road) view for history, alerts and legacy clients
+        metro_data = legacy_metro_update(multi_metro_data)
+        latest_metro_data = metro_data
+        history_manager.add_metro_data(metro_data)
+        metro_data['trend'] = history_manager.get_metro_trend()
+        
+        # Only protocol-1 clients still read the single-station message
+        if legacy_audience():
+            await publish(metro_data)
+        sim_executor.log(f"🚇 Metro (MG Road): {format_metro_summary(metro_data)}")
         
-        await asyncio.sleep(60)  # Update every 60 seconds
+        # Broadcast multi-station data
+        await publish(multi_metro_data)
+        summary = multi_metro_data['summary']
+        sim_executor.log(f"🚇 Multi-Metro: {summary['total_stations']} stations, Total Flow: {summary['total_flow']}/min, Phase: {summary['crowd_phase']}")
+        
+        # Check alerts (using MG Road data for now)
+        if latest_density_data:
+            alerts = check_alerts(latest_density_data, metro_data)
+            for alert in alerts:
+                await publish(alert)
+                sim_executor.log(f"⚠️  Alert: {alert['level'].upper()} - {alert['message']}")
 
 
-# Background task for crowd density simulation
 async def density_simulation_task():
-    """Generate and broadcast multi-zone crowd density data every 30 seconds"""
+    """Generate and broadcast multi-zone crowd density data"""
     global latest_density_data
-    await asyncio.sleep(10)  # Initial delay
     
-    print("Multi-zone crowd density simulation task started")
+    # Get multi-zone density data from the simulation thread
+    tick = await sim_executor.tick("density", simulate_all_zones_density)
+    multi_zone_data = tick.message
     
-    while True:
-        if manager.active_connections and not config_manager.simulations_paused:
-            try:
-                # Get multi-zone density data
-                multi_zone_data = await simulate_all_zones_density()
-                
-                # Also keep single-zone data for backwards compatibility
-                # Use stadium zone as the "main" zone for legacy components
-                if "stadium" in multi_zone_data.get("zones", {}):
-                    stadium_data = multi_zone_data["zones"]["stadium"]
-                    legacy_density_data = {
-                        "type": "density_update",
-                        "grid": stadium_data["grid"],
-                        "hotspots": stadium_data["hotspots"],
-                        "avg_density": stadium_data["avg_density"],
-                        "max_density": stadium_data["max_density"],
-                        "phase": stadium_data["phase"],
-                        "center_location": stadium_data["center"],
-                        "grid_size": 10,
-                        "timestamp": multi_zone_data["timestamp"]
-                    }
-                    latest_density_data = legacy_density_data
-                    history_manager.add_density_data(legacy_density_data)
-                    legacy_density_data['trend'] = history_manager.get_density_trend()
-                    legacy_density_data['prediction'] = history_manager.predict_next_alert()
-                    
-                    # Broadcast legacy format first for old components
-                    await manager.broadcast(legacy_density_data)
-                
-                # Broadcast multi-zone data
-                config_manager.increment_message_count()
-                await manager.broadcast(multi_zone_data)
-                
-                # Print summary
-                summary = multi_zone_data.get("summary", {})
-                critical = summary.get("critical_zones", [])
-                warning = summary.get("warning_zones", [])
-                status_msg = f"Zones: {summary.get('total_zones', 0)}"
-                if critical:
-                    status_msg += f" | CRITICAL: {', '.join(critical)}"
-                if warning:
-                    status_msg += f" | WARNING: {', '.join(warning)}"
-                print(f"🔥 Multi-Zone Density: {status_msg}")
-                
-                # Check multi-zone alerts
-                if latest_metro_data:
-                    alerts = check_multi_zone_alerts(multi_zone_data, latest_metro_data)
-                    for alert in alerts:
-                        history_manager.add_alert(alert)
-                        config_manager.increment_alert_count()
-                        await manager.broadcast(alert)
-                        print(f"⚠️  [{alert.get('zone', 'Unknown')}] {alert['level'].upper()}: {alert['message']}")
-                        
-            except Exception as e:
-                print(f"❌ Density task error: {e}")
-                import traceback
-                traceback.print_exc()
+    with sim_executor.handoff("density"):
+        # Also keep single-zone data for history, alerts and legacy components
+        # Use stadium zone as the "main" zone for legacy components
+        legacy_density_data = legacy_density_update(multi_zone_data)
+        if legacy_density_data is not None:
+            latest_density_data = legacy_density_data
+            history_manager.add_density_data(legacy_density_data)
+            legacy_density_data['trend'] = history_manager.get_density_trend()
+            legacy_density_data['prediction'] = history_manager.predict_next_alert()
+            
+            # Broadcast legacy format first, for protocol-1 clients only
+            if legacy_audience():
+                await publish(legacy_density_data)
         
-        await asyncio.sleep(30)  # Update every 30 seconds
+        # Broadcast multi-zone data
+        config_manager.increment_message_count()
+        await publish(multi_zone_data)
+        
+        # Print summary
+        summary = multi_zone_data.get("summary", {})
+        critical = summary.get("critical_zones", [])
+        warning = summary.get("warning_zones", [])
+        status_msg = f"Zones: {summary.get('total_zones', 0)}"
+        if critical:
+            status_msg += f" | CRITICAL: {', '.join(critical)}"
+        if warning:
+            status_msg += f" | WARNING: {', '.join(warning)}"
+        sim_executor.log(f"🔥 Multi-Zone Density: {status_msg}")
+        
+        # Check multi-zone alerts
+        if latest_metro_data:
+            alerts = check_multi_zone_alerts(multi_zone_data, latest_metro_data)
+            for alert in alerts:
+                history_manager.add_alert(alert)
+                config_manager.increment_alert_count()
+                await publish(alert)
+                sim_executor.log(f"⚠️  [{alert.get('zone', 'Unknown')}] {alert['level'].upper()}: {alert['message']}")
 
 
-# Background task for first responders
 async def first_responders_task():
-    """Update and broadcast first responders positions every 15 seconds"""
-    await asyncio.sleep(3)  # Initial delay
-    
-    print("First responders tracking task started")
+    """Update and broadcast first responders positions"""
+    tick = await sim_executor.tick("first_responders", get_first_responders_data)
+    responders_data = tick.message
     
-    while True:
-        if manager.active_connections:
-            try:
-                responders_data = await get_first_responders_data()
-                config_manager.increment_message_count()
-                
-                await manager.broadcast(responders_data)
-                print(f"🚨 First Responders: {format_responders_summary(responders_data)}")
-                        
-            except Exception as e:
-                print(f"❌ First responders task error: {e}")
-        
-        await asyncio.sleep(15)  # Update every 15 seconds (more frequent for emergency vehicles)
+    with sim_executor.handoff("first_responders"):
+        config_manager.increment_message_count()
+        await publish(responders_data)
+        sim_executor.log(f"🚨 First Responders: {format_responders_summary(responders_data)}")
+
+
+def simulations_running() -> bool:
+    """Someone is watching and the simulations are not paused"""
+    return bool(audience()) and not config_manager.simulations_paused
 
 # Routes
 @app.get("/")
@@ -336,10 +295,14 @@ async def status():
     
     return {
         "backend_status": "operational",
-        "websocket_connections": len(manager.active_connections),
+        "websocket_connections": audience(),
         "timestamp": datetime.now().isoformat(),
         "history_stats": history_stats,
         "alert_count": history_stats['total_alerts'],
+        "simulation": {
+            "speed": clock.get_speed(),
+            "time": clock.now().isoformat()
+        },
         "trends": {
             "density": history_manager.get_density_trend(),
             "metro": history_manager.get_metro_trend()
@@ -356,6 +319,66 @@ async def get_chart_data():
     """Get data formatted for charts"""
     return history_manager.get_chart_data()
 
+@app.get("/api/zones/locate")
+async def locate_zone(lat: float, lon: float, nearest: int = 3):
+    """Zones containing a point and the nearest zone centers"""
+    return {
+        "status": "success",
+        "zones": zone_registry.zones_at(lat, lon),
+        "nearest": [
+            {"zone_id": zone_id, "distance_m": round(distance, 1)}
+            for zone_id, distance in zone_registry.nearest(lat, lon, max(1, min(nearest, 50)))
+        ]
+    }
+
+
+@app.get("/api/zones/{zone_id}/grid")
+async def get_zone_grid(zone_id: str, level: int = 0):
+    """Get a zone's latest density grid at a pyramid level (0 = full resolution)"""
+    zone_grid = await sim_executor.call(get_zone_grid_level, zone_id, level)
+    if zone_grid is None:
+        return JSONResponse(
+            status_code=404,
+            content={"status": "error", "message": f"No density grid available for zone '{zone_id}'"}
+        )
+    return {"status": "success", **zone_grid}
+
+@app.get("/api/simulation/timing")
+async def get_simulation_timing():
+    """Latest density tick timing (wall time, executor mode, per-shard elapsed) and the active seed"""
+    return {"seed": rng_streams.seed, "density_tick": get_zone_tick_timing()}
+
+@app.get("/api/websocket/clients")
+async def get_websocket_clients():
+    """Per-client send queue depth, drops and send latency under the slow-consumer policy"""
+    return manager.stats()
+
+@app.get("/api/simulation/executor")
+async def get_simulation_executor():
+    """Per-job simulation compute and handoff times, and the event loop's lag against its budget"""
+    return {"executor": sim_executor.stats(), "loop_lag": loop_lag.stats()}
+
+@app.get("/api/scheduler")
+async def get_scheduler_stats():
+    """Per-job run counts, durations, start lateness, missed deadlines and failures"""
+    return scheduler.stats()
+
+@app.get("/api/deployment")
+async def get_deployment():
+    """This process's role and its side of the leader/worker broker"""
+    broker = broker_server or broker_client
+    return {
+        "role": ROLE,
+        "pid": os.getpid(),
+        "local_connections": len(manager.active_connections),
+        "broker": broker.stats() if broker else None
+    }
+
+@app.get("/api/simulation/state")
+async def get_simulation_state():
+    """Entity counts and memory use of every state store table"""
+    return {"tables": await sim_executor.call(state_store.stats)}
+
 @app.get("/api/export")
 async def export_data():
     """Export all current data as JSON"""
@@ -404,6 +427,12 @@ async def toggle_simulations():
     paused = config_manager.toggle_simulations()
     return {"status": "toggled", "paused": paused}
 
+@app.post("/api/control/speed")
+async def set_simulation_speed(speed: float = Query(..., description="Speed multiplier (0.5-10)")):
+    """Change the simulation clock rate without restarting"""
+    applied = config_manager.set_speed(speed)
+    return {"status": "success", "speed": applied, "simulation_time": clock.now().isoformat()}
+
 @app.post("/api/control/reset-history")
 async def reset_history():
     """Clear all history data"""
@@ -577,23 +606,59 @@ async def websocket_endpoint(websocket: WebSocket):
         # Keep connection alive and listen for messages from client
         while True:
             data = await websocket.receive_text()
-            print(f"Received from client: {data}")
             
-            # Echo back or handle client messages if needed
+            # Subscription, snapshot, binary and delta-mode requests; anything else is echoed
             try:
                 client_message = json.loads(data)
-                response = {
-                    "type": "echo",
-                    "received": client_message,
-                    "timestamp": datetime.now().isoformat()
-                }
-                await manager.send_personal_message(response, websocket)
+                action = client_message.get("action") if isinstance(client_message, dict) else None
+                if action in ("subscribe", "unsubscribe"):
+                    response = manager.update_subscription(
+                        websocket, action, client_message.get("types"), client_message.get("zones")
+                    )
+                elif action == "snapshot":
+                    # Latest state again, narrowed to the current subscriptions (e.g. right after subscribing)
+                    manager.send_snapshot(websocket)
+                    response = None
+                elif action == "protocol":
+                    # Protocol 2 drops the legacy density_update/metro_update duplicates
+                    response = manager.set_protocol(websocket, client_message.get("version"))
+                elif action == "binary":
+                    # The responder dictionary goes out once, with the switch to binary frames
+                    enabled = bool(client_message.get("enabled", True))
+                    manager.set_binary(websocket, enabled)
+                    response = {
+                        "type": "binary_mode",
+                        "enabled": enabled,
+                        "version": binary_frames.VERSION,
+                        "dictionary": binary_frames.dictionary() if enabled else None,
+                        "timestamp": datetime.now().isoformat()
+                    }
+                elif action in ("delta", "keyframe"):
+                    if action == "delta":
+                        manager.set_delta(websocket, client_message.get("enabled", True))
+                    else:
+                        manager.request_keyframe(websocket)
+                    client = manager.active_connections.get(websocket)
+                    response = {
+                        "type": "delta_mode",
+                        "enabled": bool(client and client.delta),
+                        "tolerance": density_deltas.tolerance,
+                        "keyframe_interval": density_deltas.keyframe_interval,
+                        "timestamp": datetime.now().isoformat()
+                    }
+                else:
+                    response = {
+                        "type": "echo",
+                        "received": client_message,
+                        "timestamp": datetime.now().isoformat()
+                    }
+                if response is not None:
+                    await manager.send_personal_message(response, websocket)
             except json.JSONDecodeError:
                 pass
                 
-    except WebSocketDisconnect:
-        await manager.disconnect(websocket)
-        print("Client disconnected normally")
+    except WebSocketDisconnect as e:
+        await manager.disconnect(websocket, e.code)
     except Exception as e:
         print(f"WebSocket error: {e}")
         await manager.disconnect(websocket)
@@ -601,6 +666,7 @@ async def websocket_endpoint(websocket: WebSocket):
 @app.on_event("startup")
 async def startup_event():
     """Start background tasks when the application starts"""
+    global broker_client
     print("=" * 60)
     print("🚨 Crowd Safety Intelligence System - Backend Starting...")
     print("=" * 60)
@@ -609,25 +675,53 @@ async def startup_event():
     print("Status API: http://localhost:8000/api/status")
     print("=" * 60)
     
-    # Start all background tasks
-    asyncio.create_task(test_broadcast_task())
-    asyncio.create_task(bmtc_data_task())
-    asyncio.create_task(weather_data_task())
-    asyncio.create_task(metro_simulation_task())
-    asyncio.create_task(density_simulation_task())
-    asyncio.create_task(first_responders_task())
+    # Verifies the loop-blocking budget in every role
+    asyncio.create_task(loop_lag.run())
+    
+    if ROLE == "worker":
+        # Simulations run in the leader; this process only serves clients
+        broker_client = BrokerClient(receive_from_leader, lambda: len(manager.active_connections),
+                                     legacy=manager.legacy_clients)
+        asyncio.create_task(broker_client.run())
+        scheduler.add("connection_reaper", connection_reaper_task, WS_PING_INTERVAL, WS_PING_INTERVAL,
+                      jitter=0, realtime=True)
+        scheduler.start()
+        print(f"✅ Worker {os.getpid()} relaying the leader's messages")
+        print("=" * 60)
+        return
+    
+    if broker_server:
+        await broker_server.start()
     
-    print("✅ Background tasks started:")
-    print("   - Test messages (every 10s)")
-    print("   - BMTC bus GPS (every 30s)")
-    print("   - Weather data (every 5min)")
-    print("   - Metro flow simulation (every 60s)")
-    print("   - Crowd density simulation (every 30s)")
-    print("   - First Responders tracking (every 15s)")
+    # Every periodic job: name, task, interval, first run after (staggered so they don't coincide), run only while
+    scheduler.add("connection_reaper", connection_reaper_task, WS_PING_INTERVAL, WS_PING_INTERVAL,
+                  jitter=0, realtime=True)
+    if TEST_BROADCAST:
+        scheduler.add("test_broadcast", test_broadcast_task, 10, 2, condition=audience)
+    scheduler.add("bmtc", bmtc_data_task, 30, 5, condition=audience)
+    scheduler.add("weather", weather_data_task, 300, 1, condition=audience)
+    scheduler.add("metro", metro_simulation_task, 60, 7, condition=simulations_running)
+    scheduler.add("density", density_simulation_task, 30, 10, condition=simulations_running)
+    scheduler.add("first_responders", first_responders_task, 15, 3, condition=audience)
+    scheduler.start()
+    
+    print(f"✅ Background jobs scheduled ({ROLE}):")
+    for name, job in scheduler.jobs.items():
+        print(f"   - {name} (every {job.interval:g}s)")
     print("=" * 60)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the background jobs; release the simulation thread, worker pools and the broker socket"""
+    await scheduler.stop()
+    shutdown_zone_executor()
+    sim_executor.shutdown()
+    if broker_server:
+        await broker_server.close()
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True)
+    uvicorn.run("main:app", host="0.0.0.0", port=port, reload=True,
+                ws_ping_interval=WS_PING_INTERVAL, ws_ping_timeout=WS_PING_TIMEOUT)
 
@@ -0,0 +1,132 @@
+"""
+Binary Frame Tests
+pack/unpack round trips for grid and position frames, blob alignment and the session dictionary
+"""
+
+import asyncio
+import json
+
+import numpy as np
+
+from app.services import binary_frames
+from app.services.bmtc_service import _get_demo_buses
+from app.services.first_responders_service import get_first_responders_data
+
+
+def header_and_blob_start(frame: bytes):
+    """The frame's JSON header and the offset its blob section starts at"""
+    magic, version, length = binary_frames._PREFIX.unpack_from(frame, 0)
+    assert (magic, version) == (binary_frames.MAGIC, binary_frames.VERSION)
+    header = json.loads(frame[binary_frames._PREFIX.size:binary_frames._PREFIX.size + length])
+    return header, binary_frames._aligned(binary_frames._PREFIX.size + length)
+
+
+def blob_references(value):
+    """Every {"$blob": ...} reference in a header"""
+    if isinstance(value, dict):
+        if "$blob" in value:
+            yield value
+        for item in value.values():
+            yield from blob_references(item)
+    elif isinstance(value, list):
+        for item in value:
+            yield from blob_references(item)
+
+
+def assert_rows_match(decoded, original):
+    """Decoded rows equal the originals, floats to float32 precision, timestamps from the message"""
+    assert len(decoded) == len(original)
+    for decoded_row, row in zip(decoded, original):
+        assert decoded_row.keys() == row.keys()
+        for key, value in row.items():
+            if key == "timestamp":
+                continue
+            if isinstance(value, float):
+                assert np.isclose(decoded_row[key], value, rtol=1e-6, atol=1e-6), key
+            else:
+                assert decoded_row[key] == value, key
+
+
+def test_density_grid_round_trip():
+    rng = np.random.default_rng(0)
+    # Odd sizes so uint16 blobs end off a 4-byte boundary and need padding
+    grids = {"stadium": rng.integers(0, 400, size=(7, 7)), "majestic": rng.integers(0, 400, size=(11, 11))}
+    message = {
+        "type": "multi_zone_density_update",
+        "timestamp": "2025-10-26T17:00:00",
+        "zones": {
+            zone_id: {"zone_id": zone_id, "max_density": int(grid.max()), "grid": grid.tolist()}
+            for zone_id, grid in grids.items()
+        }
+    }
+
+    frame = binary_frames.pack(message)
+
+    assert binary_frames.unpack(frame) == message
+
+
+def test_grid_values_clip_to_uint16():
+    message = {"type": "density_update", "grid": [[-3, 70000], [5, 0]]}
+
+    decoded = binary_frames.unpack(binary_frames.pack(message))
+
+    assert decoded["grid"] == [[0, 0xFFFF], [5, 0]]
+
+
+def test_blobs_start_on_aligned_offsets():
+    rng = np.random.default_rng(1)
+    message = {
+        "type": "multi_zone_density_update",
+        "zones": {f"zone_{k}": {"grid": rng.integers(0, 300, size=(size, size)).tolist()}
+                  for k, size in enumerate((3, 5, 6, 9))}
+    }
+
+    frame = binary_frames.pack(message)
+    header, start = header_and_blob_start(frame)
+    references = list(blob_references(header))
+
+    assert start % 4 == 0
+    assert len(frame) % 4 == 0
+    assert len(references) == 4
+    for reference in references:
+        offset = start + reference["$blob"]
+        assert offset % 4 == 0
+        # Viewable in place as a typed array
+        np.frombuffer(frame, dtype=reference["dtype"], count=int(np.prod(reference["shape"])), offset=offset)
+
+
+def test_responders_round_trip_through_session_dictionary():
+    message = asyncio.run(get_first_responders_data())
+
+    frame = binary_frames.pack(message)
+    header, _ = header_and_blob_start(frame)
+    # The dictionary is sent once per session as JSON; only codes travel in the frame
+    session_dictionary = json.loads(json.dumps(binary_frames.dictionary()))
+    decoded = binary_frames.unpack(frame, session_dictionary)
+
+    assert header["responders"]["$table"] == "responders"
+    assert "name" not in header["responders"]["columns"]
+    assert {key: value for key, value in decoded.items() if key != "responders"} == \
+        {key: value for key, value in message.items() if key != "responders"}
+    assert_rows_match(decoded["responders"], message["responders"])
+    assert all(row["timestamp"] == message["timestamp"] for row in decoded["responders"])
+
+
+def test_unknown_responder_falls_back_to_json():
+    message = asyncio.run(get_first_responders_data())
+    message["responders"][0] = {**message["responders"][0], "id": "not-in-the-roster"}
+
+    assert binary_frames.pack(message) is None
+
+
+def test_buses_round_trip():
+    message = _get_demo_buses()
+
+    frame = binary_frames.pack(message)
+    header, _ = header_and_blob_start(frame)
+    decoded = binary_frames.unpack(frame)
+
+    packed = {name for matrix in header["buses"]["packed"] for name in matrix["names"]}
+    assert {"lat", "lon", "speed"} <= packed
+    assert decoded["count"] == message["count"]
+    assert_rows_match(decoded["buses"], message["buses"])
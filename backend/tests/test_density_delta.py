@@ -0,0 +1,128 @@
+"""
+Density Delta Tests
+Decoded delta streams stay within the tolerance, and a lost frame is followed by a keyframe
+"""
+
+import asyncio
+import json
+
+import numpy as np
+
+from app.services.connection_manager import ConnectionManager
+from app.services.density_delta import DensityDeltaEncoder, apply_runs
+
+TOLERANCE = 2
+SIZES = {"stadium": 10, "mg_road_metro": 12}
+
+
+def density_messages(ticks: int, seed: int = 0):
+    """multi_zone_density_update messages whose grids drift a little every tick"""
+    rng = np.random.default_rng(seed)
+    grids = {zone_id: rng.integers(0, 200, size=(size, size)) for zone_id, size in SIZES.items()}
+    for _ in range(ticks):
+        for zone_id, grid in grids.items():
+            drift = rng.integers(-4, 5, size=grid.shape) * (rng.random(grid.shape) < 0.2)
+            grids[zone_id] = np.maximum(0, grid + drift)
+        yield {
+            "type": "multi_zone_density_update",
+            "zones": {zone_id: {"zone_id": zone_id, "grid": grid.tolist()} for zone_id, grid in grids.items()}
+        }
+
+
+class DeltaClient:
+    """Reference client: applies a delta only on top of the frame it was built from"""
+
+    def __init__(self):
+        self.seq = None
+        self.grids = {}
+
+    def receive(self, frame: dict) -> bool:
+        if frame["encoding"] == "delta" and frame["base_seq"] != self.seq:
+            return False   # gap: wait for a keyframe
+        for zone_id, zone in frame["zones"].items():
+            if "grid" in zone:
+                self.grids[zone_id] = [list(row) for row in zone["grid"]]
+            else:
+                apply_runs(self.grids[zone_id], zone["grid_delta"]["runs"])
+        self.seq = frame["seq"]
+        return True
+
+    def error(self, message: dict) -> int:
+        return max(
+            int(np.abs(np.array(self.grids[zone_id]) - np.array(zone["grid"])).max())
+            for zone_id, zone in message["zones"].items()
+        )
+
+
+class BlockingSocket:
+    """WebSocket stand-in whose sends wait until the test opens the gate"""
+
+    def __init__(self):
+        self.gate = asyncio.Event()
+        self.sent = []
+
+    async def send_text(self, text: str):
+        await self.gate.wait()
+        self.sent.append(json.loads(text))
+
+
+def test_round_trip_stays_within_tolerance():
+    encoder = DensityDeltaEncoder(tolerance=TOLERANCE, keyframe_interval=10)
+    client = DeltaClient()
+    deltas = 0
+
+    for message in density_messages(35):
+        frames = encoder.encode(message)
+        payload = frames.keyframe if frames.delta is None else frames.delta
+        assert client.receive(payload)
+        if frames.delta is None:
+            assert client.error(message) == 0
+        else:
+            deltas += 1
+            assert client.error(message) <= TOLERANCE
+
+    assert deltas > 0
+
+
+def test_late_joiner_keyframe_carries_the_published_view():
+    encoder = DensityDeltaEncoder(tolerance=TOLERANCE, keyframe_interval=100)
+    messages = list(density_messages(6, seed=1))
+    for message in messages:
+        frames = encoder.encode(message)
+
+    client = DeltaClient()
+    assert client.receive(frames.keyframe)
+    assert client.error(messages[-1]) <= TOLERANCE
+
+
+def test_keyframe_follows_a_dropped_frame():
+    async def scenario():
+        manager = ConnectionManager(max_queue=1, policy="drop_oldest")
+        socket = BlockingSocket()
+        client = manager.register(socket)
+        manager.set_delta(socket, True)
+        encoder = DensityDeltaEncoder(tolerance=TOLERANCE, keyframe_interval=100)
+        messages = list(density_messages(4, seed=2))
+
+        # Frame 1 goes to the socket and blocks there; 2 waits in the queue and is evicted by 3
+        for message in messages[:3]:
+            await manager.broadcast(message, encoder.encode(message))
+            await asyncio.sleep(0)
+        assert client.dropped == 1
+
+        socket.gate.set()
+        await manager.flush()
+        await manager.broadcast(messages[3], encoder.encode(messages[3]))
+        await manager.flush()
+        client.close()
+        return socket.sent, messages
+
+    sent, messages = asyncio.run(scenario())
+
+    assert [frame["seq"] for frame in sent] == [1, 3, 4]
+    assert [frame["encoding"] for frame in sent] == ["keyframe", "delta", "keyframe"]
+
+    receiver = DeltaClient()
+    applied = [receiver.receive(frame) for frame in sent]
+    assert applied == [True, False, True]
+    assert receiver.error(messages[3]) <= TOLERANCE
@@ -0,0 +1,75 @@
+"""
+Headless Runner Tests
+Same-seed reproducibility within one process, restored process state, and a short smoke run
+"""
+
+import json
+from datetime import datetime
+
+from app.services.headless_runner import DEFAULT_INTERVALS, run_headless
+from app.services.multi_zone_simulation import get_zone_executor_config
+from app.utils.rng import rng_streams
+
+START = datetime(2025, 10, 26, 17, 0, 0)
+
+
+def test_same_seed_twice_in_one_process_writes_identical_logs(tmp_path):
+    first, second = tmp_path / "first.jsonl", tmp_path / "second.jsonl"
+
+    summary_first = run_headless(0.5, str(first), start=START, seed=42)
+    summary_second = run_headless(0.5, str(second), start=START, seed=42)
+
+    assert first.read_bytes() == second.read_bytes()
+    assert summary_first["phase_transitions"] == summary_second["phase_transitions"]
+    assert summary_first["peak_density"] == summary_second["peak_density"]
+
+
+def test_different_seeds_write_different_logs(tmp_path):
+    first, second = tmp_path / "first.jsonl", tmp_path / "second.jsonl"
+
+    run_headless(0.5, str(first), start=START, seed=1)
+    run_headless(0.5, str(second), start=START, seed=2)
+
+    assert first.read_bytes() != second.read_bytes()
+
+
+def test_runs_restore_executor_settings_and_seed(tmp_path):
+    executor_before, seed_before = get_zone_executor_config(), rng_streams.seed
+    fresh, after_other = tmp_path / "fresh.jsonl", tmp_path / "after_other.jsonl"
+
+    run_headless(0.25, str(fresh), start=START, seed=3)
+    run_headless(0.05, start=START, seed=7, zone_mode="thread", model="flow", incremental=True)
+
+    assert get_zone_executor_config() == executor_before
+    assert rng_streams.seed == seed_before
+
+    # A default-configured run is unaffected by the differently configured one before it
+    run_headless(0.25, str(after_other), start=START, seed=3)
+    assert fresh.read_bytes() == after_other.read_bytes()
+
+
+def test_short_run_summary(tmp_path):
+    output = tmp_path / "run.jsonl"
+    summary = run_headless(0.5, str(output), start=START, seed=7)
+
+    for key in ("ticks", "alerts", "phase_transitions", "peak_density", "seed", "simulated_seconds",
+                "simulated_start", "simulated_end", "wall_seconds", "speedup", "output"):
+        assert key in summary
+    assert summary["seed"] == 7
+    assert summary["simulated_start"] == START.isoformat()
+    assert summary["simulated_end"] == "2025-10-26T17:30:00"
+    # Jobs fire at 0 and then every interval, up to and including the end
+    assert summary["ticks"] == {job: 1800 // interval + 1 for job, interval in DEFAULT_INTERVALS.items()}
+
+    # Transition count matches the phase changes recorded in the tick log
+    records = [json.loads(line) for line in output.read_text().splitlines()]
+    phases, transitions = {}, 0
+    for record in records:
+        if record["job"] != "density":
+            continue
+        for zone_id, zone in record["message"]["zones"].items():
+            if zone_id in phases and phases[zone_id] != zone["phase"]:
+                transitions += 1
+            phases[zone_id] = zone["phase"]
+    assert transitions == summary["phase_transitions"] > 0
+    assert len(records) == sum(summary["ticks"].values())
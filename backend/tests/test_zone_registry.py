@@ -0,0 +1,102 @@
+"""
+Zone Registry Tests
+Bucket-index point-in-zone and nearest lookups against brute force, including points on bucket edges
+"""
+
+import numpy as np
+
+from app.services.zone_registry import METERS_PER_DEGREE, ZoneRegistry
+
+CENTER = (12.97, 77.59)
+
+
+def random_registry(seed: int, count: int = 60) -> ZoneRegistry:
+    """Overlapping zones of mixed sizes scattered around the city center"""
+    rng = np.random.default_rng(seed)
+    zones = {}
+    for k in range(count):
+        zones[f"zone_{k}"] = {
+            "center": [CENTER[0] + rng.uniform(-0.15, 0.15), CENTER[1] + rng.uniform(-0.15, 0.15)],
+            "radius": float(rng.choice([200, 500, 1000, 3000]) * rng.uniform(0.5, 1.5)),
+            "capacity": 10000,
+            "type": "mixed"
+        }
+    return ZoneRegistry(zones)
+
+
+def brute_zones_at(registry: ZoneRegistry, lat: float, lon: float):
+    distance = registry._distances(np.arange(len(registry)), lat, lon)
+    inside = np.flatnonzero(distance <= registry.radius)
+    return [registry.ids[i] for i in inside[np.argsort(distance[inside], kind='stable')]]
+
+
+def brute_nearest(registry: ZoneRegistry, lat: float, lon: float, count: int):
+    distance = registry._distances(np.arange(len(registry)), lat, lon)
+    order = np.argsort(distance, kind='stable')[:count]
+    return [(registry.ids[i], float(distance[i])) for i in order]
+
+
+def random_points(seed: int, count: int, spread: float = 0.2):
+    rng = np.random.default_rng(seed)
+    return zip(CENTER[0] + rng.uniform(-spread, spread, count), CENTER[1] + rng.uniform(-spread, spread, count))
+
+
+def bucket_edge_points(registry: ZoneRegistry):
+    """Points on, and one float step either side of, bucket boundaries in both axes"""
+    size = registry.bucket_size
+    x0, y0 = CENTER[1] * METERS_PER_DEGREE, CENTER[0] * METERS_PER_DEGREE
+    points = []
+    for kx in range(-8, 9, 2):
+        for ky in range(-8, 9, 2):
+            lon = (np.floor(x0 / size) + kx) * size / METERS_PER_DEGREE
+            lat = (np.floor(y0 / size) + ky) * size / METERS_PER_DEGREE
+            for dlon in (np.nextafter(lon, -np.inf), lon, np.nextafter(lon, np.inf)):
+                for dlat in (np.nextafter(lat, -np.inf), lat, np.nextafter(lat, np.inf)):
+                    points.append((float(dlat), float(dlon)))
+    return points
+
+
+def circle_edge_points(registry: ZoneRegistry):
+    """Points just inside and just outside each zone's circle, due east of its center"""
+    points = []
+    for lat, lon, radius in zip(registry.lat, registry.lon, registry.radius):
+        for factor in (0.999999, 1.000001):
+            points.append((float(lat), float(lon + radius * factor / METERS_PER_DEGREE)))
+    return points
+
+
+def test_zones_at_matches_brute_force():
+    for seed in range(3):
+        registry = random_registry(seed)
+        points = list(random_points(seed, 500)) + bucket_edge_points(registry) + circle_edge_points(registry)
+        for lat, lon in points:
+            assert registry.zones_at(lat, lon) == brute_zones_at(registry, lat, lon)
+
+
+def test_zone_at_is_the_closest_containing_zone():
+    registry = random_registry(7)
+    hits = 0
+    for lat, lon in random_points(7, 500, spread=0.1):
+        expected = brute_zones_at(registry, lat, lon)
+        assert registry.zone_at(lat, lon) == (expected[0] if expected else None)
+        hits += bool(expected)
+    assert hits > 0
+
+
+def test_nearest_matches_brute_force():
+    for seed in range(3):
+        registry = random_registry(seed)
+        # Include points far outside the zones' extent, where the ring search runs longest
+        points = list(random_points(seed, 300)) + list(random_points(seed + 100, 50, spread=1.0))
+        points += bucket_edge_points(registry)
+        for lat, lon in points:
+            for count in (1, 3, len(registry)):
+                assert registry.nearest(lat, lon, count) == brute_nearest(registry, lat, lon, count)
+
+
+def test_empty_registry():
+    registry = ZoneRegistry({})
+
+    assert registry.zones_at(*CENTER) == []
+    assert registry.zone_at(*CENTER) is None
+    assert registry.nearest(*CENTER) == []
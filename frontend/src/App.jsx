@@ -109,6 +109,11 @@ function App() {
           case 'echo':
             console.log('Echo received:', data.received);
             break;
+          case 'snapshot':
+            // Latest state replayed on connect: handle each message as if it had just arrived
+            console.log(`📸 Snapshot of ${data.messages.length} messages`);
+            data.messages.forEach((message) => ws.onmessage({ data: JSON.stringify(message) }));
+            break;
           case 'gps_update':
             // Update bus data
             console.log(`🚌 Received ${data.count} buses`);
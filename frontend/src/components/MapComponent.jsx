@@ -97,7 +97,8 @@ function HeatmapLayer({ densityData, selectedZone = 'all' }) {
         if (selectedZone !== 'all' && selectedZone !== zoneId) return;
 
         const { grid, center } = zoneData;
-        const grid_size = 10; // Standard grid size
+        const grid_size = zoneData.grid_size || grid?.length || 10;
+        const cell_size_deg = zoneData.cell_size_deg || 0.002;
         
         if (!grid || !center) {
           console.warn(`⚠️ Zone ${zoneId} missing grid or center`);
@@ -118,8 +119,8 @@ function HeatmapLayer({ densityData, selectedZone = 'all' }) {
           row.forEach((density, j) => {
             if (density > 5) {
               // Convert grid position to lat/lon
-              const lat_offset = (i - grid_size / 2) * 0.002;
-              const lon_offset = (j - grid_size / 2) * 0.002;
+              const lat_offset = (i - grid_size / 2) * cell_size_deg;
+              const lon_offset = (j - grid_size / 2) * cell_size_deg;
               const lat = center[0] + lat_offset;
               const lon = center[1] + lon_offset;
               
@@ -138,7 +139,7 @@ function HeatmapLayer({ densityData, selectedZone = 'all' }) {
       // OLD SINGLE-ZONE FORMAT (backward compatibility)
       console.log('🔥 Single-Zone Heatmap Update (Legacy)');
       
-      const { grid, center_location, grid_size = 10 } = densityData;
+      const { grid, center_location, grid_size = 10, cell_size_deg = 0.002 } = densityData;
       
       // Find max density
       grid.forEach(row => {
@@ -151,8 +152,8 @@ function HeatmapLayer({ densityData, selectedZone = 'all' }) {
       grid.forEach((row, i) => {
         row.forEach((density, j) => {
           if (density > 5) {
-            const lat_offset = (i - grid_size / 2) * 0.002;
-            const lon_offset = (j - grid_size / 2) * 0.002;
+            const lat_offset = (i - grid_size / 2) * cell_size_deg;
+            const lon_offset = (j - grid_size / 2) * cell_size_deg;
             const lat = center_location[0] + lat_offset;
             const lon = center_location[1] + lon_offset;
             
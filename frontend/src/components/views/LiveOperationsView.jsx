@@ -46,7 +46,8 @@ const LiveOperationsView = ({
             max_density: stadiumZone.max_density,
             phase: stadiumZone.phase,
             center_location: stadiumZone.center,
-            grid_size: 10,
+            grid_size: stadiumZone.grid_size || 10,
+            cell_size_deg: stadiumZone.cell_size_deg,
             timestamp: multiZoneDensityData.timestamp
           });
         } else {
@@ -70,7 +71,8 @@ const LiveOperationsView = ({
             max_density: zoneData.max_density,
             phase: zoneData.phase,
             center_location: zoneData.center,
-            grid_size: 10,
+            grid_size: zoneData.grid_size || 10,
+            cell_size_deg: zoneData.cell_size_deg,
             timestamp: multiZoneDensityData.timestamp
           });
         } else {
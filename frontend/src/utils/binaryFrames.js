@@ -0,0 +1,108 @@
+/**
+ * Binary Frame Decoder
+ * Reference decoder for the backend's binary WebSocket frames
+ * (schema: docs/binary-frames.md). Turns a frame back into the JSON message it replaces.
+ */
+
+const MAGIC = 'CSB';
+const VERSION = 1;
+const ALIGN = 4;
+
+const TYPED_ARRAYS = {
+  '<u2': Uint16Array,
+  '<f4': Float32Array,
+};
+
+const aligned = (offset) => Math.ceil(offset / ALIGN) * ALIGN;
+
+/**
+ * Decode one binary frame
+ * @param {ArrayBuffer} buffer - event.data with ws.binaryType = 'arraybuffer'
+ * @param {Object} dictionary - the `dictionary` of the session's binary_mode message
+ */
+export function decodeFrame(buffer, dictionary) {
+  const view = new DataView(buffer);
+  const magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2));
+  const version = view.getUint8(3);
+  if (magic !== MAGIC || version !== VERSION) {
+    throw new Error(`Unsupported binary frame (magic ${magic}, version ${version})`);
+  }
+
+  const headerLength = view.getUint32(4, true);
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buffer, 8, headerLength)));
+  const start = aligned(8 + headerLength);
+
+  const blob = (reference) => {
+    const count = reference.shape.reduce((total, size) => total * size, 1);
+    const values = new TYPED_ARRAYS[reference.dtype](buffer, start + reference.$blob, count);
+    if (reference.shape.length === 1) {
+      return Array.from(values);
+    }
+    const width = reference.shape[reference.shape.length - 1];
+    const rows = [];
+    for (let offset = 0; offset < count; offset += width) {
+      rows.push(Array.from(values.subarray(offset, offset + width)));
+    }
+    return rows;
+  };
+
+  const table = (reference) => {
+    const columns = {};
+    reference.packed.forEach(({ names, values }) => {
+      const matrix = blob(values);
+      names.forEach((name, c) => {
+        columns[name] = matrix.map((row) => row[c]);
+      });
+    });
+    Object.assign(columns, reference.columns);
+
+    const rows = [];
+    for (let k = 0; k < reference.count; k++) {
+      let row = {};
+      Object.keys(columns).forEach((name) => {
+        row[name] = columns[name][k];
+      });
+      if (reference.$table === 'responders') {
+        row = responder(row, dictionary);
+      }
+      if (reference.stamped) {
+        row.timestamp = header.timestamp;
+      }
+      rows.push(row);
+    }
+    return rows;
+  };
+
+  const restore = (value) => {
+    if (Array.isArray(value)) {
+      return value.map(restore);
+    }
+    if (value && typeof value === 'object') {
+      if ('$blob' in value) return blob(value);
+      if ('$table' in value) return table(value);
+      const restored = {};
+      Object.keys(value).forEach((key) => {
+        restored[key] = restore(value[key]);
+      });
+      return restored;
+    }
+    return value;
+  };
+
+  return restore(header);
+}
+
+function responder(row, dictionary) {
+  const unit = dictionary.units[row.unit];
+  return {
+    ...unit,
+    ...dictionary.responder_types[unit.type],
+    lat: row.lat,
+    lon: row.lon,
+    speed: row.speed,
+    status: dictionary.statuses[row.status],
+    zone: dictionary.zones[row.zone],
+  };
+}
+
+export default decodeFrame;